@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步文件处理模块
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Tuple, Union
+
+from file_handler.file_processor import FileInfo, FileProcessor, FileType
+
+
+class AsyncFileProcessor:
+    """异步文件处理器类
+    
+    面向 asyncio 的 FileProcessor 外观：所有阻塞的磁盘操作都在有界线程池中执行，
+    并按所在设备（st_dev）限制并发数，避免大量任务同时压在同一块磁盘上。
+    """
+    
+    def __init__(self, file_processor: Optional[FileProcessor] = None, max_workers: int = 32,
+                 per_device_limit: int = 8):
+        self.file_processor = file_processor or FileProcessor()
+        self.per_device_limit = per_device_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dada-io")
+        # 目录 -> 设备号 的缓存，以及每个设备的并发信号量
+        self._device_cache = {}
+        self._device_semaphores = {}
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    def close(self) -> None:
+        """
+        关闭线程池（等待已提交的任务完成）
+        """
+        self._executor.shutdown(wait=True)
+    
+    async def aclose(self) -> None:
+        """
+        异步关闭线程池：在默认线程池中等待已提交的任务完成，不阻塞事件循环
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+    
+    async def read_file(self, file_path: str) -> Union[bytes, memoryview]:
+        """
+        异步读取文件内容
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            文件内容字节或只读 memoryview
+        """
+        return await self._run(file_path, self.file_processor.read_file, file_path)
+    
+    async def write_file(self, file_path: str, data: bytes, atomic: bool = False,
+                         preallocate: bool = False) -> None:
+        """
+        异步写入文件内容
+        
+        Args:
+            file_path: 文件路径
+            data: 要写入的数据
+            atomic: 是否原子写入
+            preallocate: 是否按数据长度预分配磁盘空间
+        """
+        await self._run(file_path, self.file_processor.write_file, file_path, data, atomic, preallocate)
+    
+    async def iter_file_chunks(self, file_path: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        异步分块读取文件，每块读取单独占用一次设备并发配额
+        
+        Args:
+            file_path: 文件路径
+            chunk_size: 分块大小，默认使用 FileProcessor 的 chunk_size
+        
+        Returns:
+            逐块产出文件内容的异步迭代器
+        """
+        if chunk_size is None:
+            chunk_size = self.file_processor.chunk_size
+        if chunk_size <= 0:
+            raise ValueError(f"分块大小必须为正数: {chunk_size}")
+        try:
+            f = await self._run(file_path, open, file_path, "rb")
+        except OSError as e:
+            raise IOError(f"读取文件失败: {str(e)}")
+        try:
+            while True:
+                chunk = await self._run(file_path, f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+    
+    async def write_file_chunks(self, file_path: str, chunks: Union[Iterable[bytes], AsyncIterable[bytes]],
+                                atomic: bool = False, expected_size: Optional[int] = None) -> int:
+        """
+        异步逐块写入文件，chunks 可以是普通可迭代对象或异步可迭代对象
+        
+        异步数据源由事件循环消费，打开、写入、提交与清理全部在线程池中执行，
+        原子写入、预分配与组提交的行为与 FileProcessor.write_file_chunks 相同。
+        
+        Args:
+            file_path: 文件路径
+            chunks: 数据块的（异步）可迭代对象
+            atomic: 是否原子写入
+            expected_size: 已知的输出大小，提供时预分配空间
+        
+        Returns:
+            写入的总字节数
+        """
+        processor = self.file_processor
+        if not hasattr(chunks, "__aiter__"):
+            return await self._run(file_path, processor.write_file_chunks, file_path, chunks, atomic, expected_size)
+        
+        f, target_path = await self._run(file_path, processor.begin_write, file_path, atomic, expected_size)
+        written = 0
+        try:
+            async for chunk in chunks:
+                await self._run(file_path, f.write, chunk)
+                written += len(chunk)
+        except BaseException as e:
+            # 包括任务被取消：不留下临时文件
+            await self._run(file_path, processor.abort_write, f, target_path, atomic)
+            if isinstance(e, OSError):
+                raise IOError(f"写入文件失败: {str(e)}")
+            raise
+        await self._run(file_path, processor.finish_write, f, file_path, target_path, written, atomic, expected_size)
+        return written
+    
+    async def get_file_hash(self, file_path: str, algorithm: str = "sha256") -> str:
+        """
+        异步获取文件哈希值
+        
+        Args:
+            file_path: 文件路径
+            algorithm: 哈希算法
+        
+        Returns:
+            哈希值字符串
+        """
+        return await self._run(file_path, self.file_processor.get_file_hash, file_path, algorithm)
+    
+    async def iter_file_hashes(self, file_paths: Iterable[str], algorithm: str = "sha256",
+                               max_pending: int = 64) -> AsyncIterator[Tuple[str, bool, str]]:
+        """
+        异步批量计算文件哈希，按完成顺序产出结果
+        
+        Args:
+            file_paths: 文件路径的可迭代对象
+            algorithm: 哈希算法
+            max_pending: 同时在途的任务上限
+        
+        Returns:
+            (文件路径, 是否成功, 哈希值或错误信息) 的异步迭代器
+        """
+        async def hash_one(file_path):
+            try:
+                return file_path, True, await self.get_file_hash(file_path, algorithm)
+            except IOError as e:
+                return file_path, False, str(e)
+        
+        pending = set()
+        try:
+            for file_path in file_paths:
+                pending.add(asyncio.ensure_future(hash_one(file_path)))
+                if len(pending) >= max_pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def get_file_info(self, file_path: str) -> dict:
+        """
+        异步获取文件信息
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            文件信息字典
+        """
+        return await self._run(file_path, self.file_processor.get_file_info, file_path)
+    
+    async def get_files_info(self, paths: Iterable[str]) -> List[FileInfo]:
+        """
+        异步批量获取文件信息（每个文件一次 stat，并发受设备配额限制）
+        
+        Args:
+            paths: 文件路径的可迭代对象
+        
+        Returns:
+            FileInfo 列表，顺序与输入一致，无法访问的文件被跳过
+        """
+        paths = list(paths)
+        results = await asyncio.gather(*(self._run(path, self.file_processor.get_files_info, [path])
+                                         for path in paths))
+        return [info for infos in results for info in infos]
+    
+    async def classify_file(self, file_path: str) -> FileType:
+        """
+        异步识别文件类型
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            文件类型
+        """
+        return await self._run(file_path, self.file_processor.classify_file, file_path)
+    
+    async def _run(self, path: str, func, *args):
+        """
+        在线程池中执行阻塞函数，并受 path 所在设备的并发上限约束
+        
+        Args:
+            path: 决定所属设备的路径
+            func: 要执行的函数
+            *args: 函数参数
+        
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        device = await self._get_device(path)
+        semaphore = self._device_semaphores.get(device)
+        if semaphore is None:
+            semaphore = self._device_semaphores[device] = asyncio.Semaphore(self.per_device_limit)
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    async def _get_device(self, path: str) -> Optional[int]:
+        """
+        获取路径所在目录的设备号（带缓存）
+        
+        Args:
+            path: 文件路径
+        
+        Returns:
+            设备号，无法确定时返回 None
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory not in self._device_cache:
+            loop = asyncio.get_running_loop()
+            self._device_cache[directory] = await loop.run_in_executor(
+                self._executor, self._stat_device, directory)
+        return self._device_cache[directory]
+    
+    @staticmethod
+    def _stat_device(directory: str) -> Optional[int]:
+        """
+        向上查找第一个存在的目录并返回其设备号
+        
+        Args:
+            directory: 目录路径
+        
+        Returns:
+            设备号，无法确定时返回 None
+        """
+        while True:
+            try:
+                return os.stat(directory).st_dev
+            except OSError:
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    return None
+                directory = parent
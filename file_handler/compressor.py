@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式压缩模块
+"""
+
+import itertools
+import lzma
+import zlib
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from file_handler.file_processor import FileProcessor
+
+# 判断是否值得压缩时采样的数据量
+DEFAULT_SAMPLE_SIZE = 64 * 1024
+# 解压时单次产出的明文上限，防止压缩炸弹一次性占满内存
+MAX_OUTPUT_CHUNK = 1024 * 1024
+# 各算法的默认压缩级别
+DEFAULT_LEVELS = {"zlib": 6, "lzma": 6, "zstd": 3}
+# zstd 帧与可跳过帧的魔数（小端）
+ZSTD_MAGIC = 0xFD2FB528
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+
+class StreamCompressor:
+    """流式压缩类
+    
+    支持标准库的 zlib、lzma 以及（安装了 zstandard 时的）zstd。
+    压缩前先采样数据开头：魔数表明已是压缩格式（jpg/zip/docx 等）或采样熵过高时直接跳过，
+    这类输入不付出任何压缩开销。实际使用的算法由调用方记录在容器头部中，解压时按记录选择。
+    """
+    
+    def __init__(self, algorithm: Optional[str] = None, level: Optional[int] = None,
+                 sample_size: int = DEFAULT_SAMPLE_SIZE):
+        algorithm = algorithm or self.available_algorithms()[0]
+        if algorithm not in self.available_algorithms():
+            raise ValueError(f"不支持的压缩算法: {algorithm!r}")
+        self.algorithm = algorithm
+        self.level = DEFAULT_LEVELS[algorithm] if level is None else level
+        self.sample_size = sample_size
+    
+    @staticmethod
+    def available_algorithms() -> List[str]:
+        """
+        获取当前环境可用的压缩算法（按推荐程度排序）
+        
+        Returns:
+            算法名称列表
+        """
+        algorithms = []
+        try:
+            import zstandard  # noqa: F401
+            algorithms.append("zstd")
+        except ImportError:
+            pass
+        algorithms.extend(["zlib", "lzma"])
+        return algorithms
+    
+    def compress_stream(self, chunks: Iterable[bytes]) -> Tuple[Optional[str], Iterator[bytes]]:
+        """
+        采样数据开头决定是否压缩，并返回（可能已压缩的）数据流
+        
+        Args:
+            chunks: 原始数据块的可迭代对象
+        
+        Returns:
+            (实际使用的算法，跳过压缩时为 None；数据块迭代器)
+        """
+        chunks = iter(chunks)
+        sample = []
+        sampled = 0
+        for chunk in chunks:
+            sample.append(chunk)
+            sampled += len(chunk)
+            if sampled >= self.sample_size:
+                break
+        
+        chunks = itertools.chain(sample, chunks)
+        if not self.should_compress(b"".join(sample)[:self.sample_size]):
+            return None, chunks
+        return self.algorithm, self._compress(chunks)
+    
+    @staticmethod
+    def should_compress(sample: bytes) -> bool:
+        """
+        根据采样判断数据是否值得压缩
+        
+        Args:
+            sample: 数据开头的采样
+        
+        Returns:
+            是否压缩
+        """
+        if not sample:
+            return False
+        return not FileProcessor.classify_bytes(sample).compressed
+    
+    @staticmethod
+    def decompress_stream(chunks: Iterable[bytes], algorithm: str) -> Iterator[bytes]:
+        """
+        流式解压
+        
+        Args:
+            chunks: 压缩数据块的可迭代对象
+            algorithm: 压缩时使用的算法
+        
+        Returns:
+            原始数据块的迭代器
+        """
+        if algorithm == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("当前环境未安装 zstandard，无法解压 zstd 数据")
+            # stream_reader 按请求的大小产出明文；它在输入提前结束时不会报错，
+            # 由 _ZstdFrameSource 按帧结构判断数据是否完整
+            source = _ZstdFrameSource(chunks)
+            try:
+                with zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True) as reader:
+                    while True:
+                        data = reader.read(MAX_OUTPUT_CHUNK)
+                        if not data:
+                            break
+                        yield data
+                source.drain()
+            except zstandard.ZstdError as e:
+                raise ValueError(f"解压失败: {str(e)}")
+            if not source.complete:
+                raise ValueError("解压失败: 压缩数据不完整")
+            return
+        
+        if algorithm == "zlib":
+            decompressor = zlib.decompressobj()
+        elif algorithm == "lzma":
+            decompressor = lzma.LZMADecompressor()
+        else:
+            raise ValueError(f"不支持的压缩算法: {algorithm!r}")
+        
+        try:
+            for chunk in chunks:
+                # 限制单次产出的大小，高压缩比的数据分多次产出
+                data = decompressor.decompress(chunk, MAX_OUTPUT_CHUNK)
+                while data:
+                    yield data
+                    data = StreamCompressor._drain(decompressor)
+            if algorithm == "zlib":
+                data = decompressor.flush()
+                if data:
+                    yield data
+        except (zlib.error, lzma.LZMAError) as e:
+            raise ValueError(f"解压失败: {str(e)}")
+        if not decompressor.eof:
+            raise ValueError("解压失败: 压缩数据不完整")
+    
+    def _compress(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        按选定算法流式压缩
+        
+        Args:
+            chunks: 原始数据块的可迭代对象
+        
+        Returns:
+            压缩数据块的迭代器
+        """
+        if self.algorithm == "zstd":
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        elif self.algorithm == "zlib":
+            compressor = zlib.compressobj(self.level)
+        else:
+            compressor = lzma.LZMACompressor(preset=self.level)
+        
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    
+    @staticmethod
+    def _drain(decompressor) -> bytes:
+        """
+        取出解压器中尚未产出的数据（每次不超过 MAX_OUTPUT_CHUNK）
+        
+        Args:
+            decompressor: zlib 或 lzma 解压器
+        
+        Returns:
+            解压出的数据，没有剩余时为空
+        """
+        if isinstance(decompressor, lzma.LZMADecompressor):
+            if decompressor.eof or decompressor.needs_input:
+                return b""
+            return decompressor.decompress(b"", MAX_OUTPUT_CHUNK)
+        if not decompressor.unconsumed_tail:
+            return b""
+        return decompressor.decompress(decompressor.unconsumed_tail, MAX_OUTPUT_CHUNK)
+
+
+class _ZstdFrameSource:
+    """zstd 解压的输入源
+    
+    把数据块迭代器包装成 stream_reader 需要的 read() 接口，同时解析经过的帧头与块头
+    （只读头部，跳过块内容），据此判断输入是否在完整的帧边界结束。
+    """
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        # 解析状态：正在收集的头部字段、需要的字节数以及需要跳过的字节数
+        self._state = "magic"
+        self._need = 4
+        self._field = bytearray()
+        self._skip = 0
+        self._checksum = False
+        self._frames = 0
+    
+    @property
+    def complete(self) -> bool:
+        """输入是否恰好在帧边界结束（至少包含一个帧）"""
+        return self._frames > 0 and self._state == "magic" and not self._field and not self._skip
+    
+    def read(self, size: int = -1) -> bytes:
+        """
+        读取压缩数据
+        
+        Args:
+            size: 最多读取的字节数，-1 表示读取全部
+        
+        Returns:
+            数据，输入结束时为空
+        """
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._parse(data)
+        return data
+    
+    def drain(self) -> None:
+        """解压器停止读取后，把剩余输入也交给解析（多余的数据会使 complete 为假）"""
+        while self.read(MAX_OUTPUT_CHUNK):
+            pass
+    
+    def close(self) -> None:
+        """stream_reader 关闭时调用，数据块迭代器无需关闭"""
+    
+    def _parse(self, data: bytes) -> None:
+        """
+        推进帧结构解析
+        
+        Args:
+            data: 新读出的压缩数据
+        """
+        position = 0
+        while position < len(data):
+            if self._skip:
+                step = min(self._skip, len(data) - position)
+                self._skip -= step
+                position += step
+                continue
+            step = min(self._need - len(self._field), len(data) - position)
+            self._field += data[position:position + step]
+            position += step
+            if len(self._field) == self._need:
+                field = int.from_bytes(self._field, "little")
+                self._field = bytearray()
+                self._advance(field)
+    
+    def _advance(self, field: int) -> None:
+        """
+        处理收集完整的头部字段，设置下一个状态
+        
+        Args:
+            field: 小端解析的字段值
+        """
+        if self._state == "magic":
+            if field == ZSTD_MAGIC:
+                self._state, self._need = "descriptor", 1
+            elif field & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC:
+                self._state, self._need = "skippable", 4
+            else:
+                raise ValueError("解压失败: 不是有效的 zstd 数据")
+        elif self._state == "skippable":
+            self._skip = field
+            self._frames += 1
+            self._state, self._need = "magic", 4
+        elif self._state == "descriptor":
+            # 帧头剩余部分：窗口描述符、字典 ID、内容大小
+            fcs_flag, single_segment = field >> 6, field >> 5 & 1
+            self._checksum = bool(field >> 2 & 1)
+            self._skip = (0 if single_segment else 1) + (0, 1, 2, 4)[field & 3] + (single_segment, 2, 4, 8)[fcs_flag]
+            self._state, self._need = "block", 3
+        elif self._state == "block":
+            last, block_type, block_size = field & 1, field >> 1 & 3, field >> 3
+            if block_type == 3:
+                raise ValueError("解压失败: zstd 数据块类型无效")
+            # RLE 块的内容只有 1 字节
+            self._skip = 1 if block_type == 1 else block_size
+            if last:
+                self._skip += 4 if self._checksum else 0
+                self._frames += 1
+                self._state, self._need = "magic", 4
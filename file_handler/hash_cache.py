@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件哈希持久化缓存模块
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Optional
+
+
+def get_default_cache_path() -> str:
+    """
+    获取默认缓存数据库路径（用户配置目录下）
+    
+    Returns:
+        缓存数据库文件路径
+    """
+    if sys.platform == "win32":
+        base_dir = os.environ.get("APPDATA") or os.path.expanduser("~")
+        config_dir = os.path.join(base_dir, "Dada")
+    elif sys.platform == "darwin":
+        config_dir = os.path.expanduser("~/Library/Application Support/Dada")
+    else:
+        base_dir = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+        config_dir = os.path.join(base_dir, "dada")
+    return os.path.join(config_dir, "hash_cache.sqlite3")
+
+
+class HashCache:
+    """文件哈希缓存类
+    
+    以 (设备号, inode, 大小, mtime_ns, 算法) 为键保存文件摘要，文件未变化时直接返回缓存结果。
+    条目数超过上限时按最近使用时间（LRU）一次淘汰到上限的 90%，避免每次插入都触发删除。
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 100000):
+        self.db_path = db_path or get_default_cache_path()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        # 哈希线程池会从多个线程访问，统一由 self._lock 串行化
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # 缓存丢失只会导致重新计算，不需要每次写入都完整落盘
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            "device INTEGER NOT NULL, inode INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, algorithm TEXT NOT NULL, digest TEXT NOT NULL, "
+            "last_used REAL NOT NULL, "
+            "PRIMARY KEY (device, inode, size, mtime_ns, algorithm))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_file_hashes_last_used ON file_hashes (last_used)")
+        self._conn.commit()
+        self._entry_count = self._conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+    
+    @staticmethod
+    def make_key(st: os.stat_result, algorithm: str) -> tuple:
+        """
+        根据 stat 结果生成缓存键
+        
+        Args:
+            st: os.stat 的结果
+            algorithm: 哈希算法
+        
+        Returns:
+            缓存键元组
+        """
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm.lower())
+    
+    def get(self, key: tuple) -> Optional[str]:
+        """
+        查询缓存的摘要，命中时刷新其最近使用时间
+        
+        Args:
+            key: make_key 生成的缓存键
+        
+        Returns:
+            摘要字符串，未命中时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM file_hashes WHERE device=? AND inode=? AND size=? "
+                "AND mtime_ns=? AND algorithm=?", key
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE file_hashes SET last_used=? WHERE device=? AND inode=? AND size=? "
+                "AND mtime_ns=? AND algorithm=?", (time.time(),) + key
+            )
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, key: tuple, digest: str) -> None:
+        """
+        写入缓存，超过上限时淘汰最久未使用的条目（相同键的文件内容必然相同，已存在时忽略）
+        
+        Args:
+            key: make_key 生成的缓存键
+            digest: 摘要字符串
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO file_hashes "
+                "(device, inode, size, mtime_ns, algorithm, digest, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (digest, time.time())
+            )
+            if cursor.rowcount:
+                self._entry_count += 1
+            if self._entry_count > self.max_entries:
+                # 一次淘汰到上限的 90%，避免每次插入都触发删除
+                excess = self._entry_count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM file_hashes WHERE rowid IN "
+                    "(SELECT rowid FROM file_hashes ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._entry_count = self._conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+            self._conn.commit()
+    
+    def clear(self) -> None:
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM file_hashes")
+            self._conn.commit()
+            self._entry_count = 0
+    
+    def close(self) -> None:
+        """
+        关闭缓存数据库
+        """
+        with self._lock:
+            self._conn.close()
@@ -5,7 +5,7 @@
 """
 
 from PyQt5.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel, 
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel, 
     QPushButton, QLineEdit, QTextEdit, QListWidget, QCheckBox, QSpinBox, 
     QFileDialog, QMessageBox, QTabWidget, QFormLayout, QDateTimeEdit, QProgressBar, QComboBox
 )
@@ -155,8 +155,9 @@ class MainWindow(QMainWindow):
         self.machine_binder = MachineBinder()
         self.self_destructor = SelfDestructor()
         
-        # 待处理文件列表
+        # 待处理文件列表，以及用于 O(1) 去重的集合
         self.files_to_process = []
+        self.files_to_process_set = set()
         
         # 初始化UI
         self.init_ui()
@@ -597,32 +598,44 @@ class MainWindow(QMainWindow):
     
     def drop_event(self, event):
         """拖放事件处理"""
-        files = self.file_processor.get_dropped_files(event)
-        for file in files:
-            if file not in self.files_to_process:
-                self.files_to_process.append(file)
-                self.file_list.addItem(file)
+        files = self.file_processor.iter_dropped_files(event)
+        self.add_files_to_list(files)
     
     def add_file(self):
         """添加文件"""
         files, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", "所有文件 (*.*)")
+        self.add_files_to_list(self.file_processor.expand_paths(files))
+    
+    def add_files_to_list(self, files, batch_size=500):
+        """分批将文件加入待处理列表，期间处理界面事件，避免大目录导致界面卡死"""
+        batch = []
         for file in files:
-            if file not in self.files_to_process:
-                self.files_to_process.append(file)
-                self.file_list.addItem(file)
+            if file in self.files_to_process_set:
+                continue
+            self.files_to_process_set.add(file)
+            self.files_to_process.append(file)
+            batch.append(file)
+            if len(batch) >= batch_size:
+                self.file_list.addItems(batch)
+                batch = []
+                QApplication.processEvents()
+        if batch:
+            self.file_list.addItems(batch)
     
     def remove_file(self):
         """移除文件"""
         current_item = self.file_list.currentItem()
         if current_item:
             file_path = current_item.text()
-            if file_path in self.files_to_process:
+            if file_path in self.files_to_process_set:
+                self.files_to_process_set.discard(file_path)
                 self.files_to_process.remove(file_path)
             self.file_list.takeItem(self.file_list.row(current_item))
     
     def clear_files(self):
         """清空文件列表"""
         self.files_to_process.clear()
+        self.files_to_process_set.clear()
         self.file_list.clear()
     
     def update_key_inputs(self, value):
@@ -712,7 +725,7 @@ class MainWindow(QMainWindow):
                     encrypted_data = self.machine_binder.bind_to_machine(encrypted_data)
                 
                 # 保存加密文件
-                self.file_processor.write_file(encrypted_file_path, encrypted_data)
+                self.file_processor.write_file(encrypted_file_path, encrypted_data, atomic=True)
                 
                 # 添加到自毁列表
                 if self.self_destruct_checkbox.isChecked():
@@ -791,7 +804,7 @@ class MainWindow(QMainWindow):
                         updated_encrypted_data = self.encryptor.update_metadata(encrypted_data, metadata)
                     
                     # 保存更新后的文件
-                    self.file_processor.write_file(file_path, updated_encrypted_data)
+                    self.file_processor.write_file(file_path, updated_encrypted_data, atomic=True)
                     QMessageBox.warning(self, "自毁激活", "自毁机制已激活，文件已销毁！")
                 except Exception:
                     # 如果解析失败，直接销毁文件
@@ -823,7 +836,7 @@ class MainWindow(QMainWindow):
                     # 更新文件
                     updated_file_data = self.encryptor.update_metadata(file_data, metadata)
                     updated_encrypted_data = machine_id + b"|" + updated_file_data
-                    self.file_processor.write_file(file_path, updated_encrypted_data)
+                    self.file_processor.write_file(file_path, updated_encrypted_data, atomic=True)
                     
                     if metadata["self_destruct"]:
                         QMessageBox.warning(self, "自毁激活", "自毁机制已激活，文件已销毁！")
@@ -867,7 +880,7 @@ class MainWindow(QMainWindow):
                 else:
                     full_updated_data = updated_file_data
                 
-                self.file_processor.write_file(file_path, full_updated_data)
+                self.file_processor.write_file(file_path, full_updated_data, atomic=True)
                 QMessageBox.warning(self, "自毁激活", "自毁机制已激活，文件已销毁！")
                 return
             
@@ -883,7 +896,7 @@ class MainWindow(QMainWindow):
                 else:
                     full_updated_data = updated_file_data
                 
-                self.file_processor.write_file(file_path, full_updated_data)
+                self.file_processor.write_file(file_path, full_updated_data, atomic=True)
                 QMessageBox.critical(self, "错误", f"解密失败: 密钥不正确！\n失败尝试: {updated_metadata['failed_attempts']}/{updated_metadata['max_attempts']}")
                 return
             
@@ -901,7 +914,7 @@ class MainWindow(QMainWindow):
             decrypted_file_path = os.path.join(os.path.dirname(file_path), f"{base_name_without_ext}{original_extension}")
             
             # 保存解密文件
-            self.file_processor.write_file(decrypted_file_path, decrypted_data)
+            self.file_processor.write_file(decrypted_file_path, decrypted_data, atomic=True)
             
             # 检查完整性警告
             if "integrity_warning" in updated_metadata and updated_metadata["integrity_warning"]:
@@ -9,6 +9,9 @@ import random
 import string
 from typing import List
 
+from security.cipher_backend import AES_256_GCM, CipherBackends
+from security.kdf import LEGACY_KDF_PARAMS, KeyDeriver
+
 
 class DecoyGenerator:
     """诱饵文档生成器类"""
@@ -30,6 +33,10 @@ class DecoyGenerator:
         
         # 支持的诱饵文档扩展名
         self.supported_extensions = [".txt", ".docx", ".pdf", ".xlsx"]
+        
+        # 加密诱饵使用的 KDF 参数；诱饵格式（盐值 + IV + 密文 + 标签）没有头部记录参数，
+        # 默认保持原固定参数，改用 KeyDeriver.calibrate() 的结果可加快批量生成
+        self.kdf_params = dict(LEGACY_KDF_PARAMS)
     
     def generate_decoy_name(self) -> str:
         """
@@ -128,32 +135,23 @@ class DecoyGenerator:
         file_path = os.path.join(output_dir, f"{decoy_name}.txt.encrypted")
         
         # 使用真实的AES-GCM加密算法
-        from Crypto.Cipher import AES
-        from Crypto.Protocol.KDF import PBKDF2
-        from Crypto.Hash import SHA256
         from Crypto.Random import get_random_bytes
         
         # 从密码生成密钥
         salt = get_random_bytes(16)
-        key = PBKDF2(
-            password=fake_password.encode('utf-8'),
-            salt=salt,
-            dkLen=32,
-            count=100000,
-            hmac_hash_module=SHA256
-        )
+        key = KeyDeriver.derive_key(fake_password.encode('utf-8'), salt, self.kdf_params)
         
         # 使用AES-GCM加密
         iv = get_random_bytes(16)
-        cipher = AES.new(key, AES.MODE_GCM, iv)
-        encrypted_data, tag = cipher.encrypt_and_digest(decoy_content.encode('utf-8'))
+        backend = CipherBackends.for_algorithm(AES_256_GCM)
+        encrypted = backend.encrypt(key, iv, decoy_content.encode('utf-8'), b"")
         
         # 写入加密后的数据（格式：salt + iv + 密文 + 标签）
         with open(file_path, "wb") as f:
             f.write(salt)
             f.write(iv)
-            f.write(encrypted_data)
-            f.write(tag)
+            # 密文 + 认证标签
+            f.write(encrypted)
         
         return file_path
     
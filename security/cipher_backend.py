@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+认证加密后端模块
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+# 支持的认证加密算法（写入容器头部的名称）
+AES_256_GCM = "aes-256-gcm"
+CHACHA20_POLY1305 = "chacha20-poly1305"
+CIPHER_ALGORITHMS = (AES_256_GCM, CHACHA20_POLY1305)
+# 认证标签长度（两种算法相同）
+AEAD_TAG_SIZE = 16
+# 选择后端时测速使用的数据量
+BENCHMARK_SAMPLE_SIZE = 1024 * 1024
+
+
+class AEADBackend(ABC):
+    """认证加密后端基类
+    
+    子类实现某个库的某个算法，encrypt 返回 密文 + 16 字节标签，decrypt 认证失败时抛出 ValueError。
+    同一算法的不同实现输出完全相同，因此解密时可以换用任意可用的实现。
+    """
+    
+    name = ""
+    algorithm = ""
+    
+    @classmethod
+    @abstractmethod
+    def is_available(cls) -> bool:
+        """
+        检查后端依赖的库是否已安装
+        
+        Returns:
+            是否可用
+        """
+    
+    @abstractmethod
+    def encrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        """
+        加密并计算认证标签
+        
+        Args:
+            key: 32 字节密钥
+            nonce: nonce
+            data: 明文
+            aad: 附加认证数据
+        
+        Returns:
+            密文 + 认证标签
+        """
+    
+    @abstractmethod
+    def decrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        """
+        验证认证标签并解密
+        
+        Args:
+            key: 32 字节密钥
+            nonce: nonce
+            data: 密文 + 认证标签
+            aad: 附加认证数据
+        
+        Returns:
+            明文
+        """
+
+
+class PycryptodomeAESGCM(AEADBackend):
+    """PyCryptodome 的 AES-256-GCM"""
+    
+    name = "pycryptodome"
+    algorithm = AES_256_GCM
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            from Crypto.Cipher import AES  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    
+    def encrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from Crypto.Cipher import AES
+        
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(aad)
+        encrypted_data, tag = cipher.encrypt_and_digest(data)
+        return encrypted_data + tag
+    
+    def decrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from Crypto.Cipher import AES
+        
+        if len(data) < AEAD_TAG_SIZE:
+            raise ValueError("密文长度不足")
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(aad)
+        return cipher.decrypt_and_verify(data[:-AEAD_TAG_SIZE], data[-AEAD_TAG_SIZE:])
+
+
+class PycryptodomeChaCha20Poly1305(AEADBackend):
+    """PyCryptodome 的 ChaCha20-Poly1305"""
+    
+    name = "pycryptodome"
+    algorithm = CHACHA20_POLY1305
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            from Crypto.Cipher import ChaCha20_Poly1305  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    
+    def encrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from Crypto.Cipher import ChaCha20_Poly1305
+        
+        cipher = ChaCha20_Poly1305.new(key=key, nonce=nonce)
+        cipher.update(aad)
+        encrypted_data, tag = cipher.encrypt_and_digest(data)
+        return encrypted_data + tag
+    
+    def decrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from Crypto.Cipher import ChaCha20_Poly1305
+        
+        if len(data) < AEAD_TAG_SIZE:
+            raise ValueError("密文长度不足")
+        cipher = ChaCha20_Poly1305.new(key=key, nonce=nonce)
+        cipher.update(aad)
+        return cipher.decrypt_and_verify(data[:-AEAD_TAG_SIZE], data[-AEAD_TAG_SIZE:])
+
+
+class CryptographyAESGCM(AEADBackend):
+    """cryptography（OpenSSL，可使用 AES-NI）的 AES-256-GCM"""
+    
+    name = "cryptography"
+    algorithm = AES_256_GCM
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    
+    def encrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        return AESGCM(key).encrypt(nonce, data, aad)
+    
+    def decrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        try:
+            return AESGCM(key).decrypt(nonce, data, aad)
+        except InvalidTag:
+            raise ValueError("MAC check failed")
+
+
+class CryptographyChaCha20Poly1305(AEADBackend):
+    """cryptography（OpenSSL）的 ChaCha20-Poly1305，适合没有 AES 硬件加速的 CPU"""
+    
+    name = "cryptography"
+    algorithm = CHACHA20_POLY1305
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    
+    def encrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+        
+        return ChaCha20Poly1305(key).encrypt(nonce, data, aad)
+    
+    def decrypt(self, key: bytes, nonce: bytes, data: bytes, aad: bytes) -> bytes:
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+        
+        try:
+            return ChaCha20Poly1305(key).decrypt(nonce, data, aad)
+        except InvalidTag:
+            raise ValueError("MAC check failed")
+
+
+class CipherBackends:
+    """认证加密后端注册表
+    
+    首次使用时对所有可用的 (库, 算法) 组合做一次微基准测速（同一进程内只测一次），
+    新文件使用最快的组合，其算法写入容器头部；解密时按头部记录的算法选择该算法最快的可用实现。
+    """
+    
+    BACKENDS = (CryptographyAESGCM, PycryptodomeAESGCM, CryptographyChaCha20Poly1305, PycryptodomeChaCha20Poly1305)
+    
+    # 进程内的测速结果缓存：[(后端, MB/s)]，按速度从快到慢排列
+    _benchmark: Optional[List[Tuple[AEADBackend, float]]] = None
+    _benchmark_lock = threading.Lock()
+    
+    @classmethod
+    def available_backends(cls) -> List[AEADBackend]:
+        """
+        获取当前环境可用的后端
+        
+        Returns:
+            后端实例列表
+        """
+        return [backend_class() for backend_class in cls.BACKENDS if backend_class.is_available()]
+    
+    @classmethod
+    def benchmark(cls, sample_size: int = BENCHMARK_SAMPLE_SIZE) -> List[Tuple[AEADBackend, float]]:
+        """
+        测量各可用后端的加密吞吐量（同一进程内只测一次）
+        
+        Args:
+            sample_size: 每次加密的数据量
+        
+        Returns:
+            (后端, MB/s) 列表，按速度从快到慢排列
+        """
+        with cls._benchmark_lock:
+            if cls._benchmark is None:
+                key, nonce, data = os.urandom(32), os.urandom(12), os.urandom(sample_size)
+                results = []
+                for backend in cls.available_backends():
+                    backend.encrypt(key, nonce, data, b"")
+                    elapsed = min(cls._measure(backend, key, nonce, data) for _ in range(3))
+                    results.append((backend, sample_size / max(elapsed, 1e-9) / 1024 ** 2))
+                if not results:
+                    raise ValueError("当前环境没有可用的加密库，请安装 pycryptodome 或 cryptography")
+                results.sort(key=lambda item: item[1], reverse=True)
+                cls._benchmark = results
+            return list(cls._benchmark)
+    
+    @classmethod
+    def select(cls) -> AEADBackend:
+        """
+        选择新文件使用的后端（测速最快者）
+        
+        Returns:
+            后端实例
+        """
+        return cls.benchmark()[0][0]
+    
+    @classmethod
+    def for_algorithm(cls, algorithm: str = AES_256_GCM) -> AEADBackend:
+        """
+        获取指定算法最快的可用实现
+        
+        Args:
+            algorithm: 算法名称
+        
+        Returns:
+            后端实例
+        """
+        for backend, _ in cls.benchmark():
+            if backend.algorithm == algorithm:
+                return backend
+        raise ValueError(f"不支持的加密算法或缺少对应的加密库: {algorithm!r}")
+    
+    @classmethod
+    def summary(cls) -> Dict[str, float]:
+        """
+        获取测速结果摘要（用于日志或界面展示）
+        
+        Returns:
+            "库/算法" 到 MB/s 的字典
+        """
+        return {f"{backend.name}/{backend.algorithm}": speed for backend, speed in cls.benchmark()}
+    
+    @staticmethod
+    def _measure(backend: AEADBackend, key: bytes, nonce: bytes, data: bytes) -> float:
+        """
+        测量一次加密的耗时
+        
+        Args:
+            backend: 后端
+            key: 密钥
+            nonce: nonce
+            data: 数据
+        
+        Returns:
+            耗时（秒）
+        """
+        start = time.perf_counter()
+        backend.encrypt(key, nonce, data, b"")
+        return time.perf_counter() - start
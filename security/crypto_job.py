@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可断点续传的流式加解密任务模块
+"""
+
+import json
+import os
+from typing import Callable, Optional, Sequence, Tuple, Union
+
+from file_handler.file_processor import FileProcessor
+from security.merkle import MerkleIndex
+from security.segmented_cipher import DEFAULT_SEGMENT_SIZE, SegmentedCipher
+from security.segmented_reader import DecryptingReader
+
+# 任务状态
+JOB_COMPLETED = "completed"
+JOB_RESUMED = "resumed"
+JOB_SKIPPED = "skipped"
+# 默认每写入多少段记录一次检查点
+DEFAULT_CHECKPOINT_SEGMENTS = 256
+
+
+class ResumableCryptoJob:
+    """可断点续传的流式加解密任务类
+    
+    输出先写入目标旁的隐藏文件 .<文件名>.partial，并在同目录维护日志 .<文件名>.journal。
+    每写入 checkpoint_segments 段，先 fsync 输出，再原子更新日志中已落盘的段数。
+    进程中断后重新运行同一任务时，从日志记录的最后一个落盘段继续，不必从头开始；
+    完成后输出被原子重命名为目标文件，日志标记为已完成，批量任务重跑时直接跳过。
+    
+    各分段使用独立的计数器 nonce，续传时用头部中原有的 nonce 前缀和密钥继续加密后续分段。
+    因此源文件必须与中断前完全相同：日志记录了源文件的大小、修改时间和 inode，任一项变化都会放弃旧的进度；
+    修改时间可能在精度范围内不变或被 touch -r 还原，所以续传前还会用原密钥和 nonce
+    重新加密当前源文件中对应的分段，与输出中续传点之后已写出的密文逐字节比对，
+    不一致时同样放弃旧的进度，换用新的密钥和 nonce 前缀从头开始，不会用同一 nonce 加密不同的明文。
+    
+    日志在任务完成后保留（用于重跑批量任务时跳过已完成的文件），不再需要时可调用 cleanup 删除。
+    """
+    
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE, max_workers: int = 1,
+                 checkpoint_segments: int = DEFAULT_CHECKPOINT_SEGMENTS,
+                 file_processor: Optional[FileProcessor] = None):
+        self.cipher = SegmentedCipher(segment_size, max_workers=max_workers)
+        self.checkpoint_segments = max(1, checkpoint_segments)
+        self.file_processor = file_processor or FileProcessor()
+    
+    def encrypt_file(self, src_path: str, dst_path: str,
+                     key_factory: Callable[[], Tuple[Union[bytes, Sequence[bytes]], dict]],
+                     key_provider: Callable[[dict], Union[bytes, Sequence[bytes]]],
+                     fields: Optional[dict] = None, wrap: bool = False, merkle: bool = False) -> str:
+        """
+        加密文件，可从上次中断处继续
+        
+        Args:
+            src_path: 源文件路径
+            dst_path: 输出的容器路径
+            key_factory: 新建容器时调用，返回 (密钥或各层密钥, 密钥派生字段)
+            key_provider: 续传时根据已写入的头部返回原密钥
+            fields: 写入头部的附加字段
+            wrap: 是否使用密钥封装模式
+            merkle: 是否追加 Merkle 完整性索引
+        
+        Returns:
+            任务状态（JOB_COMPLETED / JOB_RESUMED / JOB_SKIPPED）
+        """
+        source = self._source_state(src_path)
+        journal = self._load_journal(dst_path, "encrypt", source)
+        if journal.get("completed") and os.path.exists(dst_path):
+            return JOB_SKIPPED
+        
+        partial_path = self._sidecar_path(dst_path, "partial")
+        resumed = False
+        try:
+            if journal.get("segments") and os.path.exists(partial_path):
+                with open(partial_path, "rb") as f:
+                    header, header_bytes = SegmentedCipher.read_header(f)
+                    partial_size = f.seek(0, os.SEEK_END)
+                segment_size = header["segment_size"]
+                stored_segment_size = segment_size + SegmentedCipher.overhead(header)
+                # 最后一段需要带末段标志重新加密，续传点不能越过它
+                last_index = max(0, -(-source["size"] // segment_size) - 1)
+                start = min(journal["segments"], last_index)
+                resumed = partial_size >= len(header_bytes) + start * stored_segment_size
+            if resumed:
+                keys = SegmentedCipher.unlock_keys(header, key_provider(header))
+                # 续传点之后已写出的密文必须与当前源文件的加密结果一致，否则续传会造成 nonce 复用
+                resumed = self._matches_source(partial_path, src_path, keys, header_bytes, header, start,
+                                               last_index)
+            if not resumed:
+                key, key_fields = key_factory()
+                keys, header_bytes, header = self.cipher.prepare_header(key, fields, key_fields, wrap, merkle)
+                segment_size = header["segment_size"]
+                stored_segment_size = segment_size + SegmentedCipher.overhead(header)
+                start = 0
+            
+            with open(partial_path, "r+b" if resumed else "wb") as f:
+                if resumed:
+                    f.truncate(len(header_bytes) + start * stored_segment_size)
+                    f.seek(0, os.SEEK_END)
+                    leaves = self._read_leaves(f, len(header_bytes), start, stored_segment_size) \
+                        if header.get("merkle") else bytearray()
+                else:
+                    f.write(header_bytes)
+                    leaves = bytearray()
+                
+                journal = {"op": "encrypt", "source": source, "segments": start, "completed": False}
+                chunks = self.file_processor.iter_file_chunks(src_path, offset=start * segment_size)
+                for result in self.cipher.encrypt_segments(chunks, keys, header_bytes, header, start):
+                    if header.get("merkle"):
+                        result, leaf = result
+                        leaves += leaf
+                    f.write(result)
+                    journal["segments"] += 1
+                    if journal["segments"] % self.checkpoint_segments == 0:
+                        self._checkpoint(f, dst_path, journal)
+                if header.get("merkle"):
+                    aad = SegmentedCipher.payload_aad(header_bytes, header)
+                    for chunk in MerkleIndex.iter_trailer(leaves, aad, SegmentedCipher.index_key(keys)):
+                        f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            raise IOError(f"加密文件失败: {str(e)}")
+        
+        self._finish(partial_path, dst_path, journal)
+        return JOB_RESUMED if resumed else JOB_COMPLETED
+    
+    def decrypt_file(self, src_path: str, dst_path: str,
+                     key_provider: Callable[[dict], Union[bytes, Sequence[bytes]]]) -> str:
+        """
+        解密文件，可从上次中断处继续
+        
+        Args:
+            src_path: 容器路径
+            dst_path: 输出的明文路径
+            key_provider: 根据头部返回密钥的函数
+        
+        Returns:
+            任务状态（JOB_COMPLETED / JOB_RESUMED / JOB_SKIPPED）
+        """
+        source = self._source_state(src_path)
+        journal = self._load_journal(dst_path, "decrypt", source)
+        if journal.get("completed") and os.path.exists(dst_path):
+            return JOB_SKIPPED
+        
+        partial_path = self._sidecar_path(dst_path, "partial")
+        try:
+            with DecryptingReader(src_path, key_provider) as reader:
+                if "compression" in reader.header:
+                    raise ValueError("压缩过的容器不支持断点续传")
+                segment_size = reader.segment_size
+                start = journal.get("segments", 0)
+                resumed = start > 0 and os.path.exists(partial_path) \
+                    and os.path.getsize(partial_path) >= start * segment_size
+                if not resumed:
+                    start = 0
+                journal = {"op": "decrypt", "source": source, "segments": start, "completed": False}
+                with open(partial_path, "r+b" if resumed else "wb") as f:
+                    f.truncate(start * segment_size)
+                    f.seek(0, os.SEEK_END)
+                    reader.seek(start * segment_size)
+                    while True:
+                        # 读取位置与分段边界对齐，每次恰好解密一段
+                        data = reader.read(segment_size)
+                        if not data:
+                            break
+                        f.write(data)
+                        journal["segments"] += 1
+                        if journal["segments"] % self.checkpoint_segments == 0:
+                            self._checkpoint(f, dst_path, journal)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            raise IOError(f"解密文件失败: {str(e)}")
+        
+        self._finish(partial_path, dst_path, journal)
+        return JOB_RESUMED if resumed else JOB_COMPLETED
+    
+    def cleanup(self, dst_path: str) -> None:
+        """
+        删除目标文件旁的日志和未完成的输出（任务完成后日志会一直保留，直到调用此方法）
+        
+        删除后重新运行已完成的任务不会再被跳过。
+        
+        Args:
+            dst_path: 目标路径
+        """
+        for suffix in ("journal", "partial"):
+            try:
+                os.remove(self._sidecar_path(dst_path, suffix))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                raise IOError(f"删除文件失败: {str(e)}")
+    
+    def _matches_source(self, partial_path: str, src_path: str, keys: Sequence[bytes], header_bytes: bytes,
+                        header: dict, start: int, last_index: int) -> bool:
+        """
+        检查输出中续传点之后已写出的密文是否与当前源文件用同一密钥和 nonce 加密的结果一致
+        
+        最后一段可能只写出了一部分，按已写出的长度比对前缀；最后一段之后的索引数据不参与比对。
+        
+        Args:
+            partial_path: 未完成的输出路径
+            src_path: 源文件路径
+            keys: 原容器的各层密钥
+            header_bytes: 原容器的头部字节
+            header: 原容器的头部字典
+            start: 续传点（段序号）
+            last_index: 当前源文件最后一段的序号
+        
+        Returns:
+            是否一致（续传点之后没有写出任何密文时也为 True）
+        """
+        segment_size = header["segment_size"]
+        stored_segment_size = segment_size + SegmentedCipher.overhead(header)
+        nonce_prefix = bytes.fromhex(header["nonce_prefix"])
+        aad = SegmentedCipher.payload_aad(header_bytes, header)
+        backend = SegmentedCipher.header_backend(header)
+        with open(partial_path, "rb") as partial, open(src_path, "rb") as src:
+            partial.seek(len(header_bytes) + start * stored_segment_size)
+            src.seek(start * segment_size)
+            for index in range(start, last_index + 1):
+                written = partial.read(stored_segment_size)
+                if not written:
+                    break
+                expected = SegmentedCipher.encrypt_layers(keys, nonce_prefix, aad, index, src.read(segment_size),
+                                                          index == last_index, backend)
+                if expected[:len(written)] != written:
+                    return False
+        return True
+    
+    def _checkpoint(self, f, dst_path: str, journal: dict) -> None:
+        """
+        记录检查点：输出先落盘，日志后更新，日志中的段数永远不超过已落盘的段数
+        
+        Args:
+            f: 输出文件对象
+            dst_path: 目标路径
+            journal: 日志内容
+        """
+        f.flush()
+        os.fsync(f.fileno())
+        self._write_journal(dst_path, journal)
+    
+    def _finish(self, partial_path: str, dst_path: str, journal: dict) -> None:
+        """
+        完成任务：将输出重命名为目标文件并标记日志
+        
+        日志的原子写入会 fsync 所在目录，重命名也随之落盘。
+        
+        Args:
+            partial_path: 输出的临时文件路径
+            dst_path: 目标路径
+            journal: 日志内容
+        """
+        try:
+            os.replace(partial_path, dst_path)
+        except OSError as e:
+            raise IOError(f"重命名文件失败: {str(e)}")
+        journal["completed"] = True
+        self._write_journal(dst_path, journal)
+    
+    def _write_journal(self, dst_path: str, journal: dict) -> None:
+        """
+        原子写入日志
+        
+        Args:
+            dst_path: 目标路径
+            journal: 日志内容
+        """
+        data = json.dumps(journal, sort_keys=True).encode("utf-8")
+        self.file_processor.write_file(self._sidecar_path(dst_path, "journal"), data, atomic=True)
+    
+    def _load_journal(self, dst_path: str, op: str, source: dict) -> dict:
+        """
+        读取日志；日志不存在、损坏或与当前任务（操作类型、源文件状态）不符时返回空日志
+        
+        Args:
+            dst_path: 目标路径
+            op: 操作类型
+            source: 源文件状态
+        
+        Returns:
+            日志内容
+        """
+        try:
+            with open(self._sidecar_path(dst_path, "journal"), "rb") as f:
+                journal = json.loads(f.read().decode("utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(journal, dict) or journal.get("op") != op or journal.get("source") != source \
+                or not isinstance(journal.get("segments"), int):
+            return {}
+        return journal
+    
+    @staticmethod
+    def _source_state(src_path: str) -> dict:
+        """
+        获取用于判断源文件是否变化的状态
+        
+        Args:
+            src_path: 源文件路径
+        
+        Returns:
+            状态字典
+        """
+        try:
+            st = os.stat(src_path)
+        except OSError as e:
+            raise IOError(f"获取文件信息失败: {str(e)}")
+        return {"path": os.path.abspath(src_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+    
+    @staticmethod
+    def _sidecar_path(dst_path: str, suffix: str) -> str:
+        """
+        获取目标文件旁的隐藏辅助文件路径
+        
+        Args:
+            dst_path: 目标路径
+            suffix: 后缀（partial / journal）
+        
+        Returns:
+            辅助文件路径
+        """
+        directory, name = os.path.split(os.path.abspath(dst_path))
+        return os.path.join(directory, f".{name}.{suffix}")
+    
+    @staticmethod
+    def _read_leaves(f, header_size: int, count: int, stored_segment_size: int) -> bytearray:
+        """
+        续传时重新计算已写入分段的叶子哈希
+        
+        Args:
+            f: 输出文件对象
+            header_size: 头部字节数
+            count: 已写入的段数
+            stored_segment_size: 完整密文段的长度
+        
+        Returns:
+            连续存放的叶子哈希
+        """
+        position = f.tell()
+        f.seek(header_size)
+        leaves = bytearray()
+        for _ in range(count):
+            leaves += MerkleIndex.leaf_hash(f.read(stored_segment_size))
+        f.seek(position)
+        return leaves
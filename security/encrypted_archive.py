@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多文件加密归档模块
+"""
+
+import json
+import os
+import struct
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from file_handler.file_processor import FileProcessor
+from security.segmented_cipher import DEFAULT_SEGMENT_SIZE, SegmentedCipher
+from security.segmented_reader import DecryptingReader
+
+# 明文末尾的目录定位信息：魔数(4) + 目录偏移(8) + 目录长度(8)
+ARCHIVE_TRAILER = struct.Struct(">4sQQ")
+ARCHIVE_MAGIC = b"DTOC"
+# 目录长度上限，防止恶意文件导致分配超大缓冲区
+MAX_TOC_SIZE = 256 * 1024 * 1024
+
+
+class ArchiveMember(NamedTuple):
+    """归档成员信息"""
+    name: str
+    offset: int
+    size: int
+    modified_time: float
+
+
+class EncryptedArchive:
+    """多文件加密归档类
+    
+    所有成员依次写入同一个分段加密容器，末尾追加 JSON 目录和定长的定位信息，
+    目录与文件内容一样是加密的。整个归档只执行一次 KDF、只有一个头部、只需一次 fsync。
+    读取时借助 DecryptingReader 随机访问：列出成员只解密末尾的目录，
+    提取单个成员只解密它所在的分段。
+    """
+    
+    def __init__(self, source: Union[str, BinaryIO],
+                 key_provider: Callable[[dict], Union[bytes, Sequence[bytes]]], cache_segments: int = 8):
+        self._reader = DecryptingReader(source, key_provider, cache_segments)
+        try:
+            self.header = self._reader.header
+            if not self.header.get("archive"):
+                raise ValueError("不是加密归档文件")
+            self._members = self._read_toc()
+        except Exception:
+            self._reader.close()
+            raise
+    
+    @staticmethod
+    def build(members: Iterable[Tuple[str, str]], keys: Union[bytes, Sequence[bytes]],
+              fields: Optional[dict] = None, segment_size: int = DEFAULT_SEGMENT_SIZE,
+              max_workers: int = 1, file_processor: Optional[FileProcessor] = None,
+              key_fields: Optional[dict] = None, wrap: bool = False, merkle: bool = False) -> Iterator[bytes]:
+        """
+        流式生成加密归档，内存占用与成员数量和大小基本无关（只保存目录）
+        
+        可直接交给 FileProcessor.write_file_chunks(dst, ..., atomic=True) 写入。
+        
+        Args:
+            members: (归档内名称, 源文件路径) 的可迭代对象
+            keys: 密钥（或按层排列的密钥列表）
+            fields: 附加的头部字段（如 KDF 盐值）
+            segment_size: 分段大小
+            max_workers: 并行加密的线程数
+            file_processor: 读取源文件使用的 FileProcessor
+            key_fields: 与密钥对应的派生字段（见 SegmentedCipher.encrypt_stream）
+            wrap: 是否使用密钥封装模式
+            merkle: 是否追加 Merkle 完整性索引
+        
+        Returns:
+            加密归档字节块的迭代器
+        """
+        header_fields = dict(fields or {})
+        header_fields["archive"] = 1
+        cipher = SegmentedCipher(segment_size, max_workers=max_workers)
+        plaintext = EncryptedArchive._iter_plaintext(members, file_processor or FileProcessor())
+        return cipher.encrypt_stream(plaintext, keys, header_fields, key_fields, wrap, merkle)
+    
+    def list_members(self) -> List[ArchiveMember]:
+        """
+        列出归档成员（按在归档中的顺序）
+        
+        Returns:
+            成员信息列表
+        """
+        return sorted(self._members.values(), key=lambda member: member.offset)
+    
+    def get_member(self, name: str) -> ArchiveMember:
+        """
+        获取成员信息
+        
+        Args:
+            name: 归档内名称
+        
+        Returns:
+            成员信息
+        """
+        member = self._members.get(name)
+        if member is None:
+            raise KeyError(f"归档中不存在成员: {name}")
+        return member
+    
+    def iter_member_chunks(self, name: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        分块读取单个成员的内容
+        
+        Args:
+            name: 归档内名称
+            chunk_size: 每块大小
+        
+        Returns:
+            成员内容数据块的迭代器
+        """
+        member = self.get_member(name)
+        self._reader.seek(member.offset)
+        remaining = member.size
+        while remaining > 0:
+            data = self._reader.read(min(chunk_size, remaining))
+            if not data:
+                raise ValueError(f"归档数据不完整: {name}")
+            remaining -= len(data)
+            yield data
+    
+    def read_member(self, name: str) -> bytes:
+        """
+        读取单个成员的全部内容
+        
+        Args:
+            name: 归档内名称
+        
+        Returns:
+            成员内容
+        """
+        return b"".join(self.iter_member_chunks(name))
+    
+    def extract(self, name: str, dst_path: str, file_processor: Optional[FileProcessor] = None) -> None:
+        """
+        提取单个成员到文件（原子写入）
+        
+        Args:
+            name: 归档内名称
+            dst_path: 目标文件路径
+            file_processor: 写入使用的 FileProcessor
+        """
+        file_processor = file_processor or FileProcessor()
+        member = self.get_member(name)
+        file_processor.write_file_chunks(dst_path, self.iter_member_chunks(name), atomic=True,
+                                         expected_size=member.size)
+        os.utime(dst_path, (member.modified_time, member.modified_time))
+    
+    def extract_all(self, dst_dir: str, file_processor: Optional[FileProcessor] = None) -> List[str]:
+        """
+        按归档顺序提取全部成员（顺序读取密文，整批只落盘一次）
+        
+        Args:
+            dst_dir: 目标目录
+            file_processor: 写入使用的 FileProcessor
+        
+        Returns:
+            提取出的文件路径列表
+        """
+        file_processor = file_processor or FileProcessor()
+        root = os.path.realpath(dst_dir)
+        targets = []
+        for member in self.list_members():
+            dst_path = os.path.realpath(os.path.join(root, member.name))
+            # 拒绝通过 ../ 或绝对路径写到目标目录之外
+            if os.path.commonpath([root, dst_path]) != root or dst_path == root:
+                raise ValueError(f"成员路径无效: {member.name}")
+            targets.append((member, dst_path))
+        
+        with file_processor.group_commit():
+            for member, dst_path in targets:
+                os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                file_processor.write_file_chunks(dst_path, self.iter_member_chunks(member.name), atomic=True,
+                                                 expected_size=member.size)
+        for member, dst_path in targets:
+            os.utime(dst_path, (member.modified_time, member.modified_time))
+        return [dst_path for _, dst_path in targets]
+    
+    def close(self) -> None:
+        """
+        关闭归档
+        """
+        self._reader.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def _read_toc(self) -> Dict[str, ArchiveMember]:
+        """
+        读取末尾的定位信息和目录
+        
+        Returns:
+            名称到成员信息的字典
+        """
+        size = self._reader.size
+        if size < ARCHIVE_TRAILER.size:
+            raise ValueError("归档数据不完整")
+        self._reader.seek(size - ARCHIVE_TRAILER.size)
+        magic, toc_offset, toc_length = ARCHIVE_TRAILER.unpack(self._reader.read(ARCHIVE_TRAILER.size))
+        if magic != ARCHIVE_MAGIC or toc_length > MAX_TOC_SIZE \
+                or toc_offset + toc_length != size - ARCHIVE_TRAILER.size:
+            raise ValueError("归档目录无效")
+        
+        self._reader.seek(toc_offset)
+        try:
+            entries = json.loads(self._reader.read(toc_length).decode("utf-8"))
+            members = {}
+            for entry in entries:
+                member = ArchiveMember(entry["name"], entry["offset"], entry["size"], entry["mtime"])
+                if member.offset + member.size > toc_offset:
+                    raise ValueError(member.name)
+                members[member.name] = member
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"归档目录无效: {str(e)}")
+        return members
+    
+    @staticmethod
+    def _iter_plaintext(members: Iterable[Tuple[str, str]], file_processor: FileProcessor) -> Iterator[bytes]:
+        """
+        产出归档的明文：各成员内容 + JSON 目录 + 定位信息
+        
+        Args:
+            members: (归档内名称, 源文件路径) 的可迭代对象
+            file_processor: 读取源文件使用的 FileProcessor
+        
+        Returns:
+            明文数据块的迭代器
+        """
+        entries = []
+        names = set()
+        offset = 0
+        for name, file_path in members:
+            name = name.replace(os.sep, "/")
+            if name in names:
+                raise ValueError(f"归档成员名称重复: {name}")
+            names.add(name)
+            
+            modified_time = os.stat(file_path).st_mtime
+            size = 0
+            for chunk in file_processor.iter_file_chunks(file_path):
+                size += len(chunk)
+                yield chunk
+            entries.append({"name": name, "offset": offset, "size": size, "mtime": modified_time})
+            offset += size
+        
+        toc = json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        yield toc
+        yield ARCHIVE_TRAILER.pack(ARCHIVE_MAGIC, offset, len(toc))
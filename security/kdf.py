@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可插拔密钥派生模块
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import List, Optional
+
+# 旧格式固定使用的 KDF 参数（未在头部记录参数的数据按此解析）
+LEGACY_KDF_PARAMS = {"name": "pbkdf2-sha256", "iterations": 100000}
+# 默认的目标派生耗时（毫秒）
+DEFAULT_TARGET_MS = 250
+# 校准时 PBKDF2 迭代次数的下限
+MIN_PBKDF2_ITERATIONS = 50000
+# 接受的参数上限：头部中的 KDF 参数在认证之前就会被执行，上限只比校准可能给出的值略宽，
+# 防止构造的文件耗尽内存或长时间占用 CPU
+MAX_KDF_MEMORY = 1024 * 1024 * 1024
+MAX_PBKDF2_ITERATIONS = 10000000
+MAX_SCRYPT_PARALLELISM = 4
+MAX_ARGON2_TIME_COST = 10
+MAX_ARGON2_PARALLELISM = 16
+# 各算法参数字典允许的键
+PARAM_KEYS = {
+    "pbkdf2-sha256": {"name", "iterations"},
+    "scrypt": {"name", "n", "r", "p"},
+    "argon2id": {"name", "time_cost", "memory_cost", "parallelism"},
+}
+
+
+class KeyDeriver:
+    """密钥派生类
+    
+    支持 PBKDF2-SHA256、scrypt 以及（安装了 argon2-cffi 时的）Argon2id。
+    KDF 参数以字典表示（如 {"name": "scrypt", "n": 32768, "r": 8, "p": 1}），
+    随密文一起写入容器头部，因此旧文件始终可以按其记录的参数解密，新文件则按本机性能校准。
+    """
+    
+    # 进程内的校准结果缓存：(算法, 目标耗时) -> 参数
+    _calibrations = {}
+    _calibration_lock = threading.Lock()
+    
+    @staticmethod
+    def available_algorithms() -> List[str]:
+        """
+        获取当前环境可用的 KDF 算法（按推荐程度排序）
+        
+        Returns:
+            算法名称列表
+        """
+        algorithms = []
+        try:
+            import argon2.low_level  # noqa: F401
+            algorithms.append("argon2id")
+        except ImportError:
+            pass
+        if hasattr(hashlib, "scrypt"):
+            algorithms.append("scrypt")
+        algorithms.append("pbkdf2-sha256")
+        return algorithms
+    
+    @classmethod
+    def derive_key(cls, password: bytes, salt: bytes, params: dict, length: int = 32) -> bytes:
+        """
+        按参数派生密钥
+        
+        Args:
+            password: 密码
+            salt: 盐值
+            params: KDF 参数字典
+            length: 密钥长度
+        
+        Returns:
+            派生的密钥
+        """
+        cls.validate_params(params)
+        name = params["name"]
+        if name == "pbkdf2-sha256":
+            return hashlib.pbkdf2_hmac("sha256", password, salt, params["iterations"], length)
+        if name == "scrypt":
+            n, r, p = params["n"], params["r"], params["p"]
+            return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                                  maxmem=128 * n * r * p + 1024 * 1024, dklen=length)
+        # argon2id
+        try:
+            from argon2.low_level import Type, hash_secret_raw
+        except ImportError:
+            raise ValueError("当前环境未安装 argon2-cffi，无法使用 Argon2id")
+        return hash_secret_raw(password, salt, time_cost=params["time_cost"], memory_cost=params["memory_cost"],
+                               parallelism=params["parallelism"], hash_len=length, type=Type.ID)
+    
+    @staticmethod
+    def validate_params(params: dict) -> None:
+        """
+        校验 KDF 参数（参数可能来自不可信的文件头部，需防止被用来耗尽内存或 CPU）
+        
+        内存占用不超过 MAX_KDF_MEMORY（scrypt 约 128·n·r·p 字节，Argon2id 为 memory_cost KiB），
+        计算量上限与校准可能给出的参数同一量级。
+        
+        Args:
+            params: KDF 参数字典
+        """
+        if not isinstance(params, dict):
+            raise ValueError(f"KDF 参数无效: {params!r}")
+        
+        def check(key, low, high):
+            value = params.get(key)
+            if type(value) is not int or not low <= value <= high:
+                raise ValueError(f"KDF 参数无效: {key}={value!r}")
+        
+        name = params.get("name")
+        if name not in PARAM_KEYS:
+            raise ValueError(f"不支持的 KDF 算法: {name!r}")
+        if set(params) != PARAM_KEYS[name]:
+            raise ValueError(f"KDF 参数无效: {sorted(params)}")
+        if name == "pbkdf2-sha256":
+            check("iterations", 1000, MAX_PBKDF2_ITERATIONS)
+        elif name == "scrypt":
+            check("n", 2, 2 ** 20)
+            check("r", 1, 16)
+            check("p", 1, MAX_SCRYPT_PARALLELISM)
+            if params["n"] & (params["n"] - 1):
+                raise ValueError("KDF 参数无效: scrypt 的 n 必须是 2 的幂")
+            if 128 * params["n"] * params["r"] * params["p"] > MAX_KDF_MEMORY:
+                raise ValueError("KDF 参数无效: scrypt 内存占用超过上限")
+        else:
+            check("time_cost", 1, MAX_ARGON2_TIME_COST)
+            check("memory_cost", 8 * 1024, MAX_KDF_MEMORY // 1024)
+            check("parallelism", 1, MAX_ARGON2_PARALLELISM)
+    
+    @classmethod
+    def calibrate(cls, name: Optional[str] = None, target_ms: int = DEFAULT_TARGET_MS) -> dict:
+        """
+        测试本机性能，选出单次派生耗时约为 target_ms 的参数（同一进程内只校准一次）
+        
+        Args:
+            name: KDF 算法，None 表示选择最推荐的可用算法
+            target_ms: 目标耗时（毫秒）
+        
+        Returns:
+            KDF 参数字典
+        """
+        name = name or cls.available_algorithms()[0]
+        with cls._calibration_lock:
+            cache_key = (name, target_ms)
+            if cache_key not in cls._calibrations:
+                calibrate_func = {
+                    "pbkdf2-sha256": cls._calibrate_pbkdf2,
+                    "scrypt": cls._calibrate_scrypt,
+                    "argon2id": cls._calibrate_argon2id,
+                }.get(name)
+                if calibrate_func is None:
+                    raise ValueError(f"不支持的 KDF 算法: {name!r}")
+                cls._calibrations[cache_key] = calibrate_func(target_ms / 1000.0)
+            return dict(cls._calibrations[cache_key])
+    
+    @classmethod
+    def _measure(cls, params: dict) -> float:
+        """
+        测量一次派生的耗时
+        
+        Args:
+            params: KDF 参数字典
+        
+        Returns:
+            耗时（秒）
+        """
+        start = time.perf_counter()
+        cls.derive_key(b"calibration", os.urandom(16), params)
+        return time.perf_counter() - start
+    
+    @classmethod
+    def _calibrate_pbkdf2(cls, target: float) -> dict:
+        """
+        校准 PBKDF2 迭代次数（耗时与迭代次数成正比）
+        
+        Args:
+            target: 目标耗时（秒）
+        
+        Returns:
+            KDF 参数字典
+        """
+        probe = 20000
+        elapsed = cls._measure({"name": "pbkdf2-sha256", "iterations": probe})
+        iterations = int(probe * target / max(elapsed, 1e-6)) // 1000 * 1000
+        iterations = min(MAX_PBKDF2_ITERATIONS, max(MIN_PBKDF2_ITERATIONS, iterations))
+        return {"name": "pbkdf2-sha256", "iterations": iterations}
+    
+    @classmethod
+    def _calibrate_scrypt(cls, target: float) -> dict:
+        """
+        校准 scrypt 的 n（r=8, p=1，n 每翻倍耗时与内存约翻倍，内存上限 256MB）
+        
+        Args:
+            target: 目标耗时（秒）
+        
+        Returns:
+            KDF 参数字典
+        """
+        params = {"name": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+        elapsed = cls._measure(params)
+        while elapsed * 2 <= target and params["n"] < 2 ** 18:
+            params["n"] *= 2
+            elapsed = cls._measure(params)
+        return params
+    
+    @classmethod
+    def _calibrate_argon2id(cls, target: float) -> dict:
+        """
+        校准 Argon2id：优先使用 64MB 内存，过慢时减少内存，过快时增加迭代次数
+        
+        Args:
+            target: 目标耗时（秒）
+        
+        Returns:
+            KDF 参数字典
+        """
+        params = {"name": "argon2id", "time_cost": 1, "memory_cost": 64 * 1024,
+                  "parallelism": min(4, os.cpu_count() or 1)}
+        elapsed = cls._measure(params)
+        while elapsed > target and params["memory_cost"] > 8 * 1024:
+            params["memory_cost"] //= 2
+            elapsed = cls._measure(params)
+        params["time_cost"] = max(1, min(MAX_ARGON2_TIME_COST, int(target / max(elapsed, 1e-6))))
+        return params
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+密钥派生缓存模块
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+
+
+class KeyCache:
+    """密钥派生缓存类
+    
+    以 (密码摘要, 盐值, KDF 参数) 为键缓存派生出的密钥，避免同一会话内重复执行昂贵的 KDF。
+    条目数有上限（LRU 淘汰）并有存活时间，淘汰或清空时会先将缓存的密钥内存清零。
+    多个线程同时未命中同一个键时只有一个线程执行 KDF，其余线程等待它的结果。
+    """
+    
+    def __init__(self, max_entries: int = 64, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # 正在派生的键 -> 等待派生结果的 Future
+        self._pending = {}
+        self._lock = threading.Lock()
+    
+    def get_or_derive(self, password: bytes, salt: bytes, params: tuple, derive: Callable[[], bytes]) -> bytes:
+        """
+        获取缓存的密钥，未命中或已过期时调用 derive 派生并缓存
+        
+        Args:
+            password: 密码
+            salt: 盐值
+            params: 影响派生结果的 KDF 参数（算法、迭代次数、长度等）
+            derive: 实际执行 KDF 的函数
+        
+        Returns:
+            派生的密钥
+        """
+        # 不直接保存明文密码
+        cache_key = (hashlib.sha256(password).digest(), bytes(salt), params)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                return bytes(entry[0])
+            pending = self._pending.get(cache_key)
+            is_owner = pending is None
+            if is_owner:
+                pending = self._pending[cache_key] = Future()
+        
+        if not is_owner:
+            # 其他线程正在派生同一个密钥，等待其结果（派生失败时抛出同样的异常）
+            return pending.result()
+        
+        # KDF 耗时较长，在锁外执行
+        try:
+            key = derive()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[cache_key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[cache_key]
+            self._entries[cache_key] = (bytearray(key), time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                _, (buffer, _) = self._entries.popitem(last=False)
+                self._zeroize(buffer)
+        pending.set_result(key)
+        return key
+    
+    def clear(self) -> None:
+        """
+        清空缓存并清零所有密钥
+        """
+        with self._lock:
+            for buffer, _ in self._entries.values():
+                self._zeroize(buffer)
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _expire(self, now: float) -> None:
+        """
+        淘汰已过期的条目（调用方需持有锁）
+        
+        Args:
+            now: 当前单调时间
+        """
+        expired = [cache_key for cache_key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for cache_key in expired:
+            buffer, _ = self._entries.pop(cache_key)
+            self._zeroize(buffer)
+    
+    @staticmethod
+    def _zeroize(buffer: bytearray) -> None:
+        """
+        将密钥缓冲区清零
+        
+        Args:
+            buffer: 密钥缓冲区
+        """
+        buffer[:] = bytes(len(buffer))
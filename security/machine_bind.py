@@ -4,10 +4,26 @@
 机器绑定模块
 """
 
+import os
 import platform
 import hashlib
+import itertools
 import subprocess
 import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Tuple
+
+from file_handler.compressor import StreamCompressor
+from file_handler.file_processor import FileProcessor
+from security.cipher_backend import AES_256_GCM, CipherBackends
+from security.crypto_job import DEFAULT_CHECKPOINT_SEGMENTS, ResumableCryptoJob
+from security.encrypted_archive import EncryptedArchive
+from security.kdf import LEGACY_KDF_PARAMS, KeyDeriver
+from security.key_cache import KeyCache
+from security.segmented_cipher import DEFAULT_SEGMENT_SIZE, SegmentedCipher
+from security.segmented_reader import DecryptingReader
 
 
 class MachineBinder:
@@ -15,6 +31,12 @@ class MachineBinder:
     
     def __init__(self):
         self.machine_id = self.get_machine_id()
+        # 会话内的密钥派生缓存
+        self.key_cache = KeyCache()
+        # 流式绑定使用的 KDF 参数，None 表示首次使用时按本机性能校准
+        self.kdf_params: Optional[dict] = None
+        # 线程独立的状态：批量绑定期间共享的主密钥盐值
+        self._local = threading.local()
     
     def get_machine_id(self) -> str:
         """
@@ -148,27 +170,15 @@ class MachineBinder:
         """
         # 生成绑定密钥（基于机器ID和随机盐值）
         salt = os.urandom(16)
+        key = self._derive_key(salt)
         
-        # 使用PBKDF2生成密钥
-        from Crypto.Protocol.KDF import PBKDF2
-        from Crypto.Hash import SHA256
-        key = PBKDF2(
-            password=self.machine_id.encode(),
-            salt=salt,
-            dkLen=32,
-            count=100000,
-            hmac_hash_module=SHA256
-        )
-        
-        # 使用AES-GCM加密数据
-        from Crypto.Cipher import AES
+        # 使用AES-GCM加密数据（由当前环境最快的实现执行，输出格式不变）
         from Crypto.Random import get_random_bytes
         iv = get_random_bytes(16)
-        cipher = AES.new(key, AES.MODE_GCM, iv)
-        encrypted_data, tag = cipher.encrypt_and_digest(data)
+        backend = CipherBackends.for_algorithm(AES_256_GCM)
         
         # 返回格式：盐值(16字节) + IV(16字节) + 密文 + 认证标签(16字节)
-        return salt + iv + encrypted_data + tag
+        return salt + iv + backend.encrypt(key, iv, data, b"")
     
     def unbind_from_machine(self, bound_data: bytes) -> bytes:
         """
@@ -184,30 +194,332 @@ class MachineBinder:
         if len(bound_data) < 48:  # 盐值(16) + IV(16) + 至少1字节密文 + 标签(16)
             raise ValueError("绑定数据长度不足，无法提取必要信息")
         
-        # 提取盐值、IV、密文和认证标签
+        # 提取盐值、IV，其后为密文和认证标签
         salt = bound_data[:16]
         iv = bound_data[16:32]
-        tag = bound_data[-16:]
-        encrypted_data = bound_data[32:-16]
+        encrypted_data = bound_data[32:]
         
         # 生成绑定密钥（基于机器ID和盐值）
-        from Crypto.Protocol.KDF import PBKDF2
-        from Crypto.Hash import SHA256
-        key = PBKDF2(
-            password=self.machine_id.encode(),
-            salt=salt,
-            dkLen=32,
-            count=100000,
-            hmac_hash_module=SHA256
-        )
+        key = self._derive_key(salt)
         
         # 使用AES-GCM解密数据
-        from Crypto.Cipher import AES
-        cipher = AES.new(key, AES.MODE_GCM, iv)
+        backend = CipherBackends.for_algorithm(AES_256_GCM)
         
         try:
             # 解密数据并验证认证标签
-            original_data = cipher.decrypt_and_verify(encrypted_data, tag)
+            original_data = backend.decrypt(key, iv, encrypted_data, b"")
             return original_data
         except ValueError:
             raise ValueError("机器ID不匹配或数据已被篡改，无法解绑")
+    
+    @contextmanager
+    def batch(self):
+        """
+        批量绑定上下文：整批文件只执行一次 KDF
+        
+        上下文内的 bind_stream 共用一个主密钥（批次盐值 + KDF），每个文件再以独立的随机盐值
+        通过 HKDF 派生子密钥；解绑同一批次的文件时主密钥也会命中缓存。
+        
+        批次按线程独立，只影响当前线程内的绑定；嵌套使用时并入外层批次。
+        
+        Returns:
+            本批次的主密钥盐值
+        """
+        batch_salt = getattr(self._local, "batch_salt", None)
+        if batch_salt is not None:
+            yield batch_salt
+            return
+        
+        batch_salt = self._local.batch_salt = os.urandom(16)
+        try:
+            yield batch_salt
+        finally:
+            self._local.batch_salt = None
+    
+    def bind_stream(self, chunks: Iterable[bytes], segment_size: int = DEFAULT_SEGMENT_SIZE,
+                    max_workers: int = 1, compression: Optional[str] = None, wrap: bool = False,
+                    merkle: bool = True) -> Iterator[bytes]:
+        """
+        流式机器绑定：按固定大小分段加密，内存占用与数据大小无关
+        
+        可与 FileProcessor 组合使用，例如
+        write_file_chunks(dst, bind_stream(iter_file_chunks(src)), atomic=True)
+        
+        Args:
+            chunks: 要绑定的数据块的可迭代对象
+            segment_size: 分段大小
+            max_workers: 并行加密的线程数
+            compression: 加密前使用的压缩算法（"zlib"/"lzma"/"zstd"），None 表示不压缩；
+                         已压缩的数据（jpg/zip/docx 等）会自动跳过
+            wrap: 是否使用密钥封装模式（之后可用 rebind_files 迁移到其他机器而无需重新加密）
+            merkle: 是否追加完整性索引（可用 SegmentedCipher.verify_files 不解密巡检，传入密钥时可确认未被篡改）
+            
+        Returns:
+            分段容器字节块的迭代器
+        """
+        key, key_fields = self._new_stream_key()
+        fields = {}
+        if compression:
+            algorithm, chunks = StreamCompressor(compression).compress_stream(chunks)
+            if algorithm:
+                fields["compression"] = algorithm
+        cipher = SegmentedCipher(segment_size, max_workers=max_workers)
+        return cipher.encrypt_stream(chunks, key, fields, key_fields, wrap, merkle)
+    
+    def unbind_stream(self, chunks: Iterable[bytes], max_workers: int = 1) -> Iterator[bytes]:
+        """
+        流式解除机器绑定，逐段验证并解密
+        
+        Args:
+            chunks: bind_stream 生成的容器数据块的可迭代对象
+            max_workers: 并行解密的线程数
+            
+        Returns:
+            原始数据块的迭代器
+        """
+        header = {}
+        
+        def key_provider(container_header: dict) -> bytes:
+            header.update(container_header)
+            return self._bound_key_provider(container_header)
+        
+        cipher = SegmentedCipher(max_workers=max_workers)
+        plain_chunks = iter(cipher.decrypt_stream(chunks, key_provider))
+        # 头部在产出第一个数据块前解析，之后才能确定是否需要解压
+        first = next(plain_chunks, None)
+        chunks = itertools.chain(() if first is None else (first,), plain_chunks)
+        if "compression" in header:
+            yield from StreamCompressor.decompress_stream(chunks, header["compression"])
+        else:
+            yield from chunks
+    
+    def bind_file(self, src_path: str, dst_path: str, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                  max_workers: int = 1, wrap: bool = False, merkle: bool = True,
+                  checkpoint_segments: int = DEFAULT_CHECKPOINT_SEGMENTS) -> str:
+        """
+        将文件绑定到本机，进程中断后重新调用会从最后一个落盘的分段继续，已完成的文件直接跳过
+        
+        Args:
+            src_path: 源文件路径
+            dst_path: 输出路径
+            segment_size: 分段大小
+            max_workers: 并行加密的线程数
+            wrap: 是否使用密钥封装模式
+            merkle: 是否追加完整性索引
+            checkpoint_segments: 每写入多少段记录一次检查点
+            
+        Returns:
+            任务状态（JOB_COMPLETED / JOB_RESUMED / JOB_SKIPPED）
+        """
+        job = ResumableCryptoJob(segment_size, max_workers, checkpoint_segments)
+        return job.encrypt_file(src_path, dst_path, self._new_stream_key, self._bound_key_provider,
+                                wrap=wrap, merkle=merkle)
+    
+    def unbind_file(self, src_path: str, dst_path: str,
+                    checkpoint_segments: int = DEFAULT_CHECKPOINT_SEGMENTS) -> str:
+        """
+        解除文件的机器绑定，可断点续传（不支持压缩过的文件）
+        
+        Args:
+            src_path: bind_stream 或 bind_file 生成的文件路径
+            dst_path: 输出路径
+            checkpoint_segments: 每写入多少段记录一次检查点
+            
+        Returns:
+            任务状态（JOB_COMPLETED / JOB_RESUMED / JOB_SKIPPED）
+        """
+        job = ResumableCryptoJob(checkpoint_segments=checkpoint_segments)
+        return job.decrypt_file(src_path, dst_path, self._bound_key_provider)
+    
+    def open_bound_file(self, file_path: str, cache_segments: int = 8) -> DecryptingReader:
+        """
+        以可随机访问的只读文件对象打开流式绑定文件，只解密实际读取到的分段
+        
+        Args:
+            file_path: bind_stream 生成的文件路径
+            cache_segments: 缓存的已解密分段数
+            
+        Returns:
+            DecryptingReader 文件对象（可用 io.BufferedReader 包装以提高小块读取效率）
+        """
+        reader = DecryptingReader(file_path, self._bound_key_provider, cache_segments)
+        if "compression" in reader.header:
+            reader.close()
+            raise ValueError("压缩过的绑定文件不支持随机访问，请使用 unbind_stream")
+        return reader
+    
+    def bind_archive(self, members: Iterable[Tuple[str, str]], segment_size: int = DEFAULT_SEGMENT_SIZE,
+                     max_workers: int = 1, wrap: bool = False, merkle: bool = True) -> Iterator[bytes]:
+        """
+        将多个文件打包为一个绑定到本机的加密归档（整个归档只执行一次 KDF）
+        
+        Args:
+            members: (归档内名称, 源文件路径) 的可迭代对象
+            segment_size: 分段大小
+            max_workers: 并行加密的线程数
+            wrap: 是否使用密钥封装模式
+            merkle: 是否追加完整性索引
+            
+        Returns:
+            加密归档字节块的迭代器
+        """
+        key, key_fields = self._new_stream_key()
+        return EncryptedArchive.build(members, key, segment_size=segment_size, max_workers=max_workers,
+                                      key_fields=key_fields, wrap=wrap, merkle=merkle)
+    
+    def open_bound_archive(self, file_path: str, cache_segments: int = 8) -> EncryptedArchive:
+        """
+        打开 bind_archive 生成的加密归档
+        
+        Args:
+            file_path: 归档文件路径
+            cache_segments: 缓存的已解密分段数
+            
+        Returns:
+            EncryptedArchive 对象
+        """
+        return EncryptedArchive(file_path, self._bound_key_provider, cache_segments)
+    
+    def rebind_files(self, paths: Iterable[str], machine_id: str, atomic: bool = False,
+                     max_workers: int = 8) -> Iterator[Tuple[str, bool, str]]:
+        """
+        将密钥封装模式的绑定文件批量迁移到另一台机器，只改写每个文件的头部
+        
+        目录会被递归展开。新机器的主密钥整批只派生一次（批次盐值只属于本次调用），
+        每个文件通过 HKDF 得到独立的子密钥；
+        原密钥同样经过缓存，同一批次绑定的文件也只派生一次。
+        
+        Args:
+            paths: 文件或目录路径的可迭代对象
+            machine_id: 目标机器的 ID（目标机器上 get_machine_id() 的结果）
+            atomic: 是否以原子替换代替原地改写头部
+            max_workers: 并发线程数
+        
+        Returns:
+            (文件路径, 是否成功, 错误信息) 的迭代器，按完成顺序产出
+        """
+        file_processor = FileProcessor()
+        # 任务在线程池中执行，且生成器在两次产出之间会交还控制权，批次盐值因此显式传递
+        batch_salt = os.urandom(16)
+        
+        def rebind_job(file_path):
+            try:
+                key, key_fields = self._new_stream_key(machine_id, batch_salt)
+                SegmentedCipher.rekey_file(file_path, self._bound_key_provider, key, key_fields,
+                                           atomic=atomic, file_processor=file_processor)
+                return file_path, True, ""
+            except (IOError, ValueError) as e:
+                # 单个文件失败（非绑定文件、头部损坏等）只记录结果，不中断整批
+                return file_path, False, str(e)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for file_path in file_processor.expand_paths(paths):
+                pending.add(executor.submit(rebind_job, file_path))
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    
+    def read_bound_header(self, file_path: str) -> dict:
+        """
+        只读取流式绑定文件的头部（分段大小、KDF 参数、层数等），不读取密文
+        
+        Args:
+            file_path: bind_stream 生成的文件路径
+            
+        Returns:
+            头部字典
+        """
+        with open(file_path, "rb") as f:
+            return SegmentedCipher.read_header(f)[0]
+    
+    def _new_stream_key(self, machine_id: Optional[str] = None,
+                        batch_salt: Optional[bytes] = None) -> Tuple[bytes, dict]:
+        """
+        为新的流式绑定容器生成密钥及需要写入头部的字段
+        
+        Args:
+            machine_id: 绑定的机器 ID，None 表示本机
+            batch_salt: 批次主密钥盐值，None 表示使用当前线程 batch() 的盐值（不在批次中时不使用主密钥）
+        
+        Returns:
+            (32 字节密钥, 头部字段)
+        """
+        # 新文件使用按本机校准的 KDF 参数，并记录在头部中
+        kdf_params = self.kdf_params or KeyDeriver.calibrate()
+        salt = batch_salt or getattr(self._local, "batch_salt", None)
+        if salt is not None:
+            subkey_salt = os.urandom(16)
+            key = self._derive_subkey(self._derive_key(salt, kdf_params, machine_id), subkey_salt)
+            return key, {"salt": salt.hex(), "subkey_salt": subkey_salt.hex(), "kdf": kdf_params}
+        salt = os.urandom(16)
+        return self._derive_key(salt, kdf_params, machine_id), {"salt": salt.hex(), "kdf": kdf_params}
+    
+    def _bound_key_provider(self, header: dict) -> bytes:
+        """
+        根据流式绑定容器的头部派生密钥
+        
+        Args:
+            header: 容器头部字典
+            
+        Returns:
+            32 字节密钥
+        """
+        # 密钥封装模式的派生字段保存在 key_wrap 中
+        key_fields = header.get("key_wrap", header)
+        # 其他方式生成的分段容器没有这些字段，按格式错误处理而不是抛出 KeyError
+        try:
+            salt = bytes.fromhex(key_fields["salt"])
+            subkey_salt = bytes.fromhex(key_fields["subkey_salt"]) if "subkey_salt" in key_fields else None
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("不是机器绑定生成的文件：头部缺少有效的盐值")
+        if len(salt) != 16 or (subkey_salt is not None and len(subkey_salt) != 16):
+            raise ValueError("不是机器绑定生成的文件：头部缺少有效的盐值")
+        if "kdf" not in key_fields:
+            raise ValueError("不是机器绑定生成的文件：头部缺少 KDF 参数")
+        key = self._derive_key(salt, key_fields["kdf"])
+        if subkey_salt is not None:
+            key = self._derive_subkey(key, subkey_salt)
+        return key
+    
+    def _derive_key(self, salt: bytes, kdf_params: dict = LEGACY_KDF_PARAMS,
+                    machine_id: Optional[str] = None) -> bytes:
+        """
+        根据机器ID和盐值派生绑定密钥（结果缓存在 self.key_cache 中）
+        
+        Args:
+            salt: 盐值
+            kdf_params: KDF 参数，默认为一次性绑定格式使用的 PBKDF2 参数
+            machine_id: 机器 ID，None 表示本机
+            
+        Returns:
+            32 字节密钥
+        """
+        # 参数可能来自不可信的头部，在使用（包括作为缓存键）之前校验
+        KeyDeriver.validate_params(kdf_params)
+        password = (machine_id or self.machine_id).encode()
+        return self.key_cache.get_or_derive(
+            password, salt, tuple(sorted(kdf_params.items())),
+            lambda: KeyDeriver.derive_key(password, salt, kdf_params)
+        )
+    
+    @staticmethod
+    def _derive_subkey(master_key: bytes, subkey_salt: bytes) -> bytes:
+        """
+        通过 HKDF 从批次主密钥派生单个文件的子密钥
+        
+        Args:
+            master_key: 批次主密钥
+            subkey_salt: 文件独立的随机盐值
+            
+        Returns:
+            32 字节子密钥
+        """
+        from Crypto.Protocol.KDF import HKDF
+        from Crypto.Hash import SHA256
+        return HKDF(master_key, 32, subkey_salt, SHA256, context=b"dada-machine-bind")
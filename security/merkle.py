@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段容器的 Merkle 完整性索引模块
+"""
+
+import hashlib
+import hmac
+import struct
+from typing import Iterable, Iterator, List, Tuple
+
+# 索引末尾的定长信息：根认证码(32) + 分段数(8) + 魔数(4)
+MERKLE_FOOTER = struct.Struct(">32sQ4s")
+MERKLE_MAGIC = b"DMKL"
+HASH_SIZE = 32
+# 头部 merkle 字段记录的索引格式
+MERKLE_SCHEME = "sha256-tree"
+
+
+class MerkleIndex:
+    """Merkle 完整性索引类
+    
+    索引追加在最后一个密文段之后，按层存放整棵树：第 0 层是各段（密文 + 标签）的 SHA-256 叶子哈希，
+    之后每层由上一层相邻两个节点哈希得到，奇数个节点时最后一个直接提升，直到只剩一个顶端节点。
+    叶子与内部节点使用不同的前缀（0x00 / 0x01）。末尾的定长信息保存根认证码：
+    以从数据密钥派生的密钥对顶端节点和头部做 HMAC。
+    
+    由于内部节点都已存放，检查某一段范围只需读取这些段、它们的叶子以及沿途的兄弟节点，
+    而不必读取全部叶子。没有密钥时只能检查树的内部一致性（发现损坏，不能发现有意的篡改），
+    提供密钥时再校验根认证码，才能确认数据未被篡改。
+    """
+    
+    @staticmethod
+    def leaf_hash(segment: bytes) -> bytes:
+        """
+        计算分段的叶子哈希
+        
+        Args:
+            segment: 密文段（含认证标签）
+        
+        Returns:
+            32 字节哈希
+        """
+        h = hashlib.sha256(b"\x00")
+        h.update(segment)
+        return h.digest()
+    
+    @staticmethod
+    def parent_level(nodes: bytes) -> bytes:
+        """
+        由一层连续存放的节点计算上一层（奇数个节点时最后一个直接提升）
+        
+        Args:
+            nodes: 连续存放的节点哈希
+        
+        Returns:
+            上一层连续存放的节点哈希
+        """
+        count = len(nodes) // HASH_SIZE
+        parents = bytearray()
+        for i in range(0, count - 1, 2):
+            parents += hashlib.sha256(b"\x01" + nodes[i * HASH_SIZE:(i + 2) * HASH_SIZE]).digest()
+        if count % 2:
+            parents += nodes[(count - 1) * HASH_SIZE:count * HASH_SIZE]
+        return bytes(parents)
+    
+    @staticmethod
+    def level_sizes(count: int) -> List[int]:
+        """
+        计算树每层的节点数
+        
+        Args:
+            count: 分段数（叶子数）
+        
+        Returns:
+            从叶子层到顶端的各层节点数
+        """
+        sizes = [count]
+        while sizes[-1] > 1:
+            sizes.append((sizes[-1] + 1) // 2)
+        return sizes
+    
+    @classmethod
+    def level_offsets(cls, count: int) -> List[int]:
+        """
+        计算每层在索引中的起始位置
+        
+        Args:
+            count: 分段数
+        
+        Returns:
+            各层相对于索引开头的字节偏移量
+        """
+        offsets = [0]
+        for size in cls.level_sizes(count)[:-1]:
+            offsets.append(offsets[-1] + size * HASH_SIZE)
+        return offsets
+    
+    @classmethod
+    def trailer_size(cls, count: int) -> int:
+        """
+        计算索引的总字节数
+        
+        Args:
+            count: 分段数
+        
+        Returns:
+            字节数
+        """
+        return HASH_SIZE * sum(cls.level_sizes(count)) + MERKLE_FOOTER.size
+    
+    @staticmethod
+    def root_mac(top: bytes, aad: bytes, mac_key: bytes) -> bytes:
+        """
+        计算根认证码（绑定顶端节点与容器头部）
+        
+        Args:
+            top: 顶端节点
+            aad: 容器分段的附加认证数据（SegmentedCipher.payload_aad）
+            mac_key: 由数据密钥派生的索引密钥（SegmentedCipher.index_key）
+        
+        Returns:
+            32 字节认证码
+        """
+        return hmac.new(mac_key, b"\x02" + hashlib.sha256(aad).digest() + top, hashlib.sha256).digest()
+    
+    @staticmethod
+    def parse_footer(data: bytes) -> Tuple[bytes, int]:
+        """
+        解析索引末尾的定长信息
+        
+        Args:
+            data: 文件最后 MERKLE_FOOTER.size 字节
+        
+        Returns:
+            (根认证码, 分段数)
+        """
+        if len(data) != MERKLE_FOOTER.size:
+            raise ValueError("完整性索引已被截断")
+        mac, count, magic = MERKLE_FOOTER.unpack(data)
+        if magic != MERKLE_MAGIC or count < 1:
+            raise ValueError("完整性索引无效")
+        return mac, count
+    
+    @classmethod
+    def append_trailer(cls, results: Iterable[Tuple[bytes, bytes]], aad: bytes, mac_key: bytes) -> Iterator[bytes]:
+        """
+        产出密文段，并在最后追加索引
+        
+        Args:
+            results: (密文段, 叶子哈希) 的可迭代对象
+            aad: 容器分段的附加认证数据
+            mac_key: 索引密钥
+        
+        Returns:
+            密文段与索引字节块的迭代器
+        """
+        leaves = bytearray()
+        for segment, leaf in results:
+            leaves += leaf
+            yield segment
+        yield from cls.iter_trailer(leaves, aad, mac_key)
+    
+    @classmethod
+    def iter_trailer(cls, leaves: bytes, aad: bytes, mac_key: bytes) -> Iterator[bytes]:
+        """
+        逐层生成追加在最后一段之后的索引
+        
+        Args:
+            leaves: 按段序号连续存放的叶子哈希
+            aad: 容器分段的附加认证数据
+            mac_key: 索引密钥
+        
+        Returns:
+            索引字节块的迭代器（每层一块，最后是定长信息）
+        """
+        level = bytes(leaves)
+        count = len(level) // HASH_SIZE
+        yield level
+        while len(level) > HASH_SIZE:
+            level = cls.parent_level(level)
+            yield level
+        yield MERKLE_FOOTER.pack(cls.root_mac(level, aad, mac_key), count, MERKLE_MAGIC)
@@ -0,0 +1,1142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段流式认证加密模块
+"""
+
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import struct
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from file_handler.file_processor import FileProcessor
+from security.cipher_backend import AES_256_GCM, CIPHER_ALGORITHMS, AEADBackend, CipherBackends
+from security.merkle import HASH_SIZE, MERKLE_FOOTER, MERKLE_SCHEME, MerkleIndex
+
+# 容器魔数与版本
+SEGMENT_MAGIC = b"DSEG"
+SEGMENT_VERSION = 1
+# 头部前缀：魔数(4) + 版本(1) + JSON 头部长度(4)
+HEADER_PREFIX = struct.Struct(">4sBI")
+# 头部长度上限，防止恶意文件导致分配超大缓冲区
+MAX_HEADER_SIZE = 1024 * 1024
+# 认证标签长度（AES-GCM 与 ChaCha20-Poly1305 相同）与 nonce 随机前缀长度
+TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+# 头部中每层密钥校验值的长度
+KEY_CHECK_SIZE = 16
+# 密钥封装模式下头部末尾两个密钥槽各自的长度，更换密钥或增减层数时轮流原地改写
+KEY_SLOT_SIZE = 2048
+# 密钥槽内容：SHA-256 校验和(64 个十六进制字符) + 空格 + JSON，其余以空格补齐
+KEY_SLOT_DIGEST_SIZE = 64
+# 默认分段大小与允许的最大分段大小
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+MAX_SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class SegmentedCipher:
+    """分段流式认证加密类（AES-256-GCM / ChaCha20-Poly1305）
+    
+    容器格式: 魔数(4) + 版本(1) + 头部长度(4) + JSON 头部 + 若干密文段。
+    每段为 密文 + 16 字节认证标签，nonce = 随机前缀(7) + 段序号(4) + 末段标志(1)，
+    整个头部作为每段的附加认证数据。因此篡改头部、重排分段或在分段边界截断都会认证失败，
+    且加解密的内存占用只与分段大小有关。
+    
+    头部记录每层密钥的校验值，错误的密钥在解密任何分段之前就会被拒绝。
+    
+    传入多个密钥时为融合多层模式：每段在缓存中依次完成所有层的加密（每层追加一个标签），
+    数据只读写一遍，内存占用不随层数增长。
+    
+    密钥封装模式（wrap=True）下数据只用随机的数据密钥加密一层，用户的各层密钥依次封装数据密钥，
+    封装结果和密钥派生字段存放在头部的 key_wrap 中且不参与分段的附加认证数据。
+    因此更换密钥、增减层数只需改写头部，耗时与数据大小无关（见 rewrap_header / rekey_file）。
+    key_wrap 保存在头部末尾两个定长的密钥槽之一，每个槽带校验和与代数（generation），
+    读取时使用有效槽中代数最大的一个；改写时先写入另一个槽，写入中断也不会丢失原有的封装信息。
+    
+    merkle=True 时在最后一段之后追加 Merkle 完整性索引（见 MerkleIndex），
+    verify_file 不解密即可按磁盘速度并行检查文件或其中某一段范围：无密钥时只能发现损坏，
+    提供密钥时还会校验索引的根认证码，确认数据未被篡改。
+    
+    认证加密算法由 algorithm 指定，默认使用 CipherBackends 测速选出的最快算法（见 cipher_backend），
+    算法名称记录在头部的 cipher 字段中并参与认证。
+    解密时按头部记录的算法选择当前环境中该算法最快的实现，与加密时使用的库无关。
+    
+    各分段使用独立的计数器 nonce，彼此无依赖，max_workers > 1 时在线程池中并行加解密
+    （底层实现在 C 代码中释放 GIL），输出顺序不变，同时在途的分段数不超过 window。
+    """
+    
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE, max_workers: int = 1,
+                 window: Optional[int] = None, algorithm: Optional[str] = None):
+        if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError(f"分段大小无效: {segment_size}")
+        self.segment_size = segment_size
+        self.max_workers = max(1, max_workers)
+        # 在途分段数上限，决定并行模式的内存占用（约 window × 分段大小）
+        self.window = window or self.max_workers * 2
+        # 新容器使用的认证加密算法，None 表示首次使用时按测速结果选择
+        self.algorithm = algorithm
+    
+    def build_header(self, fields: dict, keys: Optional[Sequence[bytes]] = None,
+                     wrap_keys: Optional[Sequence[bytes]] = None, key_fields: Optional[dict] = None) -> Tuple[bytes, dict]:
+        """
+        生成容器头部
+        
+        Args:
+            fields: 调用方附加的头部字段（如 KDF 盐值）
+            keys: 各层实际使用的密钥，提供时在头部写入每层的密钥校验值
+            wrap_keys: 密钥封装模式下用于封装数据密钥（keys[0]）的各层用户密钥
+            key_fields: 密钥封装模式下与用户密钥一起记录的派生字段（如 KDF 盐值）
+        
+        Returns:
+            (头部字节, 头部字典)
+        """
+        from Crypto.Random import get_random_bytes
+        
+        header = dict(fields)
+        header["segment_size"] = self.segment_size
+        nonce_prefix = get_random_bytes(NONCE_PREFIX_SIZE)
+        header["nonce_prefix"] = nonce_prefix.hex()
+        if keys:
+            header["key_check"] = [self.key_check_value(k, nonce_prefix).hex() for k in keys]
+        if wrap_keys:
+            key_wrap = self.wrap_data_key(keys[0], wrap_keys, self._stable_aad(header), key_fields,
+                                          self.header_backend(header))
+            key_wrap["generation"] = 1
+            header_bytes = self._serialize_wrapped_header(header, key_wrap)
+            return header_bytes, self.parse_header(header_bytes)[0]
+        return self._serialize_header(header), header
+    
+    @staticmethod
+    def _serialize_header(header: dict, tail: bytes = b"") -> bytes:
+        """
+        序列化头部，可在 JSON 之后追加定长的尾部（密钥槽）
+        
+        Args:
+            header: 头部字典
+            tail: 追加在 JSON 之后的字节
+        
+        Returns:
+            头部字节
+        """
+        body = json.dumps(header, sort_keys=True, separators=(",", ":")).encode("utf-8") + tail
+        if len(body) > MAX_HEADER_SIZE:
+            raise ValueError("分段容器头部过大")
+        return HEADER_PREFIX.pack(SEGMENT_MAGIC, SEGMENT_VERSION, len(body)) + body
+    
+    @classmethod
+    def _serialize_wrapped_header(cls, header: dict, key_wrap: dict) -> bytes:
+        """
+        序列化密钥封装模式的头部：JSON 之后是两个密钥槽，key_wrap 写入第一个槽，第二个槽留空
+        
+        Args:
+            header: 头部字典（其中的 key_wrap、key_slots 会被忽略）
+            key_wrap: 写入密钥槽的封装信息（含 generation）
+        
+        Returns:
+            头部字节
+        """
+        slot_size = KEY_SLOT_SIZE
+        slot = cls._serialize_key_slot(key_wrap, slot_size)
+        while slot is None:
+            slot_size *= 2
+            slot = cls._serialize_key_slot(key_wrap, slot_size)
+        header = {k: v for k, v in header.items() if k not in ("key_wrap", "key_slots")}
+        header["key_slots"] = slot_size
+        return cls._serialize_header(header, slot + b" " * slot_size)
+    
+    @staticmethod
+    def _serialize_key_slot(key_wrap: dict, slot_size: int) -> Optional[bytes]:
+        """
+        序列化一个密钥槽
+        
+        Args:
+            key_wrap: 封装信息
+            slot_size: 槽长度
+        
+        Returns:
+            补齐到 slot_size 的槽内容，放不下时为 None
+        """
+        data = json.dumps(key_wrap, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        slot = hashlib.sha256(data).hexdigest().encode("ascii") + b" " + data
+        if len(slot) > slot_size:
+            return None
+        return slot.ljust(slot_size, b" ")
+    
+    @staticmethod
+    def _parse_key_slot(slot: bytes) -> Optional[dict]:
+        """
+        解析一个密钥槽
+        
+        Args:
+            slot: 槽内容
+        
+        Returns:
+            封装信息；槽为空、被部分改写或已损坏时为 None
+        """
+        slot = slot.rstrip(b" ")
+        if len(slot) <= KEY_SLOT_DIGEST_SIZE + 1 or slot[KEY_SLOT_DIGEST_SIZE:KEY_SLOT_DIGEST_SIZE + 1] != b" ":
+            return None
+        digest, data = slot[:KEY_SLOT_DIGEST_SIZE], slot[KEY_SLOT_DIGEST_SIZE + 1:]
+        if not hmac.compare_digest(hashlib.sha256(data).hexdigest().encode("ascii"), digest):
+            return None
+        try:
+            key_wrap = json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+        if not isinstance(key_wrap, dict) or type(key_wrap.get("generation")) is not int:
+            return None
+        return key_wrap
+    
+    @staticmethod
+    def key_slot_offsets(header: dict, header_size: int) -> List[int]:
+        """
+        获取两个密钥槽在文件中的偏移量
+        
+        Args:
+            header: 密钥封装模式的头部字典
+            header_size: 头部字节数
+        
+        Returns:
+            两个槽的起始偏移量
+        """
+        slot_size = header["key_slots"]
+        return [header_size - 2 * slot_size, header_size - slot_size]
+    
+    @staticmethod
+    def payload_aad(header_bytes: bytes, header: dict) -> bytes:
+        """
+        获取分段的附加认证数据
+        
+        普通容器为完整头部；密钥封装模式为去掉密钥槽后的规范化头部，
+        这样改写封装信息不会使分段认证失效。
+        
+        Args:
+            header_bytes: 头部字节
+            header: 头部字典
+        
+        Returns:
+            附加认证数据
+        """
+        if "key_wrap" not in header:
+            return header_bytes
+        return SegmentedCipher._stable_aad(header)
+    
+    @staticmethod
+    def _stable_aad(header: dict) -> bytes:
+        """
+        密钥封装模式的附加认证数据：去掉 key_wrap 和 key_slots 后的规范化头部
+        
+        Args:
+            header: 头部字典
+        
+        Returns:
+            附加认证数据
+        """
+        stable = {k: v for k, v in header.items() if k not in ("key_wrap", "key_slots")}
+        return SEGMENT_MAGIC + json.dumps(stable, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    
+    @staticmethod
+    def parse_header_prefix(data: bytes) -> int:
+        """
+        校验头部前缀并返回完整头部长度
+        
+        Args:
+            data: 至少 HEADER_PREFIX.size 字节的容器开头
+        
+        Returns:
+            完整头部（含前缀）的字节数
+        """
+        if len(data) < HEADER_PREFIX.size:
+            raise ValueError("数据长度不足，无法解析分段容器头部")
+        magic, version, body_size = HEADER_PREFIX.unpack_from(data)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError("不是有效的分段加密容器")
+        if version != SEGMENT_VERSION:
+            raise ValueError(f"不支持的分段容器版本: {version}")
+        if body_size > MAX_HEADER_SIZE:
+            raise ValueError("分段容器头部过大")
+        return HEADER_PREFIX.size + body_size
+    
+    @classmethod
+    def parse_header(cls, data: bytes) -> Tuple[dict, int]:
+        """
+        解析容器头部
+        
+        Args:
+            data: 以容器头部开头的数据
+        
+        Returns:
+            (头部字典, 头部字节数)
+        """
+        header_size = cls.parse_header_prefix(data)
+        if len(data) < header_size:
+            raise ValueError("数据长度不足，无法解析分段容器头部")
+        body = bytes(data[HEADER_PREFIX.size:header_size])
+        try:
+            header, json_end = json.JSONDecoder().raw_decode(body.decode("utf-8"))
+        except ValueError:
+            raise ValueError("分段容器头部已损坏")
+        if not isinstance(header, dict):
+            raise ValueError("分段容器头部已损坏")
+        segment_size = header.get("segment_size")
+        if not isinstance(segment_size, int) or not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError("分段容器头部已损坏")
+        layers = header.get("layers", 1)
+        if type(layers) is not int or layers < 1:
+            raise ValueError("分段容器头部已损坏")
+        nonce_prefix = header.get("nonce_prefix")
+        if not isinstance(nonce_prefix, str) or len(nonce_prefix) != 2 * NONCE_PREFIX_SIZE:
+            raise ValueError("分段容器头部已损坏")
+        try:
+            bytes.fromhex(nonce_prefix)
+        except ValueError:
+            raise ValueError("分段容器头部已损坏")
+        if header.get("cipher") not in CIPHER_ALGORITHMS:
+            raise ValueError(f"不支持的加密算法: {header.get('cipher')!r}")
+        key_checks = header.get("key_check")
+        if not isinstance(key_checks, list) or len(key_checks) != layers or \
+                not all(isinstance(value, str) for value in key_checks):
+            raise ValueError("分段容器头部已损坏")
+        # key_wrap 只能来自密钥槽
+        if "key_wrap" in header:
+            raise ValueError("分段容器头部已损坏")
+        if header.get("merkle") not in (None, MERKLE_SCHEME):
+            raise ValueError(f"不支持的完整性索引格式: {header['merkle']!r}")
+        
+        tail = body[json_end:]
+        if "key_slots" in header:
+            # 密钥封装模式：在末尾两个槽中选择有效且代数最大的一个
+            slot_size = header["key_slots"]
+            if type(slot_size) is not int or slot_size <= 0 or len(tail) < 2 * slot_size:
+                raise ValueError("分段容器头部已损坏")
+            slots = [cls._parse_key_slot(tail[len(tail) - 2 * slot_size:len(tail) - slot_size]),
+                     cls._parse_key_slot(tail[len(tail) - slot_size:])]
+            slots = [slot for slot in slots if slot is not None]
+            if not slots:
+                raise ValueError("分段容器头部已损坏：密钥槽均无效")
+            header["key_wrap"] = max(slots, key=lambda slot: slot["generation"])
+            tail = tail[:len(tail) - 2 * slot_size]
+        if tail.strip(b" "):
+            raise ValueError("分段容器头部已损坏")
+        return header, header_size
+    
+    @classmethod
+    def read_header(cls, f: BinaryIO) -> Tuple[dict, bytes]:
+        """
+        从文件句柄的当前位置只读取容器头部，读取量与文件大小无关
+        
+        读取完成后文件位置停在第一个密文段的起始处。
+        
+        Args:
+            f: 以二进制模式打开、位于容器开头的文件对象
+            
+        Returns:
+            (头部字典, 头部字节)
+        """
+        prefix = f.read(HEADER_PREFIX.size)
+        header_size = cls.parse_header_prefix(prefix)
+        header_bytes = prefix + f.read(header_size - len(prefix))
+        header, _ = cls.parse_header(header_bytes)
+        return header, header_bytes
+    
+    def encrypt_stream(self, chunks: Iterable[bytes], key: Union[bytes, Sequence[bytes]],
+                       fields: Optional[dict] = None, key_fields: Optional[dict] = None,
+                       wrap: bool = False, merkle: bool = False) -> Iterator[bytes]:
+        """
+        流式加密：先产出头部，再逐段产出密文
+        
+        Args:
+            chunks: 明文数据块的可迭代对象（任意大小）
+            key: 32 字节密钥，或按层排列的密钥列表（第一个为最内层）
+            fields: 写入头部的附加字段
+            key_fields: 与密钥对应的派生字段（如 KDF 盐值）；封装模式下随封装信息保存，以便更换密钥时一并替换
+            wrap: 是否使用密钥封装模式
+            merkle: 是否追加 Merkle 完整性索引
+            
+        Returns:
+            容器字节块的迭代器
+        """
+        keys, header_bytes, header = self.prepare_header(key, fields, key_fields, wrap, merkle)
+        yield header_bytes
+        results = self.encrypt_segments(chunks, keys, header_bytes, header)
+        if merkle:
+            yield from MerkleIndex.append_trailer(results, self.payload_aad(header_bytes, header), self.index_key(keys))
+        else:
+            yield from results
+    
+    def prepare_header(self, key: Union[bytes, Sequence[bytes]], fields: Optional[dict] = None,
+                       key_fields: Optional[dict] = None, wrap: bool = False,
+                       merkle: bool = False) -> Tuple[List[bytes], bytes, dict]:
+        """
+        生成新容器的头部，并得到加密分段实际使用的密钥（参数含义同 encrypt_stream）
+        
+        Returns:
+            (各层密钥, 头部字节, 头部字典)
+        """
+        from Crypto.Random import get_random_bytes
+        
+        keys = self.layer_keys(key)
+        fields = dict(fields or {})
+        wrap_keys = None
+        if wrap:
+            wrap_keys, keys = keys, [get_random_bytes(32)]
+        else:
+            fields.update(key_fields or {})
+            if len(keys) > 1:
+                fields["layers"] = len(keys)
+        if merkle:
+            fields["merkle"] = MERKLE_SCHEME
+        backend = CipherBackends.for_algorithm(self.algorithm) if self.algorithm else CipherBackends.select()
+        fields["cipher"] = backend.algorithm
+        header_bytes, header = self.build_header(fields, keys, wrap_keys, key_fields)
+        return keys, header_bytes, header
+    
+    def encrypt_segments(self, chunks: Iterable[bytes], keys: Sequence[bytes], header_bytes: bytes,
+                         header: dict, start: int = 0) -> Iterator[Union[bytes, Tuple[bytes, bytes]]]:
+        """
+        从第 start 段开始加密分段（用于中断后续传，chunks 须从明文的 start × 分段大小 处开始）
+        
+        Args:
+            chunks: 明文数据块的可迭代对象
+            keys: 各层密钥（prepare_header 或 unlock_keys 的结果）
+            header_bytes: 头部字节
+            header: 头部字典
+            start: 起始段序号
+        
+        Returns:
+            密文段的迭代器；带完整性索引的容器产出 (密文段, 叶子哈希)
+        """
+        nonce_prefix = bytes.fromhex(header["nonce_prefix"])
+        aad = self.payload_aad(header_bytes, header)
+        backend = self.header_backend(header)
+        segments = self._split(chunks, header["segment_size"], start)
+        if header.get("merkle"):
+            # 叶子哈希在工作线程中随加密一起计算
+            func = partial(self._encrypt_layers_with_leaf, backend=backend)
+        else:
+            func = partial(self.encrypt_layers, backend=backend)
+        return self._map_segments(func, keys, nonce_prefix, aad, segments)
+    
+    def decrypt_stream(self, chunks: Iterable[bytes],
+                       key_provider: Callable[[dict], Union[bytes, Sequence[bytes]]]) -> Iterator[bytes]:
+        """
+        流式解密：解析头部后逐段验证并产出明文
+        
+        每段在产出前都已通过认证，但截断只能在最后一段被发现，
+        调用方应将输出写入临时文件（如 FileProcessor 的原子写入），出错时丢弃。
+        
+        Args:
+            chunks: 容器数据块的可迭代对象
+            key_provider: 根据头部字典返回密钥（或按层排列的密钥列表）的函数
+            
+        Returns:
+            明文数据块的迭代器
+        """
+        chunks = iter(chunks)
+        buffer = bytearray()
+        header_size = None
+        for chunk in chunks:
+            buffer += chunk
+            if header_size is None and len(buffer) >= HEADER_PREFIX.size:
+                header_size = self.parse_header_prefix(buffer)
+            if header_size is not None and len(buffer) >= header_size:
+                break
+        
+        header, header_size = self.parse_header(buffer)
+        header_bytes = bytes(buffer[:header_size])
+        # 在接触任何密文之前确认每层密钥都正确
+        keys = self.unlock_keys(header, key_provider(header))
+        nonce_prefix = bytes.fromhex(header["nonce_prefix"])
+        aad = self.payload_aad(header_bytes, header)
+        rest = bytes(buffer[header_size:])
+        del buffer
+        
+        segment_size = header["segment_size"] + TAG_SIZE * len(keys)
+        payload = itertools.chain((rest,), chunks)
+        if header.get("merkle"):
+            yield from self._decrypt_indexed_payload(payload, keys, nonce_prefix, aad, header)
+            return
+        segments = self._split(payload, segment_size)
+        func = partial(self.decrypt_layers, backend=self.header_backend(header))
+        yield from self._map_segments(func, keys, nonce_prefix, aad, segments)
+    
+    def _decrypt_indexed_payload(self, payload: Iterator[bytes], keys: Sequence[bytes], nonce_prefix: bytes,
+                                 aad: bytes, header: dict) -> Iterator[bytes]:
+        """
+        流式解密带完整性索引的容器，内存占用与没有索引时相同（约 window × 分段大小）
+        
+        流中无法预知索引从哪里开始，因此每个整段先按“非最后一段”尝试解密，
+        第一个失败的位置就是最后一段（其后为索引）。之后的数据只计数并保留末尾的定长信息，
+        由其中的段数确定最后一段的长度，再按最后一段认证。
+        每段都经过认证，截断、重排与篡改仍会被发现；索引本身不在这里校验（见 verify_file）。
+        
+        Args:
+            payload: 头部之后的数据块迭代器
+            keys: 各层密钥
+            nonce_prefix: nonce 随机前缀
+            aad: 分段的附加认证数据
+            header: 头部字典
+        
+        Returns:
+            明文数据块的迭代器
+        """
+        stored_segment_size = header["segment_size"] + TAG_SIZE * len(keys)
+        backend = self.header_backend(header)
+        buffer = bytearray()
+        stopped = []
+        
+        def blocks():
+            index = 0
+            for chunk in payload:
+                buffer.extend(chunk)
+                while len(buffer) >= stored_segment_size and not stopped:
+                    yield index, bytes(buffer[:stored_segment_size]), False
+                    del buffer[:stored_segment_size]
+                    index += 1
+                if stopped:
+                    return
+            if buffer:
+                yield index, bytes(buffer), False
+                buffer.clear()
+        
+        func = partial(self._try_decrypt_layers, backend=backend, stored_segment_size=stored_segment_size)
+        tail_index, tail_head, tail_size, footer = None, b"", 0, b""
+        for index, (plaintext, block) in enumerate(self._map_segments(func, keys, nonce_prefix, aad, blocks())):
+            if tail_index is None:
+                if plaintext is not None:
+                    yield plaintext
+                    continue
+                # 从这里开始是最后一段和索引，不再切分新的分段
+                stopped.append(True)
+                tail_index, tail_head = index, block
+            tail_size += len(block)
+            footer = (footer + block[-MERKLE_FOOTER.size:])[-MERKLE_FOOTER.size:]
+        
+        for chunk in itertools.chain((bytes(buffer),), payload):
+            tail_size += len(chunk)
+            footer = (footer + chunk[-MERKLE_FOOTER.size:])[-MERKLE_FOOTER.size:]
+        if tail_index is None:
+            raise ValueError("完整性索引与分段数据不一致：数据已被截断或损坏")
+        
+        _, count = MerkleIndex.parse_footer(footer)
+        if count - 1 > tail_index:
+            raise ValueError(f"第 {tail_index + 1} 段认证失败：密钥错误或数据已被篡改、截断")
+        last_size = tail_size - MerkleIndex.trailer_size(count)
+        if count - 1 != tail_index or not TAG_SIZE * len(keys) <= last_size <= len(tail_head):
+            raise ValueError("完整性索引与分段数据不一致：数据已被截断或损坏")
+        yield self.decrypt_layers(keys, nonce_prefix, aad, tail_index, tail_head[:last_size], True, backend)
+    
+    @classmethod
+    def verify_file(cls, file_path: str, start: int = 0, end: Optional[int] = None,
+                    max_workers: int = 1, batch_segments: int = 64,
+                    key_provider: Optional[Callable[[dict], Union[bytes, Sequence[bytes]]]] = None) -> int:
+        """
+        不解密，通过 Merkle 索引检查文件的结构和完整性
+        
+        读取 [start, end) 范围内的密文段并与存放的叶子比对（范围较大时分批在线程池中并行计算，
+        hashlib 计算大块数据时释放 GIL），再逐层用存放的兄弟节点重新计算父节点直到顶端，
+        读取量与范围大小加树高成正比，与文件总段数无关。
+        
+        不提供 key_provider 时只是损坏检查：能发现磁盘错误、截断等意外损坏，
+        但无法发现重新计算过索引的有意篡改。提供 key_provider 时还会校验根认证码，
+        确认头部与索引（进而范围内的数据）未被篡改。
+        
+        Args:
+            file_path: 文件路径
+            start: 起始段序号
+            end: 结束段序号（不含），None 表示到最后一段
+            max_workers: 并行线程数
+            batch_segments: 每个任务连续读取的段数
+            key_provider: 根据头部字典返回密钥的函数，提供时校验根认证码
+        
+        Returns:
+            文件的总段数
+        """
+        file_processor = FileProcessor()
+        try:
+            with open(file_path, "rb") as f:
+                header, header_bytes = cls.read_header(f)
+                if not header.get("merkle"):
+                    raise ValueError("该文件没有完整性索引")
+                file_size = f.seek(0, 2)
+                if file_size - len(header_bytes) < MERKLE_FOOTER.size:
+                    raise ValueError("完整性索引已被截断")
+                f.seek(file_size - MERKLE_FOOTER.size)
+                mac, count = MerkleIndex.parse_footer(f.read(MERKLE_FOOTER.size))
+        except OSError as e:
+            raise IOError(f"读取文件失败: {str(e)}")
+        
+        # 结构检查：段数、密文长度与索引长度必须一致
+        overhead = cls.overhead(header)
+        stored_segment_size = header["segment_size"] + overhead
+        payload_size = file_size - len(header_bytes) - MerkleIndex.trailer_size(count)
+        if not (count - 1) * stored_segment_size + overhead <= payload_size <= count * stored_segment_size:
+            raise ValueError("文件结构无效：数据已被截断或损坏")
+        end = count if end is None else end
+        if not 0 <= start <= end <= count:
+            raise ValueError(f"分段范围无效: [{start}, {end})，文件共 {count} 段")
+        
+        trailer_offset = len(header_bytes) + payload_size
+        level_offsets = [trailer_offset + offset for offset in MerkleIndex.level_offsets(count)]
+        
+        def read_nodes(level, lo, hi):
+            return b"".join(file_processor.iter_file_chunks(file_path, offset=level_offsets[level] + lo * HASH_SIZE,
+                                                            length=(hi - lo) * HASH_SIZE))
+        
+        def verify_batch(batch_start):
+            batch_end = min(batch_start + batch_segments, end)
+            offset = len(header_bytes) + batch_start * stored_segment_size
+            length = min(payload_size, batch_end * stored_segment_size) - batch_start * stored_segment_size
+            chunks = file_processor.iter_file_chunks(file_path, stored_segment_size, offset, length)
+            stored = read_nodes(0, batch_start, batch_end)
+            for index, segment in enumerate(chunks, batch_start):
+                position = (index - batch_start) * HASH_SIZE
+                if MerkleIndex.leaf_hash(segment) != stored[position:position + HASH_SIZE]:
+                    return index
+            return None
+        
+        batches = range(start, end, batch_segments)
+        if max_workers == 1:
+            mismatch = next((index for index in map(verify_batch, batches) if index is not None), None)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                mismatch = next((index for index in executor.map(verify_batch, batches) if index is not None), None)
+        if mismatch is not None:
+            raise ValueError(f"第 {mismatch + 1} 段完整性校验失败：数据已损坏")
+        
+        # 逐层向上：用存放的子节点（含范围外的兄弟节点）重新计算范围内的父节点并与存放的父节点比对
+        lo, hi = start, end
+        sizes = MerkleIndex.level_sizes(count)
+        if lo < hi:
+            for level in range(len(sizes) - 1):
+                lo, hi = lo - lo % 2, min(hi + hi % 2, sizes[level])
+                for batch_lo in range(lo, hi, 2 * batch_segments):
+                    batch_hi = min(batch_lo + 2 * batch_segments, hi)
+                    parents = MerkleIndex.parent_level(read_nodes(level, batch_lo, batch_hi))
+                    if parents != read_nodes(level + 1, batch_lo // 2, (batch_hi + 1) // 2):
+                        raise ValueError("完整性索引校验失败：数据已损坏")
+                lo, hi = lo // 2, (hi + 1) // 2
+        
+        if key_provider is not None:
+            keys = cls.unlock_keys(header, key_provider(header))
+            top = read_nodes(len(sizes) - 1, 0, 1)
+            expected = MerkleIndex.root_mac(top, cls.payload_aad(header_bytes, header), cls.index_key(keys))
+            if not hmac.compare_digest(expected, mac):
+                raise ValueError("完整性索引认证失败：密钥错误或数据已被篡改")
+        return count
+    
+    @classmethod
+    def verify_files(cls, paths: Iterable[str], max_workers: Optional[int] = None,
+                     key_provider: Optional[Callable[[dict], Union[bytes, Sequence[bytes]]]] = None
+                     ) -> Iterator[Tuple[str, bool, str]]:
+        """
+        批量校验文件完整性（目录会被递归展开），每个文件一个任务，多个文件并行
+        
+        Args:
+            paths: 文件或目录路径的可迭代对象
+            max_workers: 线程数，默认 min(32, CPU 数 + 4)
+            key_provider: 根据头部字典返回密钥的函数，提供时校验根认证码（见 verify_file）
+        
+        Returns:
+            (文件路径, 是否完好, 错误信息) 的迭代器，按完成顺序产出
+        """
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        
+        def verify_job(file_path):
+            try:
+                cls.verify_file(file_path, key_provider=key_provider)
+                return file_path, True, ""
+            except (IOError, ValueError) as e:
+                return file_path, False, str(e)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for file_path in FileProcessor().expand_paths(paths):
+                pending.add(executor.submit(verify_job, file_path))
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    
+    @staticmethod
+    def overhead(header: dict) -> int:
+        """
+        获取每个密文段附加的认证标签总长度
+        
+        Args:
+            header: 容器头部字典
+        
+        Returns:
+            字节数
+        """
+        return TAG_SIZE * header.get("layers", 1)
+    
+    @staticmethod
+    def header_backend(header: dict) -> AEADBackend:
+        """
+        获取解密（或续写）容器使用的后端：头部记录的算法在当前环境中最快的实现
+        
+        Args:
+            header: 容器头部字典
+        
+        Returns:
+            后端实例
+        """
+        return CipherBackends.for_algorithm(header["cipher"])
+    
+    @classmethod
+    def unlock_keys(cls, header: dict, key: Union[bytes, Sequence[bytes]]) -> List[bytes]:
+        """
+        由用户提供的密钥得到解密分段实际使用的密钥并完成校验（封装模式下先解封数据密钥）
+        
+        Args:
+            header: 容器头部字典
+            key: 单个密钥或按层排列的密钥列表
+        
+        Returns:
+            解密分段使用的各层密钥
+        """
+        keys = cls.layer_keys(key)
+        if "key_wrap" in header:
+            keys = [cls.unwrap_data_key(header, keys)]
+        cls.verify_keys(header, keys)
+        return keys
+    
+    @staticmethod
+    def wrap_data_key(data_key: bytes, keys: Sequence[bytes], aad: bytes,
+                      key_fields: Optional[dict] = None, backend: Optional[AEADBackend] = None) -> dict:
+        """
+        用各层密钥由内到外依次封装数据密钥（每层一次认证加密，附加认证数据绑定到本容器）
+        
+        Args:
+            data_key: 数据密钥
+            keys: 各层用户密钥（已由 layer_keys 处理）
+            aad: 容器的 payload_aad
+            key_fields: 与用户密钥一起记录的派生字段
+            backend: 使用的后端，默认 AES-256-GCM
+        
+        Returns:
+            头部的 key_wrap 字段
+        """
+        from Crypto.Random import get_random_bytes
+        
+        backend = backend or CipherBackends.for_algorithm(AES_256_GCM)
+        wrapped = data_key
+        for key in keys:
+            nonce = get_random_bytes(12)
+            wrapped = nonce + backend.encrypt(key, nonce, wrapped, aad)
+        key_wrap = dict(key_fields or {})
+        key_wrap["layers"] = len(keys)
+        key_wrap["data"] = wrapped.hex()
+        return key_wrap
+    
+    @classmethod
+    def unwrap_data_key(cls, header: dict, keys: Sequence[bytes]) -> bytes:
+        """
+        由外到内逐层解封数据密钥，错误的密钥只需一次 KDF 和几十字节的解密即可被拒绝
+        
+        Args:
+            header: 容器头部字典
+            keys: 各层用户密钥（已由 layer_keys 处理）
+        
+        Returns:
+            数据密钥
+        """
+        key_wrap = header["key_wrap"]
+        layers = key_wrap.get("layers")
+        if len(keys) != layers:
+            raise ValueError(f"加密层数不匹配：文件为 {layers} 层，提供了 {len(keys)} 个密钥")
+        try:
+            wrapped = bytes.fromhex(key_wrap["data"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("分段容器头部已损坏")
+        aad = cls._stable_aad(header)
+        backend = cls.header_backend(header)
+        for i in range(len(keys) - 1, -1, -1):
+            if len(wrapped) < 12 + TAG_SIZE:
+                raise ValueError("分段容器头部已损坏")
+            try:
+                wrapped = backend.decrypt(keys[i], wrapped[:12], wrapped[12:], aad)
+            except ValueError:
+                raise ValueError(f"第 {i + 1} 层密钥错误")
+        return wrapped
+    
+    @classmethod
+    def rewrap_header(cls, header_bytes: bytes, key: Union[bytes, Sequence[bytes]],
+                      new_key: Union[bytes, Sequence[bytes]], key_fields: Optional[dict] = None) -> bytes:
+        """
+        用新的各层密钥重新封装数据密钥，生成新的头部（密文不变）
+        
+        新的封装信息（代数加一）写入当前未使用的密钥槽，原来使用的槽清空，头部长度不变，
+        可以只改写这两个槽；放不下时生成密钥槽更大的新头部。
+        
+        Args:
+            header_bytes: 原头部字节
+            key: 原来的密钥或各层密钥列表
+            new_key: 新的密钥或各层密钥列表（层数可以不同）
+            key_fields: 与新密钥对应的派生字段
+        
+        Returns:
+            新的头部字节
+        """
+        header, header_size = cls.parse_header(header_bytes)
+        if "key_wrap" not in header:
+            raise ValueError("该文件未使用密钥封装模式，无法只改写头部更换密钥")
+        data_key = cls.unlock_keys(header, key)[0]
+        
+        key_wrap = cls.wrap_data_key(data_key, cls.layer_keys(new_key), cls._stable_aad(header),
+                                     key_fields, cls.header_backend(header))
+        key_wrap["generation"] = header["key_wrap"]["generation"] + 1
+        offsets = cls.key_slot_offsets(header, header_size)
+        slot_size = header["key_slots"]
+        active = offsets[0] if cls._parse_key_slot(header_bytes[offsets[0]:offsets[0] + slot_size]) \
+            == header["key_wrap"] else offsets[1]
+        inactive = offsets[1] if active == offsets[0] else offsets[0]
+        slot = cls._serialize_key_slot(key_wrap, slot_size)
+        if slot is not None:
+            new_header_bytes = bytearray(header_bytes[:header_size])
+            new_header_bytes[inactive:inactive + slot_size] = slot
+            new_header_bytes[active:active + slot_size] = b" " * slot_size
+            return bytes(new_header_bytes)
+        return cls._serialize_wrapped_header(header, key_wrap)
+    
+    @classmethod
+    def rekey_file(cls, file_path: str, key_provider: Callable[[dict], Union[bytes, Sequence[bytes]]],
+                   new_key: Union[bytes, Sequence[bytes]], key_fields: Optional[dict] = None,
+                   atomic: bool = False, file_processor: Optional[FileProcessor] = None) -> bool:
+        """
+        更换密钥封装模式文件的密钥，只改写头部
+        
+        默认原地改写密钥槽：先写入未使用的槽并 fsync，再清空原来的槽并 fsync，
+        任一步中断时文件都至少保留一个完整的槽，仍可用原密钥或新密钥解密。
+        头部变长（封装信息放不下）或 atomic 为 True 时
+        改为写入新文件后原子替换，此时会复制密文但仍无需重新加密。
+        
+        Args:
+            file_path: 文件路径
+            key_provider: 根据头部字典返回原密钥的函数
+            new_key: 新的密钥或各层密钥列表
+            key_fields: 与新密钥对应的派生字段
+            atomic: 是否以原子替换代替原地改写
+            file_processor: 执行写入的 FileProcessor
+        
+        Returns:
+            是否为原地改写
+        """
+        file_processor = file_processor or FileProcessor()
+        try:
+            with open(file_path, "rb") as f:
+                header, header_bytes = cls.read_header(f)
+        except OSError as e:
+            raise IOError(f"读取文件失败: {str(e)}")
+        new_header_bytes = cls.rewrap_header(header_bytes, key_provider(header), new_key, key_fields)
+        
+        if not atomic and len(new_header_bytes) == len(header_bytes):
+            slot_size = header["key_slots"]
+            offsets = cls.key_slot_offsets(header, len(header_bytes))
+            # 新槽（非空）先落盘，之后才清空旧槽
+            offsets.sort(key=lambda offset: not new_header_bytes[offset:offset + slot_size].strip(b" "))
+            for offset in offsets:
+                file_processor.write_file_range(file_path, offset, new_header_bytes[offset:offset + slot_size])
+            return True
+        chunks = itertools.chain((new_header_bytes,), file_processor.iter_file_chunks(file_path, offset=len(header_bytes)))
+        file_processor.write_file_chunks(file_path, chunks, atomic=True)
+        return False
+    
+    @classmethod
+    def encrypt_layers(cls, keys: Sequence[bytes], nonce_prefix: bytes, header_bytes: bytes,
+                       index: int, data: bytes, is_last: bool, backend: Optional[AEADBackend] = None) -> bytes:
+        """
+        对单个分段依次应用所有加密层（由内到外）
+        
+        Args:
+            keys: 各层密钥（已由 layer_keys 处理）
+            nonce_prefix: nonce 随机前缀
+            header_bytes: 容器头部（附加认证数据）
+            index: 段序号
+            data: 明文
+            is_last: 是否为最后一段
+            backend: 使用的后端，默认 AES-256-GCM
+            
+        Returns:
+            多层密文
+        """
+        for key in keys:
+            data = cls.encrypt_segment(key, nonce_prefix, header_bytes, index, data, is_last, backend)
+        return data
+    
+    @classmethod
+    def decrypt_layers(cls, keys: Sequence[bytes], nonce_prefix: bytes, header_bytes: bytes,
+                       index: int, data: bytes, is_last: bool, backend: Optional[AEADBackend] = None) -> bytes:
+        """
+        对单个分段依次剥离所有加密层（由外到内）
+        
+        Args:
+            keys: 各层密钥（已由 layer_keys 处理）
+            nonce_prefix: nonce 随机前缀
+            header_bytes: 容器头部（附加认证数据）
+            index: 段序号
+            data: 多层密文
+            is_last: 是否为最后一段
+            backend: 使用的后端，默认 AES-256-GCM
+            
+        Returns:
+            明文
+        """
+        for key in reversed(keys):
+            data = cls.decrypt_segment(key, nonce_prefix, header_bytes, index, data, is_last, backend)
+        return data
+    
+    @classmethod
+    def _encrypt_layers_with_leaf(cls, keys: Sequence[bytes], nonce_prefix: bytes, header_bytes: bytes,
+                                  index: int, data: bytes, is_last: bool,
+                                  backend: Optional[AEADBackend] = None) -> Tuple[bytes, bytes]:
+        """
+        加密单个分段并计算其 Merkle 叶子哈希
+        
+        Args:
+            参数同 encrypt_layers
+            
+        Returns:
+            (密文段, 叶子哈希)
+        """
+        segment = cls.encrypt_layers(keys, nonce_prefix, header_bytes, index, data, is_last, backend)
+        return segment, MerkleIndex.leaf_hash(segment)
+    
+    @classmethod
+    def _try_decrypt_layers(cls, keys: Sequence[bytes], nonce_prefix: bytes, header_bytes: bytes,
+                            index: int, data: bytes, is_last: bool, backend: Optional[AEADBackend] = None,
+                            stored_segment_size: int = 0) -> Tuple[Optional[bytes], bytes]:
+        """
+        按“非最后一段”尝试解密一个完整的密文段（用于带索引容器的流式解密）
+        
+        Args:
+            参数同 decrypt_layers
+            stored_segment_size: 完整密文段的长度，长度不足的数据不尝试解密
+            
+        Returns:
+            (明文，认证失败时为 None；原密文段)
+        """
+        if len(data) != stored_segment_size:
+            return None, data
+        try:
+            return cls.decrypt_layers(keys, nonce_prefix, header_bytes, index, data, False, backend), data
+        except ValueError:
+            return None, data
+    
+    @staticmethod
+    def layer_keys(key: Union[bytes, Sequence[bytes]]) -> List[bytes]:
+        """
+        规范化密钥参数；多层时用 HKDF 按层序号派生子密钥，
+        即使两层使用相同的密钥，各层的 (密钥, nonce) 也互不相同
+        
+        Args:
+            key: 单个密钥或按层排列的密钥列表
+            
+        Returns:
+            各层实际使用的密钥列表
+        """
+        if isinstance(key, (bytes, bytearray)):
+            return [bytes(key)]
+        keys = [bytes(k) for k in key]
+        if not keys:
+            raise ValueError("至少需要一个密钥")
+        if len(keys) == 1:
+            return keys
+        
+        from Crypto.Protocol.KDF import HKDF
+        from Crypto.Hash import SHA256
+        return [HKDF(k, 32, b"", SHA256, context=f"dada-segment-layer-{i}".encode("ascii"))
+                for i, k in enumerate(keys)]
+    
+    @classmethod
+    def index_key(cls, keys: Sequence[bytes]) -> bytes:
+        """
+        获取完整性索引根认证码使用的密钥（由最内层的数据密钥派生）
+        
+        Args:
+            keys: 加密分段使用的各层密钥
+        
+        Returns:
+            32 字节密钥
+        """
+        return cls.derive_subkey(keys[0], b"dada-merkle-root")
+    
+    @staticmethod
+    def derive_subkey(key: bytes, purpose: bytes) -> bytes:
+        """
+        用 HKDF 从密钥派生指定用途的子密钥，避免同一密钥同时用于分段加密和其他原语
+        
+        Args:
+            key: 某一层实际使用的密钥
+            purpose: 用途标识（作为 HKDF 的 info）
+            
+        Returns:
+            32 字节子密钥
+        """
+        from Crypto.Protocol.KDF import HKDF
+        from Crypto.Hash import SHA256
+        return HKDF(key, 32, b"", SHA256, context=purpose)
+    
+    @classmethod
+    def key_check_value(cls, key: bytes, nonce_prefix: bytes) -> bytes:
+        """
+        计算密钥校验值（以文件独立的 nonce 前缀为输入，不同文件的校验值无法关联）
+        
+        HMAC 使用从密钥派生的独立校验密钥，不直接使用分段加密的密钥。
+        
+        Args:
+            key: 某一层实际使用的密钥
+            nonce_prefix: 容器的 nonce 随机前缀
+            
+        Returns:
+            KEY_CHECK_SIZE 字节的校验值
+        """
+        check_key = cls.derive_subkey(key, b"dada-key-check")
+        return hmac.new(check_key, nonce_prefix, hashlib.sha256).digest()[:KEY_CHECK_SIZE]
+    
+    @classmethod
+    def verify_keys(cls, header: dict, keys: Sequence[bytes]) -> None:
+        """
+        检查层数并用头部的密钥校验值逐层验证密钥，错误的密钥无需解密任何分段即可被拒绝
+        
+        头部是每段的附加认证数据，校验值被篡改会在解密第一段时被发现。
+        
+        Args:
+            header: 容器头部字典
+            keys: 各层实际使用的密钥（已由 layer_keys 处理）
+        """
+        layers = header.get("layers", 1)
+        if len(keys) != layers:
+            raise ValueError(f"加密层数不匹配：文件为 {layers} 层，提供了 {len(keys)} 个密钥")
+        nonce_prefix = bytes.fromhex(header["nonce_prefix"])
+        for i, (key, expected) in enumerate(zip(keys, header["key_check"])):
+            if not hmac.compare_digest(cls.key_check_value(key, nonce_prefix).hex(), expected):
+                raise ValueError(f"第 {i + 1} 层密钥错误")
+    
+    @staticmethod
+    def segment_nonce(nonce_prefix: bytes, index: int, is_last: bool) -> bytes:
+        """
+        生成分段 nonce
+        
+        Args:
+            nonce_prefix: 头部中的随机前缀
+            index: 段序号
+            is_last: 是否为最后一段
+        
+        Returns:
+            12 字节 nonce
+        """
+        if index >= 2 ** 32:
+            raise ValueError("分段数量超过上限")
+        return nonce_prefix + struct.pack(">IB", index, 1 if is_last else 0)
+    
+    @classmethod
+    def encrypt_segment(cls, key: bytes, nonce_prefix: bytes, header_bytes: bytes,
+                        index: int, data: bytes, is_last: bool, backend: Optional[AEADBackend] = None) -> bytes:
+        """
+        加密单个分段
+        
+        Args:
+            key: 密钥
+            nonce_prefix: nonce 随机前缀
+            header_bytes: 容器头部（附加认证数据）
+            index: 段序号
+            data: 明文
+            is_last: 是否为最后一段
+            backend: 使用的后端，默认 AES-256-GCM
+        
+        Returns:
+            密文 + 认证标签
+        """
+        backend = backend or CipherBackends.for_algorithm(AES_256_GCM)
+        return backend.encrypt(key, cls.segment_nonce(nonce_prefix, index, is_last), data, header_bytes)
+    
+    @classmethod
+    def decrypt_segment(cls, key: bytes, nonce_prefix: bytes, header_bytes: bytes,
+                        index: int, data: bytes, is_last: bool, backend: Optional[AEADBackend] = None) -> bytes:
+        """
+        验证并解密单个分段
+        
+        Args:
+            key: 密钥
+            nonce_prefix: nonce 随机前缀
+            header_bytes: 容器头部（附加认证数据）
+            index: 段序号
+            data: 密文 + 认证标签
+            is_last: 是否为最后一段
+            backend: 使用的后端，默认 AES-256-GCM
+        
+        Returns:
+            明文
+        """
+        if len(data) < TAG_SIZE:
+            raise ValueError("分段数据已被截断")
+        backend = backend or CipherBackends.for_algorithm(AES_256_GCM)
+        try:
+            return backend.decrypt(key, cls.segment_nonce(nonce_prefix, index, is_last), data, header_bytes)
+        except ValueError:
+            raise ValueError(f"第 {index + 1} 段认证失败：密钥错误或数据已被篡改、截断")
+    
+    def _map_segments(self, func: Callable, keys: Sequence[bytes], nonce_prefix: bytes, header_bytes: bytes,
+                      segments: Iterable[Tuple[int, bytes, bool]]) -> Iterator[bytes]:
+        """
+        对每个分段执行加密或解密，按需在线程池中并行，结果按原顺序产出
+        
+        Args:
+            func: encrypt_layers 或 decrypt_layers（已绑定后端）
+            keys: 各层密钥
+            nonce_prefix: nonce 随机前缀
+            header_bytes: 容器头部
+            segments: _split 产出的分段
+            
+        Returns:
+            处理后的分段迭代器
+        """
+        if self.max_workers == 1:
+            for index, segment, is_last in segments:
+                yield func(keys, nonce_prefix, header_bytes, index, segment, is_last)
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = deque()
+            for index, segment, is_last in segments:
+                in_flight.append(executor.submit(func, keys, nonce_prefix, header_bytes, index, segment, is_last))
+                if len(in_flight) >= self.window:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+    
+    @staticmethod
+    def _split(chunks: Iterable[bytes], size: int, start: int = 0) -> Iterator[Tuple[int, bytes, bool]]:
+        """
+        将任意大小的数据块重新切分为固定大小的分段，并标记最后一段
+        
+        Args:
+            chunks: 数据块的可迭代对象
+            size: 分段大小
+            start: 第一个分段的段序号
+        
+        Returns:
+            (段序号, 分段数据, 是否为最后一段) 的迭代器
+        """
+        buffer = bytearray()
+        index = start
+        for chunk in chunks:
+            buffer += chunk
+            # 只有确认后面还有数据时才输出整段，保证最后一段（可能为空）被正确标记
+            while len(buffer) > size:
+                yield index, bytes(buffer[:size]), False
+                del buffer[:size]
+                index += 1
+        yield index, bytes(buffer), True
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段加密容器的随机访问读取模块
+"""
+
+import io
+import os
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Sequence, Union
+
+from security.merkle import MERKLE_FOOTER, MerkleIndex
+from security.segmented_cipher import TAG_SIZE, SegmentedCipher
+
+
+class DecryptingReader(io.RawIOBase):
+    """可随机访问的解密读取器类
+    
+    将明文偏移量映射到分段，只解密读取时涉及的分段，适合预览、读取文件头或单条记录。
+    最近解密的分段保存在一个小型 LRU 缓存中，相邻位置的重复读取无需再次解密。
+    每个分段在返回前都已通过认证。
+    """
+    
+    def __init__(self, source: Union[str, BinaryIO],
+                 key_provider: Callable[[dict], Union[bytes, Sequence[bytes]]], cache_segments: int = 8):
+        super().__init__()
+        if isinstance(source, (str, os.PathLike)):
+            self._file = open(source, "rb")
+            self._owns_file = True
+        else:
+            self._file = source
+            self._owns_file = False
+        
+        try:
+            # 容器从文件的当前位置开始（支持嵌在其他文件中的容器）
+            self._base_offset = self._file.tell()
+            self.header, self._header_bytes = SegmentedCipher.read_header(self._file)
+            self._keys = SegmentedCipher.unlock_keys(self.header, key_provider(self.header))
+            self._aad = SegmentedCipher.payload_aad(self._header_bytes, self.header)
+            self._nonce_prefix = bytes.fromhex(self.header["nonce_prefix"])
+            self._backend = SegmentedCipher.header_backend(self.header)
+            self.segment_size = self.header["segment_size"]
+            self._overhead = TAG_SIZE * len(self._keys)
+            self._stored_segment_size = self.segment_size + self._overhead
+            
+            # 根据密文总长度推算分段数与明文长度（带完整性索引时先去掉末尾的索引）
+            end = self._file.seek(0, io.SEEK_END)
+            if self.header.get("merkle"):
+                self._file.seek(max(self._base_offset, end - MERKLE_FOOTER.size))
+                _, count = MerkleIndex.parse_footer(self._file.read(MERKLE_FOOTER.size))
+                end -= MerkleIndex.trailer_size(count)
+            self._payload_end = end
+            payload_size = end - self._base_offset - len(self._header_bytes)
+            if payload_size < 0:
+                raise ValueError("分段数据已被截断")
+            full_segments, remainder = divmod(payload_size, self._stored_segment_size)
+            if remainder:
+                if remainder < self._overhead:
+                    raise ValueError("分段数据已被截断")
+                self._segment_count = full_segments + 1
+                last_size = remainder - self._overhead
+            elif full_segments:
+                self._segment_count = full_segments
+                last_size = self.segment_size
+            else:
+                raise ValueError("分段数据已被截断")
+            self.size = (self._segment_count - 1) * self.segment_size + last_size
+        except Exception:
+            if self._owns_file:
+                self._file.close()
+            raise
+        
+        self._position = 0
+        self._cache = OrderedDict()
+        self._cache_segments = max(1, cache_segments)
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """
+        移动明文读取位置
+        
+        Args:
+            offset: 偏移量
+            whence: 参照位置（SEEK_SET / SEEK_CUR / SEEK_END）
+        
+        Returns:
+            新的明文位置
+        """
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if position < 0:
+            raise ValueError("读取位置不能为负数")
+        self._position = position
+        return position
+    
+    def readinto(self, buffer) -> int:
+        """
+        从当前位置读取明文到缓冲区，只解密涉及的分段
+        
+        Args:
+            buffer: 可写的缓冲区
+        
+        Returns:
+            读取的字节数，0 表示已到末尾
+        """
+        view = memoryview(buffer).cast("B")
+        total = 0
+        while total < len(view) and self._position < self.size:
+            index, offset = divmod(self._position, self.segment_size)
+            segment = self._get_segment(index)
+            count = min(len(view) - total, len(segment) - offset)
+            view[total:total + count] = segment[offset:offset + count]
+            total += count
+            self._position += count
+        return total
+    
+    def close(self) -> None:
+        if not self.closed:
+            self._cache.clear()
+            if self._owns_file:
+                self._file.close()
+        super().close()
+    
+    def _get_segment(self, index: int) -> bytes:
+        """
+        获取解密后的分段（优先从 LRU 缓存中读取）
+        
+        Args:
+            index: 段序号
+        
+        Returns:
+            分段明文
+        """
+        segment = self._cache.get(index)
+        if segment is not None:
+            self._cache.move_to_end(index)
+            return segment
+        
+        position = self._base_offset + len(self._header_bytes) + index * self._stored_segment_size
+        self._file.seek(position)
+        data = self._file.read(min(self._stored_segment_size, self._payload_end - position))
+        is_last = index == self._segment_count - 1
+        segment = SegmentedCipher.decrypt_layers(self._keys, self._nonce_prefix, self._aad,
+                                                 index, data, is_last, self._backend)
+        self._cache[index] = segment
+        if len(self._cache) > self._cache_segments:
+            self._cache.popitem(last=False)
+        return segment
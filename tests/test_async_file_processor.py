@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AsyncFileProcessor 读写与关闭测试
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from file_handler.async_file_processor import AsyncFileProcessor
+
+
+async def produce(parts, fail: bool = False):
+    """异步数据源"""
+    for part in parts:
+        await asyncio.sleep(0)
+        yield part
+    if fail:
+        raise RuntimeError("source failed")
+
+
+def test_write_async_iterable_atomic(tmp_path):
+    """异步数据源的原子写入（带预分配）"""
+    target = tmp_path / "out.bin"
+    
+    async def main():
+        async with AsyncFileProcessor(max_workers=4) as processor:
+            return await processor.write_file_chunks(str(target), produce([b"ab", b"cd"]), atomic=True,
+                                                     expected_size=100)
+    
+    assert asyncio.run(main()) == 4
+    assert target.read_bytes() == b"abcd"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+
+def test_write_async_iterable_failure_cleans_up(tmp_path):
+    """数据源失败时目标保持原内容且不留下临时文件"""
+    target = tmp_path / "out.bin"
+    target.write_bytes(b"old")
+    
+    async def main():
+        async with AsyncFileProcessor(max_workers=4) as processor:
+            await processor.write_file_chunks(str(target), produce([b"new"], fail=True), atomic=True)
+    
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+    assert target.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+
+def test_write_sync_iterable(tmp_path):
+    """普通可迭代对象直接交给 FileProcessor 写入"""
+    target = tmp_path / "out.bin"
+    
+    async def main():
+        async with AsyncFileProcessor(max_workers=2) as processor:
+            await processor.write_file_chunks(str(target), [b"x", b"y"], atomic=True)
+            return await processor.read_file(str(target))
+    
+    assert asyncio.run(main()) == b"xy"
+
+
+def test_iter_file_chunks_rejects_zero_chunk_size(tmp_path):
+    """分块大小为 0 时报错，而不是读出空内容"""
+    source = tmp_path / "in.bin"
+    source.write_bytes(b"data")
+    
+    async def main():
+        async with AsyncFileProcessor() as processor:
+            return [chunk async for chunk in processor.iter_file_chunks(str(source), chunk_size=0)]
+    
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+def test_exit_does_not_block_event_loop():
+    """退出上下文时等待未完成的任务，但事件循环仍可运行其他协程"""
+    pending_read = threading.Event()
+    released = []
+    # 保险：若关闭阻塞了事件循环，超时后放行，避免测试挂起
+    fallback = threading.Timer(5, pending_read.set)
+    fallback.start()
+    
+    async def release():
+        await asyncio.sleep(0.01)
+        released.append(True)
+        pending_read.set()
+    
+    async def main():
+        async with AsyncFileProcessor() as processor:
+            future = processor._executor.submit(pending_read.wait)
+            task = asyncio.create_task(release())
+        assert released and future.done()
+        await task
+    
+    try:
+        asyncio.run(main())
+    finally:
+        fallback.cancel()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+认证加密后端与算法选择测试
+"""
+
+import os
+
+import pytest
+
+from security.cipher_backend import (AES_256_GCM, CHACHA20_POLY1305, AEADBackend, CipherBackends,
+                                     CryptographyAESGCM, CryptographyChaCha20Poly1305,
+                                     PycryptodomeAESGCM, PycryptodomeChaCha20Poly1305)
+from security.segmented_cipher import SegmentedCipher
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+DATA = os.urandom(3 * SEGMENT_SIZE + 100)
+
+AVAILABLE = [backend_class for backend_class in CipherBackends.BACKENDS if backend_class.is_available()]
+
+
+def use_backends(monkeypatch, *backend_classes):
+    """跳过测速，按给定顺序（第一个最快）使用这些后端"""
+    for backend_class in backend_classes:
+        if not backend_class.is_available():
+            pytest.skip(f"{backend_class.name} 未安装")
+    ranking = [(backend_class(), float(len(backend_classes) - i)) for i, backend_class in enumerate(backend_classes)]
+    monkeypatch.setattr(CipherBackends, "_benchmark", ranking)
+
+
+def encrypt(data=DATA, algorithm=None, **kwargs) -> bytes:
+    """加密为分段容器"""
+    cipher = SegmentedCipher(SEGMENT_SIZE, algorithm=algorithm)
+    return b"".join(cipher.encrypt_stream([data], KEY, **kwargs))
+
+
+def decrypt(blob: bytes) -> bytes:
+    """解密分段容器"""
+    return b"".join(SegmentedCipher().decrypt_stream([blob], lambda header: KEY))
+
+
+def test_base_class_is_abstract():
+    """基类和未实现全部方法的子类都不能实例化"""
+    with pytest.raises(TypeError):
+        AEADBackend()
+    
+    class Incomplete(AEADBackend):
+        @classmethod
+        def is_available(cls) -> bool:
+            return True
+        
+        def encrypt(self, key, nonce, data, aad):
+            return data
+    
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("backend_class", AVAILABLE, ids=lambda cls: f"{cls.name}-{cls.algorithm}")
+def test_backend_round_trip_and_tamper(backend_class):
+    """每个可用后端都能往返加解密，篡改密文、标签或附加数据时抛出 ValueError"""
+    backend = backend_class()
+    nonce = os.urandom(12)
+    sealed = backend.encrypt(KEY, nonce, b"plaintext", b"aad")
+    assert len(sealed) == len(b"plaintext") + 16
+    assert backend.decrypt(KEY, nonce, sealed, b"aad") == b"plaintext"
+    
+    for tampered, aad in [(bytes([sealed[0] ^ 1]) + sealed[1:], b"aad"),
+                          (sealed[:-1] + bytes([sealed[-1] ^ 1]), b"aad"),
+                          (sealed, b"other"),
+                          (sealed[:10], b"aad")]:
+        with pytest.raises(ValueError):
+            backend.decrypt(KEY, nonce, tampered, aad)
+
+
+@pytest.mark.parametrize("pair", [(PycryptodomeAESGCM, CryptographyAESGCM),
+                                  (PycryptodomeChaCha20Poly1305, CryptographyChaCha20Poly1305)],
+                         ids=[AES_256_GCM, CHACHA20_POLY1305])
+def test_implementations_are_interchangeable(pair):
+    """同一算法的两个库输出完全相同，可以互相解密"""
+    if not all(backend_class.is_available() for backend_class in pair):
+        pytest.skip("需要同时安装 pycryptodome 和 cryptography")
+    first, second = pair[0](), pair[1]()
+    nonce = os.urandom(12)
+    sealed = first.encrypt(KEY, nonce, DATA, b"aad")
+    assert second.encrypt(KEY, nonce, DATA, b"aad") == sealed
+    assert second.decrypt(KEY, nonce, sealed, b"aad") == DATA
+
+
+@pytest.mark.parametrize("wrap", [False, True])
+def test_chacha20_container_round_trip(wrap):
+    """ChaCha20-Poly1305 容器（含密钥封装与完整性索引）的往返与篡改检测"""
+    blob = encrypt(algorithm=CHACHA20_POLY1305, wrap=wrap, merkle=True)
+    header, header_size = SegmentedCipher.parse_header(blob)
+    assert header["cipher"] == CHACHA20_POLY1305
+    assert decrypt(blob) == DATA
+    
+    tampered = bytearray(blob)
+    tampered[header_size + 5] ^= 1
+    with pytest.raises(ValueError):
+        decrypt(bytes(tampered))
+
+
+def test_new_files_use_fastest_backend(monkeypatch):
+    """未指定算法时新文件使用测速最快的后端的算法"""
+    use_backends(monkeypatch, PycryptodomeChaCha20Poly1305, PycryptodomeAESGCM)
+    assert SegmentedCipher.parse_header(encrypt())[0]["cipher"] == CHACHA20_POLY1305
+    use_backends(monkeypatch, PycryptodomeAESGCM, PycryptodomeChaCha20Poly1305)
+    assert SegmentedCipher.parse_header(encrypt())[0]["cipher"] == AES_256_GCM
+
+
+@pytest.mark.parametrize("algorithm", [AES_256_GCM, CHACHA20_POLY1305])
+def test_decrypt_with_other_library(monkeypatch, algorithm):
+    """一个库加密的容器换用另一个库解密，解密按头部记录的算法选择实现"""
+    pycryptodome, cryptography = {
+        AES_256_GCM: (PycryptodomeAESGCM, CryptographyAESGCM),
+        CHACHA20_POLY1305: (PycryptodomeChaCha20Poly1305, CryptographyChaCha20Poly1305),
+    }[algorithm]
+    use_backends(monkeypatch, pycryptodome, cryptography)
+    blob = encrypt(algorithm=algorithm)
+    assert isinstance(SegmentedCipher.header_backend(SegmentedCipher.parse_header(blob)[0]), pycryptodome)
+    
+    use_backends(monkeypatch, cryptography, pycryptodome)
+    assert isinstance(SegmentedCipher.header_backend(SegmentedCipher.parse_header(blob)[0]), cryptography)
+    assert decrypt(blob) == DATA
+
+
+def test_missing_algorithm_implementation(monkeypatch):
+    """头部记录的算法在当前环境中没有可用实现时报错"""
+    blob = encrypt(algorithm=CHACHA20_POLY1305)
+    use_backends(monkeypatch, PycryptodomeAESGCM)
+    with pytest.raises(ValueError, match="缺少对应的加密库"):
+        decrypt(blob)
+
+
+@pytest.mark.parametrize("cipher", ["aes-128-ocb", "", None, 1])
+def test_unknown_cipher_header_rejected(cipher):
+    """头部的 cipher 字段不是已知算法时拒绝解析"""
+    blob = encrypt()
+    header, header_size = SegmentedCipher.parse_header(blob)
+    header["cipher"] = cipher
+    with pytest.raises(ValueError, match="不支持的加密算法"):
+        decrypt(SegmentedCipher._serialize_header(header) + blob[header_size:])
+
+
+def test_unknown_algorithm_rejected():
+    """未知的算法名称不能用于选择后端或新建容器"""
+    with pytest.raises(ValueError, match="不支持的加密算法"):
+        CipherBackends.for_algorithm("aes-128-ocb")
+    with pytest.raises(ValueError, match="不支持的加密算法"):
+        encrypt(algorithm="aes-128-ocb")
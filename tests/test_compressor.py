@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+StreamCompressor 流式解压测试
+"""
+
+import os
+import struct
+
+import pytest
+
+from file_handler.compressor import MAX_OUTPUT_CHUNK, ZSTD_MAGIC, ZSTD_SKIPPABLE_MAGIC, StreamCompressor, _ZstdFrameSource
+
+DATA = os.urandom(100000) + b"a" * (5 * MAX_OUTPUT_CHUNK) + os.urandom(1000)
+
+
+def compress(data, algorithm):
+    """压缩为单个字节串"""
+    return b"".join(StreamCompressor(algorithm)._compress([data]))
+
+
+def decompress(blob, algorithm, chunk_size=7777):
+    """按 chunk_size 分块流式解压，返回产出的数据块列表"""
+    chunks = [blob[i:i + chunk_size] for i in range(0, len(blob), chunk_size)]
+    return list(StreamCompressor.decompress_stream(chunks, algorithm))
+
+
+@pytest.mark.parametrize("algorithm", StreamCompressor.available_algorithms())
+def test_round_trip_with_bounded_output(algorithm):
+    """解压结果正确，单次产出不超过 MAX_OUTPUT_CHUNK"""
+    output = decompress(compress(DATA, algorithm), algorithm)
+    assert b"".join(output) == DATA
+    assert max(len(data) for data in output) <= MAX_OUTPUT_CHUNK
+
+
+@pytest.mark.parametrize("algorithm", StreamCompressor.available_algorithms())
+@pytest.mark.parametrize("cut", [1, 3, 0.5])
+def test_truncated_stream_rejected(algorithm, cut):
+    """截断的压缩数据抛出 ValueError"""
+    blob = compress(DATA, algorithm)
+    end = int(len(blob) * cut) if isinstance(cut, float) else len(blob) - cut
+    with pytest.raises(ValueError):
+        decompress(blob[:end], algorithm)
+
+
+def test_zstd_multiple_frames_and_trailing_data():
+    """zstd 连续多个帧可以解压，帧后的多余数据被拒绝"""
+    zstandard = pytest.importorskip("zstandard")
+    frame = zstandard.ZstdCompressor(write_checksum=True).compress(b"abc" * 1000)
+    assert b"".join(decompress(frame + frame, "zstd")) == b"abc" * 2000
+    with pytest.raises(ValueError):
+        decompress(frame + b"junk", "zstd")
+    with pytest.raises(ValueError):
+        decompress(b"", "zstd")
+
+
+def zstd_raw_block(data: bytes, last: bool) -> bytes:
+    """zstd 原始（未压缩）块"""
+    return (len(data) << 3 | int(last)).to_bytes(3, "little") + data
+
+
+def zstd_rle_block(byte: bytes, count: int, last: bool) -> bytes:
+    """zstd RLE 块：内容只有 1 字节"""
+    return (count << 3 | 1 << 1 | int(last)).to_bytes(3, "little") + byte
+
+
+def zstd_frame(blocks, content_size: int, checksum: bool = False, single_segment: bool = True,
+               fcs_flag: int = 0, dict_id_size: int = 0) -> bytes:
+    """手工构造 zstd 帧（帧头各字段的长度组合由参数决定）"""
+    dict_id_flag = (0, 1, 2, 4).index(dict_id_size)
+    descriptor = fcs_flag << 6 | int(single_segment) << 5 | int(checksum) << 2 | dict_id_flag
+    header = struct.pack("<IB", ZSTD_MAGIC, descriptor)
+    if not single_segment:
+        # 窗口描述符：2^(10 + 7) = 128KB
+        header += bytes([7 << 3])
+    header += (1 if dict_id_size else 0).to_bytes(dict_id_size, "little")
+    fcs_size = (int(single_segment), 2, 4, 8)[fcs_flag]
+    header += (content_size - 256 if fcs_size == 2 else content_size).to_bytes(fcs_size, "little")
+    return header + b"".join(blocks) + (b"\xaa" * 4 if checksum else b"")
+
+
+def zstd_skippable_frame(payload: bytes) -> bytes:
+    """zstd 可跳过帧"""
+    return struct.pack("<II", ZSTD_SKIPPABLE_MAGIC | 3, len(payload)) + payload
+
+
+# 帧头各字段长度的组合，以及原始块、RLE 块、多块与校验和
+ZSTD_FRAMES = [
+    zstd_frame([zstd_raw_block(b"hello", True)], 5),
+    zstd_frame([zstd_raw_block(b"a" * 300, False), zstd_rle_block(b"b", 1000, True)], 1300,
+               single_segment=False, fcs_flag=1, checksum=True),
+    zstd_frame([zstd_rle_block(b"c", 70000, True)], 70000, single_segment=False, fcs_flag=2, dict_id_size=2),
+    zstd_frame([zstd_raw_block(b"", True)], 0, single_segment=False, fcs_flag=0, dict_id_size=4),
+    zstd_frame([zstd_raw_block(b"xyz", False), zstd_raw_block(b"", False), zstd_raw_block(b"!", True)], 4,
+               fcs_flag=3, dict_id_size=1, checksum=True),
+    zstd_skippable_frame(b"metadata"),
+    zstd_skippable_frame(b""),
+]
+
+
+def parse_frames(blob: bytes, chunk_size: int = 1, read_size: int = 5) -> _ZstdFrameSource:
+    """按 chunk_size 分块、每次读取 read_size 字节地把数据交给帧解析器"""
+    source = _ZstdFrameSource(blob[i:i + chunk_size] for i in range(0, len(blob), chunk_size))
+    while source.read(read_size):
+        pass
+    return source
+
+
+@pytest.mark.parametrize("frame", ZSTD_FRAMES)
+@pytest.mark.parametrize("chunk_size, read_size", [(1, 1), (3, 7), (1000, 2), (100000, -1)])
+def test_zstd_frame_parser_single_frame(frame, chunk_size, read_size):
+    """单个帧无论如何分块都在帧边界结束，读出的数据与输入一致"""
+    source = _ZstdFrameSource(frame[i:i + chunk_size] for i in range(0, len(frame), chunk_size))
+    data = b""
+    while True:
+        part = source.read(read_size)
+        if not part:
+            break
+        assert read_size < 0 or len(part) <= read_size
+        data += part
+    assert data == frame
+    assert source.complete
+
+
+def test_zstd_frame_parser_multiple_frames():
+    """多个帧（含可跳过帧）连续排列时在最后一个帧结束处完整"""
+    blob = b"".join(ZSTD_FRAMES)
+    source = parse_frames(blob)
+    assert source.complete
+    assert source._frames == len(ZSTD_FRAMES)
+
+
+def test_zstd_frame_parser_truncated():
+    """在任意位置截断（包括帧与帧之间以外的所有位置）都不完整"""
+    frames = ZSTD_FRAMES[:2] + ZSTD_FRAMES[4:6]
+    blob = b"".join(frames)
+    boundaries = {sum(len(frame) for frame in frames[:i]) for i in range(1, len(frames) + 1)}
+    for end in range(len(blob) + 1):
+        assert parse_frames(blob[:end], chunk_size=3).complete == (end in boundaries), end
+
+
+def test_zstd_frame_parser_rejects_invalid_data():
+    """帧后的多余数据、无效的魔数和保留的块类型都被拒绝"""
+    frame = ZSTD_FRAMES[0]
+    with pytest.raises(ValueError, match="不是有效的 zstd 数据"):
+        parse_frames(frame + b"junk")
+    with pytest.raises(ValueError, match="不是有效的 zstd 数据"):
+        parse_frames(b"PK\x03\x04")
+    reserved = frame[:6] + (1 | 3 << 1).to_bytes(3, "little")
+    with pytest.raises(ValueError, match="块类型无效"):
+        parse_frames(reserved)
+    # 帧后只有不足 4 字节的多余数据时无法判断魔数，但同样不完整
+    assert not parse_frames(frame + b"\x28\xb5").complete
+    assert not parse_frames(b"").complete
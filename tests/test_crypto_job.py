@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ResumableCryptoJob 断点续传测试
+"""
+
+import os
+
+import pytest
+
+from file_handler.file_processor import FileProcessor
+from security.crypto_job import JOB_COMPLETED, JOB_RESUMED, JOB_SKIPPED, ResumableCryptoJob
+from security.segmented_cipher import SegmentedCipher
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+
+
+class Interrupted(Exception):
+    """模拟进程中断"""
+
+
+class InterruptingProcessor(FileProcessor):
+    """读取源文件时在产出 limit 个数据块后中断"""
+    
+    def __init__(self, limit):
+        super().__init__(chunk_size=SEGMENT_SIZE)
+        self.limit = limit
+    
+    def iter_file_chunks(self, file_path, chunk_size=None, offset=0, length=None):
+        for count, chunk in enumerate(super().iter_file_chunks(file_path, chunk_size, offset, length)):
+            if count == self.limit:
+                raise Interrupted()
+            yield chunk
+
+
+def encrypt(job, src, dst, merkle=True):
+    """执行加密任务"""
+    return job.encrypt_file(str(src), str(dst), lambda: (KEY, {}), lambda header: KEY, merkle=merkle)
+
+
+def decrypt_file(path):
+    """解密整个容器文件"""
+    with open(path, "rb") as f:
+        return b"".join(SegmentedCipher().decrypt_stream([f.read()], lambda header: KEY))
+
+
+def read_nonce_prefix(path):
+    """读取容器头部的 nonce 前缀"""
+    with open(path, "rb") as f:
+        return SegmentedCipher.read_header(f)[0]["nonce_prefix"]
+
+
+def interrupt(tmp_path, data, limit=13, merkle=True):
+    """写入源文件并执行一次在中途中断的加密任务"""
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.dseg"
+    src.write_bytes(data)
+    job = ResumableCryptoJob(SEGMENT_SIZE, checkpoint_segments=4, file_processor=InterruptingProcessor(limit))
+    with pytest.raises(Interrupted):
+        encrypt(job, src, dst, merkle)
+    return src, dst, tmp_path / ".dst.dseg.partial"
+
+
+@pytest.mark.parametrize("merkle", [False, True])
+def test_encrypt_resume_and_skip(tmp_path, merkle):
+    """中断后从检查点继续，完成后重跑直接跳过"""
+    data = os.urandom(30 * SEGMENT_SIZE + 5)
+    src, dst, partial = interrupt(tmp_path, data, merkle=merkle)
+    nonce_prefix = read_nonce_prefix(partial)
+    
+    job = ResumableCryptoJob(SEGMENT_SIZE, checkpoint_segments=4)
+    assert encrypt(job, src, dst, merkle) == JOB_RESUMED
+    assert read_nonce_prefix(dst) == nonce_prefix
+    assert decrypt_file(dst) == data
+    if merkle:
+        assert SegmentedCipher.verify_file(str(dst), key_provider=lambda header: KEY) == 31
+    assert encrypt(job, src, dst, merkle) == JOB_SKIPPED
+
+
+def test_changed_source_with_restored_mtime_starts_fresh(tmp_path):
+    """源文件在原位修改且修改时间被还原时，不复用原来的 nonce，而是从头加密"""
+    data = os.urandom(30 * SEGMENT_SIZE)
+    # 中断时已写出 10 段，日志只记录到第 8 段
+    src, dst, partial = interrupt(tmp_path, data, limit=11)
+    nonce_prefix = read_nonce_prefix(partial)
+    
+    # 在检查点之后、已写出密文的范围内修改，保持大小、inode 与修改时间不变
+    st = os.stat(src)
+    changed = bytearray(data)
+    changed[9 * SEGMENT_SIZE + 10] ^= 1
+    with open(src, "r+b") as f:
+        f.write(changed)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns))
+    
+    job = ResumableCryptoJob(SEGMENT_SIZE, checkpoint_segments=4)
+    assert encrypt(job, src, dst) == JOB_COMPLETED
+    assert read_nonce_prefix(dst) != nonce_prefix
+    assert decrypt_file(dst) == bytes(changed)
+
+
+def test_decrypt_resume(tmp_path):
+    """解密任务同样可以续传"""
+    data = os.urandom(20 * SEGMENT_SIZE + 100)
+    src, container = tmp_path / "src.bin", tmp_path / "src.dseg"
+    src.write_bytes(data)
+    assert encrypt(ResumableCryptoJob(SEGMENT_SIZE), src, container) == JOB_COMPLETED
+    
+    out = tmp_path / "out.bin"
+    job = ResumableCryptoJob(SEGMENT_SIZE)
+    assert job.decrypt_file(str(container), str(out), lambda header: KEY) == JOB_COMPLETED
+    assert out.read_bytes() == data
+    assert job.decrypt_file(str(container), str(out), lambda header: KEY) == JOB_SKIPPED
+
+
+def test_cleanup_removes_sidecar_files(tmp_path):
+    """cleanup 删除日志与未完成的输出，之后任务不再被跳过"""
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.dseg"
+    src.write_bytes(os.urandom(3 * SEGMENT_SIZE))
+    job = ResumableCryptoJob(SEGMENT_SIZE)
+    assert encrypt(job, src, dst) == JOB_COMPLETED
+    assert (tmp_path / ".dst.dseg.journal").exists()
+    
+    job.cleanup(str(dst))
+    assert sorted(os.listdir(tmp_path)) == ["dst.dseg", "src.bin"]
+    assert encrypt(job, src, dst) == JOB_COMPLETED
+    job.cleanup(str(dst))
+    job.cleanup(str(dst))
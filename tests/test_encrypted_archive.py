@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EncryptedArchive 多文件归档测试
+"""
+
+import os
+
+import pytest
+
+from security.encrypted_archive import EncryptedArchive
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+
+
+def build_archive(tmp_path, files, merkle=False):
+    """把 {归档内名称: 内容} 写成源文件并打包，返回归档路径"""
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    members = []
+    for index, (name, data) in enumerate(files.items()):
+        source = source_dir / f"{index}.bin"
+        source.write_bytes(data)
+        members.append((name, str(source)))
+    archive_path = tmp_path / "archive.dseg"
+    archive_path.write_bytes(b"".join(EncryptedArchive.build(members, KEY, segment_size=SEGMENT_SIZE, merkle=merkle)))
+    return str(archive_path)
+
+
+@pytest.mark.parametrize("merkle", [False, True])
+def test_round_trip(tmp_path, merkle):
+    """列出、随机读取与全部提取的内容与源文件一致"""
+    files = {"a.txt": b"hello", "dir/b.bin": os.urandom(5000), "empty": b"", "c.bin": os.urandom(SEGMENT_SIZE * 3)}
+    archive_path = build_archive(tmp_path, files, merkle)
+    
+    with EncryptedArchive(archive_path, lambda header: KEY) as archive:
+        assert [member.name for member in archive.list_members()] == list(files)
+        assert archive.read_member("c.bin") == files["c.bin"]
+        assert archive.read_member("dir/b.bin") == files["dir/b.bin"]
+        with pytest.raises(KeyError):
+            archive.get_member("missing")
+        extracted = archive.extract_all(str(tmp_path / "out"))
+    
+    assert len(extracted) == len(files)
+    for name, data in files.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+
+
+def test_duplicate_member_name_rejected(tmp_path):
+    """重复的成员名称在打包时被拒绝"""
+    source = tmp_path / "a.bin"
+    source.write_bytes(b"data")
+    with pytest.raises(ValueError):
+        b"".join(EncryptedArchive.build([("a", str(source)), ("a", str(source))], KEY))
+
+
+@pytest.mark.parametrize("name", ["../escape.txt", "dir/../../escape.txt", "/tmp/escape.txt", "."])
+def test_extract_all_rejects_path_traversal(tmp_path, name):
+    """成员路径指向目标目录之外时拒绝提取，且不写入任何文件"""
+    archive_path = build_archive(tmp_path, {"ok.txt": b"ok", name: b"evil"})
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    
+    with EncryptedArchive(archive_path, lambda header: KEY) as archive:
+        with pytest.raises(ValueError, match="成员路径无效"):
+            archive.extract_all(str(out_dir))
+    assert os.listdir(out_dir) == []
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_wrong_key_rejected(tmp_path):
+    """密钥错误时无法打开归档"""
+    archive_path = build_archive(tmp_path, {"a.txt": b"hello"})
+    with pytest.raises(ValueError):
+        EncryptedArchive(archive_path, lambda header: bytes(32))
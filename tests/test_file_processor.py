@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FileProcessor 测试
+"""
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+from file_handler.file_processor import FileInfo, FileProcessor
+
+
+DATA = os.urandom(10000)
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """写入随机内容的测试文件"""
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+@pytest.mark.parametrize("offset, length", [
+    (0, None),
+    (0, 1),
+    (123, None),
+    (123, 4096),
+    (1024, 1024),
+    (9999, 100),
+    (len(DATA), None),
+    (len(DATA) + 5, 10),
+    (500, 0),
+])
+def test_iter_file_chunks_range(data_file, offset, length):
+    """按偏移量和长度读取的内容与切片一致，各块不超过分块大小"""
+    chunks = list(FileProcessor().iter_file_chunks(data_file, chunk_size=1000, offset=offset, length=length))
+    expected = DATA[offset:] if length is None else DATA[offset:offset + length]
+    assert b"".join(chunks) == expected
+    assert all(0 < len(chunk) <= 1000 for chunk in chunks)
+
+
+def test_iter_file_chunks_default_chunk_size(data_file):
+    """未指定分块大小时使用 FileProcessor 的 chunk_size"""
+    chunks = list(FileProcessor(chunk_size=4096).iter_file_chunks(data_file))
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, len(DATA) - 8192]
+
+
+@pytest.mark.parametrize("chunk_size", [0, -1])
+def test_iter_file_chunks_rejects_invalid_chunk_size(data_file, chunk_size):
+    """分块大小不是正数时报错，而不是悄悄使用默认值"""
+    with pytest.raises(ValueError):
+        list(FileProcessor().iter_file_chunks(data_file, chunk_size=chunk_size))
+
+
+def test_iter_file_chunks_missing_file(tmp_path):
+    """文件不存在时抛出 IOError"""
+    with pytest.raises(IOError):
+        list(FileProcessor().iter_file_chunks(str(tmp_path / "missing.bin")))
+
+
+def test_atomic_write(tmp_path):
+    """原子写入不留下临时文件"""
+    processor = FileProcessor()
+    target = tmp_path / "out.bin"
+    processor.write_file(str(target), b"data", atomic=True)
+    assert target.read_bytes() == b"data"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+
+def test_atomic_write_failure_keeps_old_content(tmp_path):
+    """数据源抛出异常时目标文件保持原内容，临时文件被清理"""
+    processor = FileProcessor()
+    target = tmp_path / "out.bin"
+    target.write_bytes(b"old")
+    
+    def chunks():
+        yield b"new"
+        raise RuntimeError("source failed")
+    
+    with pytest.raises(RuntimeError):
+        processor.write_file_chunks(str(target), chunks(), atomic=True)
+    assert target.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+
+def test_group_commit(tmp_path):
+    """组提交在退出时才把整批文件重命名到目标路径"""
+    processor = FileProcessor()
+    targets = [tmp_path / f"{i}.bin" for i in range(5)]
+    with processor.group_commit():
+        for i, target in enumerate(targets):
+            processor.write_file(str(target), bytes([i]) * 10, atomic=True)
+        assert not any(target.exists() for target in targets)
+    assert [target.read_bytes() for target in targets] == [bytes([i]) * 10 for i in range(5)]
+    assert len(os.listdir(tmp_path)) == 5
+
+
+def test_group_commit_discarded_on_error(tmp_path):
+    """组提交内抛出异常时丢弃整批写入"""
+    processor = FileProcessor()
+    with pytest.raises(RuntimeError):
+        with processor.group_commit():
+            processor.write_file(str(tmp_path / "a.bin"), b"a", atomic=True)
+            raise RuntimeError("abort")
+    assert os.listdir(tmp_path) == []
+
+
+def test_group_commit_failure_removes_remaining_temp_files(tmp_path, monkeypatch):
+    """提交中途重命名失败时，已提交的文件保留，其余临时文件被删除"""
+    processor = FileProcessor()
+    real_replace = os.replace
+    calls = []
+    
+    def failing_replace(src, dst):
+        calls.append(dst)
+        if len(calls) == 3:
+            raise OSError("replace failed")
+        real_replace(src, dst)
+    
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(IOError, match="提交批量写入失败"):
+        with processor.group_commit():
+            for i in range(5):
+                processor.write_file(str(tmp_path / f"{i}.bin"), bytes([i]), atomic=True)
+    assert sorted(os.listdir(tmp_path)) == ["0.bin", "1.bin"]
+
+
+def test_group_commit_is_per_thread(tmp_path):
+    """一个线程的组提交不会推迟或丢弃其他线程的原子写入"""
+    processor = FileProcessor()
+    other = tmp_path / "other.bin"
+    with pytest.raises(RuntimeError):
+        with processor.group_commit():
+            worker = threading.Thread(target=processor.write_file, args=(str(other), b"x"), kwargs={"atomic": True})
+            worker.start()
+            worker.join()
+            # 其他线程的写入已经立即提交
+            assert other.read_bytes() == b"x"
+            raise RuntimeError("abort")
+    assert other.read_bytes() == b"x"
+
+
+def write_files(directory, count=5, size=3000):
+    """写入 count 个随机内容的文件，返回 {路径: 内容}"""
+    files = {}
+    for i in range(count):
+        path = directory / f"file{i}.bin"
+        path.write_bytes(os.urandom(size + i))
+        files[str(path)] = path.read_bytes()
+    return files
+
+
+class CountingIterable:
+    """记录已被取走多少个元素的可迭代对象"""
+    
+    def __init__(self, items):
+        self.items = list(items)
+        self.consumed = 0
+    
+    def __iter__(self):
+        for item in self.items:
+            self.consumed += 1
+            yield item
+
+
+@pytest.mark.parametrize("algorithm", ["sha256", "blake2b"])
+def test_iter_file_hashes(tmp_path, algorithm):
+    """并行计算的哈希值与 hashlib 一致，无法读取的文件单独报告"""
+    files = write_files(tmp_path)
+    missing = str(tmp_path / "missing.bin")
+    results = {path: (ok, value) for path, ok, value in
+               FileProcessor(chunk_size=1024).iter_file_hashes(list(files) + [missing], algorithm, max_workers=3)}
+    assert set(results) == set(files) | {missing}
+    for path, data in files.items():
+        assert results[path] == (True, hashlib.new(algorithm, data).hexdigest())
+    assert results[missing][0] is False and "计算文件哈希失败" in results[missing][1]
+
+
+def test_iter_file_hashes_bounds_in_flight_tasks(tmp_path):
+    """惰性输入只被提前取走有限个元素"""
+    files = write_files(tmp_path, count=20, size=100)
+    paths = CountingIterable(files)
+    results = FileProcessor().iter_file_hashes(paths, max_workers=2)
+    next(results)
+    assert paths.consumed <= 2 * 2 + 1
+    assert len(list(results)) == 19
+
+
+def test_iter_file_hashes_rejects_unknown_algorithm(tmp_path):
+    """未知的哈希算法在提交任务之前就被拒绝"""
+    with pytest.raises(ValueError):
+        next(FileProcessor().iter_file_hashes([str(tmp_path)], "no-such-hash"))
+
+
+def fail(*args, **kwargs):
+    """模拟不被支持的系统调用"""
+    raise OSError("not supported")
+
+
+@pytest.mark.parametrize("method", ["reflink", "copy_file_range", "partial_copy_file_range", "sendfile", "copy"])
+def test_create_backup(tmp_path, monkeypatch, method):
+    """各种复制方式（含中途失败后从已复制的位置继续）都得到相同的备份"""
+    import fcntl
+    
+    source = tmp_path / "source.bin"
+    data = os.urandom(300000)
+    source.write_bytes(data)
+    os.utime(source, (1000000000, 1000000000))
+    
+    if method != "reflink":
+        monkeypatch.setattr(fcntl, "ioctl", fail)
+    if method == "partial_copy_file_range":
+        real_copy_file_range = os.copy_file_range
+        calls = []
+        
+        def copy_once(src, dst, count):
+            calls.append(count)
+            if len(calls) > 1:
+                raise OSError("not supported")
+            return real_copy_file_range(src, dst, 1000)
+        
+        monkeypatch.setattr(os, "copy_file_range", copy_once)
+    elif method in ("sendfile", "copy"):
+        monkeypatch.setattr(os, "copy_file_range", fail)
+    if method == "copy":
+        monkeypatch.setattr(os, "sendfile", fail)
+    
+    backup = FileProcessor(chunk_size=4096).create_backup(str(source))
+    assert backup == f"{source}.bak"
+    assert (tmp_path / "source.bin.bak").read_bytes() == data
+    assert os.stat(backup).st_mtime == 1000000000
+
+
+def test_create_backup_empty_file(tmp_path):
+    """空文件也能备份"""
+    source = tmp_path / "empty.bin"
+    source.write_bytes(b"")
+    assert open(FileProcessor().create_backup(str(source)), "rb").read() == b""
+
+
+def test_create_backup_missing_file(tmp_path):
+    """源文件不存在时抛出 IOError"""
+    with pytest.raises(IOError, match="创建备份失败"):
+        FileProcessor().create_backup(str(tmp_path / "missing.bin"))
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_get_files_info(tmp_path, max_workers):
+    """批量获取的信息与 os.stat 一致，顺序不变，不存在的文件被跳过"""
+    files = write_files(tmp_path)
+    paths = list(files)
+    paths.insert(2, str(tmp_path / "missing.txt"))
+    infos = FileProcessor().get_files_info(paths, max_workers=max_workers)
+    assert [info.path for info in infos] == list(files)
+    for info in infos:
+        st = os.stat(info.path)
+        assert info == FileInfo(os.path.basename(info.path), info.path, st.st_size, ".bin", st.st_ctime, st.st_mtime)
+
+
+def test_get_files_info_dir_entries(tmp_path):
+    """传入 os.DirEntry 时结果与传入路径相同"""
+    write_files(tmp_path)
+    with os.scandir(tmp_path) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    processor = FileProcessor()
+    assert processor.get_files_info(entries) == processor.get_files_info([entry.path for entry in entries])
+
+
+def test_get_file_info_missing(tmp_path):
+    """单个文件不存在时抛出 FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        FileProcessor().get_file_info(str(tmp_path / "missing.txt"))
+
+
+@pytest.mark.parametrize("content, kind, compressed", [
+    (b"PK\x03\x04" + bytes(100), "zip", True),
+    (b"\x89PNG\r\n\x1a\n" + bytes(100), "png", True),
+    (b"%PDF-1.7\n", "pdf", False),
+    (b"\x00\x00\x00\x18ftypmp42", "mp4", True),
+    (b"\x28\xb5\x2f\xfd" + bytes(10), "zstd", True),
+    (b"hello world\n" * 100, "unknown", False),
+    (b"", "empty", False),
+])
+def test_classify_file_by_magic(tmp_path, content, kind, compressed):
+    """按文件头识别类型，与扩展名无关"""
+    path = tmp_path / "sample.txt"
+    path.write_bytes(content)
+    result = FileProcessor().classify_file(str(path))
+    assert (result.kind, result.compressed) == (kind, compressed)
+
+
+def test_classify_file_high_entropy(tmp_path):
+    """无法识别但熵值很高的数据视为已压缩或已加密，过短的样本不做判断"""
+    path = tmp_path / "random.bin"
+    path.write_bytes(b"\x01" + os.urandom(8191))
+    result = FileProcessor().classify_file(str(path))
+    assert result.kind == "high_entropy" and result.compressed and result.entropy > 7.5
+    path.write_bytes(bytes(range(1, 101)))
+    assert FileProcessor().classify_file(str(path)).kind == "unknown"
+
+
+def test_classify_file_missing(tmp_path):
+    """文件不存在时抛出 IOError"""
+    with pytest.raises(IOError):
+        FileProcessor().classify_file(str(tmp_path / "missing.bin"))
+
+
+def test_classify_files(tmp_path):
+    """批量识别的结果顺序与输入一致，无法读取的文件类型为 None"""
+    (tmp_path / "a.zip").write_bytes(b"PK\x03\x04")
+    (tmp_path / "b.txt").write_bytes(b"text")
+    paths = [str(tmp_path / "a.zip"), str(tmp_path / "missing"), str(tmp_path / "b.txt")]
+    results = list(FileProcessor().classify_files(paths, max_workers=2))
+    assert [path for path, _ in results] == paths
+    assert [file_type and file_type.kind for _, file_type in results] == ["zip", None, "unknown"]
+
+
+def test_classify_files_bounds_in_flight_tasks(tmp_path):
+    """惰性输入只被提前取走有限个元素"""
+    files = write_files(tmp_path, count=20, size=100)
+    paths = CountingIterable(files)
+    results = FileProcessor().classify_files(paths, max_workers=2)
+    assert next(results)[0] == list(files)[0]
+    assert paths.consumed <= 2 * 2
+    assert [path for path, _ in results] == list(files)[1:]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """测试用目录树"""
+    for name in ["a.txt", "b.log", "sub/c.txt", "sub/deep/d.txt", "build/e.txt"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(name.encode())
+    return tmp_path
+
+
+def relative(root, paths):
+    """转换为相对 root 的排序路径列表"""
+    return sorted(os.path.relpath(path, root).replace(os.sep, "/") for path in paths)
+
+
+def test_expand_paths_walks_directories(tree):
+    """递归展开目录，不存在的路径被忽略"""
+    paths = FileProcessor().expand_paths([str(tree), str(tree / "missing")])
+    assert relative(tree, paths) == ["a.txt", "b.log", "build/e.txt", "sub/c.txt", "sub/deep/d.txt"]
+
+
+def test_expand_paths_include_exclude(tree):
+    """include 过滤文件名，exclude 同时排除文件并剪枝目录"""
+    paths = FileProcessor().expand_paths([str(tree)], include=["*.txt"], exclude=["build", "d.*"])
+    assert relative(tree, paths) == ["a.txt", "sub/c.txt"]
+
+
+def test_expand_paths_explicit_files_not_filtered(tree):
+    """直接传入的文件不受 include/exclude 影响"""
+    paths = FileProcessor().expand_paths([str(tree / "b.log"), str(tree / "sub")], include=["*.txt"], exclude=["b.*"])
+    assert relative(tree, paths) == ["b.log", "sub/c.txt", "sub/deep/d.txt"]
+
+
+def test_expand_paths_deduplicates(tree):
+    """同一文件经不同路径（重复传入、目录与文件重叠、相对路径）只产出一次"""
+    relative_path = os.path.relpath(tree / "a.txt")
+    paths = list(FileProcessor().expand_paths([str(tree / "a.txt"), str(tree), relative_path, str(tree / "sub")]))
+    assert len(paths) == len(set(paths)) == 5
+    assert paths[0] == str(tree / "a.txt")
+
+
+def test_expand_paths_is_lazy(tree):
+    """逐个产出，未消费的部分不会被遍历"""
+    paths = FileProcessor().expand_paths([str(tree)])
+    assert os.path.isfile(next(paths))
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接支持")
+def test_expand_paths_symlinks(tree, tmp_path_factory):
+    """产出指向文件的符号链接，但不进入指向目录的符号链接"""
+    outside = tmp_path_factory.mktemp("outside")
+    (outside / "x.txt").write_bytes(b"x")
+    try:
+        os.symlink(outside, tree / "linked_dir", target_is_directory=True)
+        os.symlink(tree / "a.txt", tree / "sub" / "link.txt")
+        os.symlink(tree / "missing.txt", tree / "broken.txt")
+    except OSError:
+        pytest.skip("无法创建符号链接")
+    paths = FileProcessor().expand_paths([str(tree)])
+    assert relative(tree, paths) == ["a.txt", "b.log", "build/e.txt", "sub/c.txt", "sub/deep/d.txt", "sub/link.txt"]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HashCache 持久化哈希缓存测试
+"""
+
+import hashlib
+import itertools
+import os
+import sqlite3
+import types
+
+import pytest
+
+from file_handler import hash_cache
+from file_handler.file_processor import FileProcessor
+from file_handler.hash_cache import HashCache
+
+# 早于当前时间粒度的 mtime，写入缓存不受“刚修改过的文件不缓存”的限制
+OLD_MTIME_NS = 1000000000 * 10 ** 9
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """临时目录中的缓存数据库"""
+    cache = HashCache(str(tmp_path / "cache" / "hashes.sqlite3"), max_entries=10)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """单调递增的 last_used 时间，避免同一时刻写入的条目顺序不确定"""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(hash_cache, "time", types.SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def make_file(tmp_path, name="data.bin", data=b"hello"):
+    """写入文件并把 mtime 设为很久以前"""
+    path = tmp_path / name
+    path.write_bytes(data)
+    os.utime(path, ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+    return str(path)
+
+
+def fake_key(i):
+    """不对应真实文件的缓存键"""
+    return (1, i, 100, OLD_MTIME_NS, "sha256")
+
+
+def test_put_and_get(cache, tmp_path):
+    """写入的摘要按 stat 生成的键读回，算法名称不区分大小写"""
+    path = make_file(tmp_path)
+    cache.put(HashCache.make_key(os.stat(path), "sha256"), "digest")
+    assert cache.get(HashCache.make_key(os.stat(path), "SHA256")) == "digest"
+    assert cache.get(HashCache.make_key(os.stat(path), "blake2b")) is None
+
+
+def test_mtime_change_is_stale(cache, tmp_path):
+    """mtime 变化后原来的缓存条目不再命中"""
+    path = make_file(tmp_path)
+    cache.put(HashCache.make_key(os.stat(path), "sha256"), "digest")
+    os.utime(path, ns=(OLD_MTIME_NS, OLD_MTIME_NS + 1))
+    assert cache.get(HashCache.make_key(os.stat(path), "sha256")) is None
+
+
+def test_size_change_is_stale(cache, tmp_path):
+    """大小变化（即使 mtime 被还原）后原来的缓存条目不再命中"""
+    path = make_file(tmp_path)
+    cache.put(HashCache.make_key(os.stat(path), "sha256"), "digest")
+    with open(path, "ab") as f:
+        f.write(b"!")
+    os.utime(path, ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+    assert cache.get(HashCache.make_key(os.stat(path), "sha256")) is None
+
+
+def test_file_processor_uses_cache(cache, tmp_path, monkeypatch):
+    """FileProcessor 命中缓存时不再读取文件，文件变化后重新计算"""
+    path = make_file(tmp_path)
+    processor = FileProcessor(hash_cache=cache)
+    digest = hashlib.sha256(b"hello").hexdigest()
+    assert processor.get_file_hash(path) == digest
+    assert cache.get(HashCache.make_key(os.stat(path), "sha256")) == digest
+    
+    reads = []
+    compute = processor._compute_file_hash
+    monkeypatch.setattr(processor, "_compute_file_hash", lambda *args: reads.append(args) or compute(*args))
+    assert processor.get_file_hash(path) == digest
+    assert reads == []
+    
+    make_file(tmp_path, data=b"changed")
+    assert processor.get_file_hash(path) == hashlib.sha256(b"changed").hexdigest()
+    assert len(reads) == 1
+
+
+def test_recently_modified_file_not_cached(cache, tmp_path):
+    """mtime 仍在当前时间粒度内的文件不写入缓存"""
+    path = tmp_path / "fresh.bin"
+    path.write_bytes(b"fresh")
+    FileProcessor(hash_cache=cache).get_file_hash(str(path))
+    assert cache.get(HashCache.make_key(os.stat(path), "sha256")) is None
+
+
+def test_lru_eviction(cache, clock):
+    """超过上限时淘汰最久未使用的条目，一次淘汰到上限的 90%"""
+    for i in range(10):
+        cache.put(fake_key(i), f"digest{i}")
+    # 读取刷新第 0 个条目的最近使用时间
+    assert cache.get(fake_key(0)) == "digest0"
+    cache.put(fake_key(10), "digest10")
+    
+    kept = [i for i in range(11) if cache.get(fake_key(i)) is not None]
+    assert kept == [0] + list(range(3, 11))
+    assert len(kept) == 9
+
+
+def test_duplicate_put_does_not_count(cache, clock):
+    """重复写入同一个键不增加条目数，也不触发淘汰"""
+    for _ in range(20):
+        cache.put(fake_key(0), "digest")
+    for i in range(1, 10):
+        cache.put(fake_key(i), f"digest{i}")
+    assert all(cache.get(fake_key(i)) is not None for i in range(10))
+
+
+def test_reopen_wal_database(tmp_path, clock):
+    """关闭后重新打开 WAL 数据库，条目和计数都被保留"""
+    db_path = str(tmp_path / "hashes.sqlite3")
+    cache = HashCache(db_path, max_entries=10)
+    for i in range(10):
+        cache.put(fake_key(i), f"digest{i}")
+    cache.close()
+    
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+    
+    reopened = HashCache(db_path, max_entries=10)
+    try:
+        assert reopened.get(fake_key(5)) == "digest5"
+        # 重新打开后从数据库恢复条目数，下一次写入就会触发淘汰
+        reopened.put(fake_key(10), "digest10")
+        assert sum(reopened.get(fake_key(i)) is not None for i in range(11)) == 9
+    finally:
+        reopened.close()
+
+
+def test_clear(cache):
+    """清空后不再命中"""
+    cache.put(fake_key(0), "digest")
+    cache.clear()
+    assert cache.get(fake_key(0)) is None
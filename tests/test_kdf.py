@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KDF 参数校验测试
+"""
+
+import pytest
+
+from security.kdf import KeyDeriver, LEGACY_KDF_PARAMS
+from security.machine_bind import MachineBinder
+
+
+@pytest.mark.parametrize("params", [
+    {"name": "scrypt", "n": 2 ** 22, "r": 32, "p": 16},
+    {"name": "scrypt", "n": 2 ** 20, "r": 16, "p": 1},
+    {"name": "argon2id", "time_cost": 100, "memory_cost": 4 * 1024 * 1024, "parallelism": 4},
+    {"name": "argon2id", "time_cost": 1, "memory_cost": 2 * 1024 * 1024, "parallelism": 4},
+    {"name": "pbkdf2-sha256", "iterations": 100000000},
+    {"name": "pbkdf2-sha256", "iterations": True},
+    {"name": "pbkdf2-sha256", "iterations": 100000, "extra": 1},
+    {"name": "md5"},
+    ["pbkdf2-sha256", 100000],
+    None,
+])
+def test_rejects_unsafe_params(params):
+    """超出上限或格式错误的参数抛出 ValueError"""
+    with pytest.raises(ValueError):
+        KeyDeriver.validate_params(params)
+
+
+@pytest.mark.parametrize("params", [
+    LEGACY_KDF_PARAMS,
+    {"name": "scrypt", "n": 2 ** 18, "r": 8, "p": 1},
+    {"name": "argon2id", "time_cost": 3, "memory_cost": 64 * 1024, "parallelism": 4},
+])
+def test_accepts_calibrated_params(params):
+    """校准可能给出的参数都能通过校验"""
+    KeyDeriver.validate_params(params)
+
+
+@pytest.mark.parametrize("kdf", ["pbkdf2", [1, 2], 5])
+def test_bound_key_rejects_non_dict_kdf(kdf):
+    """头部中非字典的 kdf 字段抛出 ValueError 而不是 AttributeError"""
+    binder = MachineBinder()
+    with pytest.raises(ValueError):
+        binder._derive_key(b"\x00" * 16, kdf)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KeyCache 密钥派生缓存测试
+"""
+
+import threading
+import time
+import types
+
+import pytest
+
+from security import key_cache
+from security.key_cache import KeyCache
+
+PARAMS = (("iterations", 1000), ("name", "pbkdf2-sha256"))
+
+
+class FakeClock:
+    """可手动推进的单调时钟"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """替换 key_cache 使用的时钟"""
+    clock = FakeClock()
+    monkeypatch.setattr(key_cache, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+class Deriver:
+    """记录调用次数的派生函数"""
+    
+    def __init__(self, key=b"k" * 32, delay=0.0):
+        self.key = key
+        self.delay = delay
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.key
+
+
+def cached_buffer(cache, salt):
+    """取出缓存中保存密钥的缓冲区"""
+    for (_, cached_salt, _), (buffer, _) in cache._entries.items():
+        if cached_salt == salt:
+            return buffer
+    return None
+
+
+def test_hit_skips_derivation():
+    """相同的密码、盐值和参数只派生一次，参数不同时重新派生"""
+    cache = KeyCache()
+    derive = Deriver()
+    assert cache.get_or_derive(b"pw", b"salt", PARAMS, derive) == derive.key
+    assert cache.get_or_derive(b"pw", b"salt", PARAMS, derive) == derive.key
+    assert derive.calls == 1
+    cache.get_or_derive(b"pw", b"salt", PARAMS + (("extra", 1),), derive)
+    cache.get_or_derive(b"other", b"salt", PARAMS, derive)
+    cache.get_or_derive(b"pw", b"salt2", PARAMS, derive)
+    assert derive.calls == 4
+
+
+def test_cache_does_not_store_password():
+    """缓存键中不保存明文密码"""
+    cache = KeyCache()
+    cache.get_or_derive(b"secret-password", b"salt", PARAMS, Deriver())
+    assert all(b"secret-password" not in part for part in next(iter(cache._entries))[:2])
+
+
+def test_ttl_expiry(clock):
+    """超过存活时间的条目被淘汰并清零，之后重新派生"""
+    cache = KeyCache(ttl=10)
+    derive = Deriver()
+    cache.get_or_derive(b"pw", b"salt", PARAMS, derive)
+    buffer = cached_buffer(cache, b"salt")
+    
+    clock.now += 9.9
+    cache.get_or_derive(b"pw", b"salt", PARAMS, derive)
+    assert derive.calls == 1
+    
+    clock.now += 0.1
+    cache.get_or_derive(b"pw", b"salt", PARAMS, derive)
+    assert derive.calls == 2
+    assert buffer == bytes(32)
+
+
+def test_lru_eviction_zeroizes():
+    """超过上限时淘汰最久未使用的条目并清零其密钥"""
+    cache = KeyCache(max_entries=2)
+    derive = Deriver()
+    cache.get_or_derive(b"pw", b"a", PARAMS, derive)
+    cache.get_or_derive(b"pw", b"b", PARAMS, derive)
+    evicted = cached_buffer(cache, b"b")
+    # 访问 a 使 b 成为最久未使用的条目
+    cache.get_or_derive(b"pw", b"a", PARAMS, derive)
+    cache.get_or_derive(b"pw", b"c", PARAMS, derive)
+    
+    assert len(cache) == 2
+    assert cached_buffer(cache, b"b") is None
+    assert evicted == bytes(32)
+    cache.get_or_derive(b"pw", b"a", PARAMS, derive)
+    assert derive.calls == 3
+
+
+def test_clear_zeroizes():
+    """清空缓存时清零所有密钥，已返回给调用方的密钥不受影响"""
+    cache = KeyCache()
+    key = cache.get_or_derive(b"pw", b"salt", PARAMS, Deriver())
+    buffer = cached_buffer(cache, b"salt")
+    cache.clear()
+    assert len(cache) == 0
+    assert buffer == bytes(32)
+    assert key == b"k" * 32
+
+
+def test_concurrent_misses_derive_once():
+    """多个线程同时未命中同一个键时只执行一次 KDF"""
+    cache = KeyCache()
+    derive = Deriver(delay=0.2)
+    barrier = threading.Barrier(8)
+    results = []
+    
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_derive(b"pw", b"salt", PARAMS, derive))
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert derive.calls == 1
+    assert results == [derive.key] * 8
+
+
+def test_failed_derivation_not_cached():
+    """派生失败时等待的线程收到同样的异常，之后的调用重新派生"""
+    cache = KeyCache()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+    
+    def failing_derive():
+        started.set()
+        release.wait()
+        raise ValueError("kdf failed")
+    
+    def waiter():
+        try:
+            cache.get_or_derive(b"pw", b"salt", PARAMS, Deriver())
+        except ValueError as e:
+            errors.append(str(e))
+    
+    owner = threading.Thread(target=lambda: pytest.raises(ValueError, cache.get_or_derive,
+                                                          b"pw", b"salt", PARAMS, failing_derive))
+    owner.start()
+    started.wait()
+    waiting = threading.Thread(target=waiter)
+    waiting.start()
+    # 给等待线程足够时间进入等待
+    time.sleep(0.2)
+    release.set()
+    owner.join()
+    waiting.join()
+    
+    assert errors == ["kdf failed"]
+    assert len(cache) == 0
+    derive = Deriver()
+    assert cache.get_or_derive(b"pw", b"salt", PARAMS, derive) == derive.key
+    assert derive.calls == 1
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+密钥封装模式与更换密钥测试
+"""
+
+import io
+import os
+
+import pytest
+
+from security.segmented_cipher import SegmentedCipher
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+DATA = os.urandom(3 * SEGMENT_SIZE + 100)
+
+
+def write_wrapped(tmp_path, key=KEY):
+    """写入一个密钥封装模式的容器文件"""
+    path = tmp_path / "wrapped.dseg"
+    path.write_bytes(b"".join(SegmentedCipher(SEGMENT_SIZE).encrypt_stream([DATA], key, wrap=True)))
+    return str(path)
+
+
+def decrypt_file(path, key):
+    """解密整个文件"""
+    with open(path, "rb") as f:
+        return b"".join(SegmentedCipher().decrypt_stream([f.read()], lambda header: key))
+
+
+def read_header(path):
+    """读取头部字典与头部字节"""
+    with open(path, "rb") as f:
+        return SegmentedCipher.read_header(f)
+
+
+@pytest.mark.parametrize("new_key", [os.urandom(32), [os.urandom(32), os.urandom(32)]])
+def test_rekey_in_place(tmp_path, new_key):
+    """更换密钥（含增加层数）只改写头部，文件大小不变，原密钥失效"""
+    path = write_wrapped(tmp_path)
+    assert decrypt_file(path, KEY) == DATA
+    size = os.path.getsize(path)
+    
+    assert SegmentedCipher.rekey_file(path, lambda header: KEY, new_key) is True
+    assert os.path.getsize(path) == size
+    assert decrypt_file(path, new_key) == DATA
+    with pytest.raises(ValueError):
+        decrypt_file(path, KEY)
+
+
+def test_rekey_alternates_slots(tmp_path):
+    """每次更换密钥写入另一个槽，代数递增，旧槽被清空"""
+    path = write_wrapped(tmp_path)
+    keys = [KEY] + [os.urandom(32) for _ in range(3)]
+    used_offsets = []
+    for generation, (old_key, new_key) in enumerate(zip(keys, keys[1:]), start=2):
+        SegmentedCipher.rekey_file(path, lambda header: old_key, new_key)
+        header, header_bytes = read_header(path)
+        assert header["key_wrap"]["generation"] == generation
+        slot_size = header["key_slots"]
+        filled = [offset for offset in SegmentedCipher.key_slot_offsets(header, len(header_bytes))
+                  if header_bytes[offset:offset + slot_size].strip()]
+        assert len(filled) == 1
+        used_offsets.append(filled[0])
+        assert decrypt_file(path, new_key) == DATA
+    assert used_offsets[0] != used_offsets[1] and used_offsets[0] == used_offsets[2]
+
+
+@pytest.mark.parametrize("torn_bytes", [1, 64, -1])
+def test_torn_slot_write_keeps_old_key(tmp_path, torn_bytes):
+    """新槽的内容只写入了一部分时，文件仍可用原密钥解密"""
+    path = write_wrapped(tmp_path)
+    header, header_bytes = read_header(path)
+    new_header_bytes = SegmentedCipher.rewrap_header(header_bytes, KEY, os.urandom(32))
+    slot_size = header["key_slots"]
+    offset = next(offset for offset in SegmentedCipher.key_slot_offsets(header, len(header_bytes))
+                  if new_header_bytes[offset:offset + slot_size].strip())
+    
+    entry = new_header_bytes[offset:offset + slot_size].rstrip()
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(entry[:torn_bytes])
+    assert decrypt_file(path, KEY) == DATA
+
+
+def test_interrupted_before_clearing_old_slot_uses_new_key(tmp_path):
+    """新槽已落盘、旧槽尚未清空时，使用代数较大的新槽"""
+    path = write_wrapped(tmp_path)
+    new_key = os.urandom(32)
+    header, header_bytes = read_header(path)
+    new_header_bytes = SegmentedCipher.rewrap_header(header_bytes, KEY, new_key)
+    slot_size = header["key_slots"]
+    with open(path, "r+b") as f:
+        for offset in SegmentedCipher.key_slot_offsets(header, len(header_bytes)):
+            if new_header_bytes[offset:offset + slot_size].strip():
+                f.seek(offset)
+                f.write(new_header_bytes[offset:offset + slot_size])
+    assert decrypt_file(path, new_key) == DATA
+
+
+def test_both_slots_invalid_rejected(tmp_path):
+    """两个槽都损坏时头部无效"""
+    path = write_wrapped(tmp_path)
+    header, header_bytes = read_header(path)
+    with open(path, "r+b") as f:
+        for offset in SegmentedCipher.key_slot_offsets(header, len(header_bytes)):
+            f.seek(offset + 70)
+            f.write(b"x")
+    with pytest.raises(ValueError, match="头部已损坏"):
+        decrypt_file(path, KEY)
+
+
+def test_inline_key_wrap_rejected(tmp_path):
+    """key_wrap 只能来自密钥槽，写在 JSON 中的会被拒绝"""
+    path = write_wrapped(tmp_path)
+    header, _ = read_header(path)
+    inline = {k: v for k, v in header.items() if k != "key_slots"}
+    with pytest.raises(ValueError, match="头部已损坏"):
+        SegmentedCipher.parse_header(SegmentedCipher._serialize_header(inline))
+
+
+def test_rewrap_requires_wrap_mode():
+    """非封装模式的容器不能只改写头部"""
+    blob = b"".join(SegmentedCipher(SEGMENT_SIZE).encrypt_stream([DATA], KEY))
+    _, header_bytes = SegmentedCipher.read_header(io.BytesIO(blob))
+    with pytest.raises(ValueError):
+        SegmentedCipher.rewrap_header(header_bytes, KEY, os.urandom(32))
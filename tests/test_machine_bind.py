@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MachineBinder 流式绑定与批量迁移测试
+"""
+
+import os
+import threading
+
+import pytest
+
+from security.machine_bind import MachineBinder
+from security.segmented_cipher import SegmentedCipher
+
+# 测试使用最低强度的 KDF 参数以加快速度
+FAST_KDF = {"name": "pbkdf2-sha256", "iterations": 1000}
+DATA = os.urandom(5000)
+
+
+def make_binder(machine_id=None):
+    """创建使用快速 KDF 参数的 MachineBinder"""
+    binder = MachineBinder()
+    binder.kdf_params = FAST_KDF
+    if machine_id:
+        binder.machine_id = machine_id
+    return binder
+
+
+def test_bind_stream_round_trip():
+    """流式绑定后可在本机解绑"""
+    binder = make_binder()
+    blob = b"".join(binder.bind_stream([DATA], segment_size=1024))
+    assert b"".join(binder.unbind_stream([blob])) == DATA
+
+
+def test_rebind_files_skips_foreign_files(tmp_path):
+    """目录中非本机绑定的文件逐个报告失败，不中断整批迁移"""
+    binder = make_binder()
+    bound = tmp_path / "bound.dseg"
+    bound.write_bytes(b"".join(binder.bind_stream([DATA], segment_size=1024, wrap=True)))
+    plain_container = tmp_path / "plain.dseg"
+    plain_container.write_bytes(b"".join(SegmentedCipher(1024).encrypt_stream([DATA], os.urandom(32), wrap=True)))
+    (tmp_path / "notes.txt").write_text("not a container")
+    
+    results = {os.path.basename(path): (ok, error) for path, ok, error in binder.rebind_files([str(tmp_path)], "other")}
+    assert results["bound.dseg"] == (True, "")
+    assert results["plain.dseg"][0] is False and "盐值" in results["plain.dseg"][1]
+    assert results["notes.txt"][0] is False
+    
+    other = make_binder("other")
+    assert b"".join(other.unbind_stream([bound.read_bytes()])) == DATA
+    with pytest.raises(ValueError):
+        b"".join(binder.unbind_stream([bound.read_bytes()]))
+
+
+def test_unbind_requires_kdf_params():
+    """头部没有记录 KDF 参数的容器被拒绝"""
+    binder = make_binder()
+    blob = b"".join(SegmentedCipher(1024).encrypt_stream([DATA], os.urandom(32),
+                                                         key_fields={"salt": os.urandom(16).hex()}))
+    with pytest.raises(ValueError, match="KDF"):
+        b"".join(binder.unbind_stream([blob]))
+
+
+def test_batch_shares_master_salt():
+    """批次内的文件共用主密钥盐值，各自有独立的子密钥盐值"""
+    binder = make_binder()
+    with binder.batch() as batch_salt:
+        first = binder._new_stream_key()[1]
+        second = binder._new_stream_key()[1]
+    assert first["salt"] == second["salt"] == batch_salt.hex()
+    assert first["subkey_salt"] != second["subkey_salt"]
+    assert "subkey_salt" not in binder._new_stream_key()[1]
+
+
+def test_nested_batch_joins_outer():
+    """嵌套的 batch() 并入外层批次，退出内层后外层批次仍然有效"""
+    binder = make_binder()
+    with binder.batch() as outer:
+        with binder.batch() as inner:
+            assert inner == outer
+        assert binder._new_stream_key()[1]["salt"] == outer.hex()
+
+
+def test_batch_is_per_thread():
+    """其他线程的绑定不使用本线程的批次盐值"""
+    binder = make_binder()
+    other_fields = []
+    with binder.batch() as batch_salt:
+        thread = threading.Thread(target=lambda: other_fields.append(binder._new_stream_key()[1]))
+        thread.start()
+        thread.join()
+        assert binder._new_stream_key()[1]["salt"] == batch_salt.hex()
+    assert "subkey_salt" not in other_fields[0]
+    assert other_fields[0]["salt"] != batch_salt.hex()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带 Merkle 完整性索引的分段容器测试
+"""
+
+import os
+import tracemalloc
+
+import pytest
+
+from security.merkle import MerkleIndex
+from security.segmented_cipher import SegmentedCipher
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+
+
+def encrypt(data: bytes, key=KEY, segment_size=SEGMENT_SIZE, **kwargs) -> bytes:
+    """加密并追加完整性索引"""
+    cipher = SegmentedCipher(segment_size)
+    return b"".join(cipher.encrypt_stream([data], key, merkle=True, **kwargs))
+
+
+def iter_chunks(blob: bytes, chunk_size: int = 777):
+    """按 chunk_size 切分数据"""
+    for i in range(0, len(blob), chunk_size):
+        yield blob[i:i + chunk_size]
+
+
+def decrypt(blob: bytes, key=KEY, max_workers=1, chunk_size=777) -> bytes:
+    """分块流式解密"""
+    cipher = SegmentedCipher(max_workers=max_workers)
+    return b"".join(cipher.decrypt_stream(iter_chunks(blob, chunk_size), lambda header: key))
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, 3 * SEGMENT_SIZE, 5 * SEGMENT_SIZE + 7])
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_streaming_round_trip(size, max_workers):
+    """流式解密能在没有文件大小的情况下找到索引的起点"""
+    data = os.urandom(size)
+    assert decrypt(encrypt(data), max_workers=max_workers) == data
+
+
+def test_multi_layer_round_trip():
+    """多层容器同样适用"""
+    data = os.urandom(4 * SEGMENT_SIZE + 5)
+    keys = [os.urandom(32), os.urandom(32)]
+    assert decrypt(encrypt(data, keys), keys) == data
+
+
+@pytest.mark.parametrize("cut", [1, 44, 45, 200, SEGMENT_SIZE + 300])
+def test_truncation_rejected(cut):
+    """截去索引或分段的任意部分都会被发现"""
+    blob = encrypt(os.urandom(4 * SEGMENT_SIZE + 100))
+    with pytest.raises(ValueError):
+        decrypt(blob[:-cut])
+
+
+def test_tampered_segment_rejected():
+    """篡改中间的分段会在该段认证失败"""
+    blob = bytearray(encrypt(os.urandom(6 * SEGMENT_SIZE)))
+    header_size = SegmentedCipher.parse_header(blob)[1]
+    blob[header_size + 2 * (SEGMENT_SIZE + 16) + 5] ^= 1
+    with pytest.raises(ValueError, match="第 3 段"):
+        decrypt(bytes(blob))
+
+
+def test_streaming_memory_is_bounded():
+    """流式解密的内存占用与分段大小有关，与文件大小（索引长度）无关"""
+    segment_size = 256
+    data = os.urandom(1024 * 1024)
+    blob = encrypt(data, segment_size=segment_size)
+    del data
+    cipher = SegmentedCipher()
+    
+    tracemalloc.start()
+    try:
+        for _ in cipher.decrypt_stream(iter_chunks(blob, 8192), lambda header: KEY):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 256 * 1024
+
+
+def write_file(tmp_path, data=None, key=KEY):
+    """写入带完整性索引的容器文件"""
+    path = tmp_path / "indexed.dseg"
+    path.write_bytes(encrypt(os.urandom(20 * SEGMENT_SIZE + 10) if data is None else data, key))
+    return str(path)
+
+
+def segment_offset(path, index):
+    """第 index 段在文件中的偏移量"""
+    with open(path, "rb") as f:
+        _, header_bytes = SegmentedCipher.read_header(f)
+    return len(header_bytes) + index * (SEGMENT_SIZE + 16)
+
+
+def flip_byte(path, offset):
+    """翻转文件中的一个字节"""
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        value = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([value ^ 1]))
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_verify_file(tmp_path, max_workers):
+    """完好的文件通过检查（全部或任意范围，有无密钥）"""
+    path = write_file(tmp_path)
+    assert SegmentedCipher.verify_file(path, max_workers=max_workers, batch_segments=4) == 21
+    assert SegmentedCipher.verify_file(path, 5, 9, batch_segments=2) == 21
+    assert SegmentedCipher.verify_file(path, 20, 21, key_provider=lambda header: KEY) == 21
+    assert SegmentedCipher.verify_file(path, key_provider=lambda header: KEY) == 21
+
+
+def test_verify_file_detects_corruption(tmp_path):
+    """损坏的分段无需密钥即可发现，并指出是哪一段"""
+    path = write_file(tmp_path)
+    flip_byte(path, segment_offset(path, 7) + 3)
+    with pytest.raises(ValueError, match="第 8 段"):
+        SegmentedCipher.verify_file(path)
+    assert SegmentedCipher.verify_file(path, 0, 7) == 21
+
+
+def test_range_check_reads_only_sibling_path(tmp_path):
+    """检查某一段范围只依赖沿途的兄弟节点，范围之外损坏的叶子不影响结果"""
+    path = write_file(tmp_path)
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+    count = 21
+    leaves_offset = size - MerkleIndex.trailer_size(count)
+    flip_byte(path, leaves_offset + 15 * 32)
+    
+    assert SegmentedCipher.verify_file(path, 0, 2) == count
+    with pytest.raises(ValueError, match="第 16 段"):
+        SegmentedCipher.verify_file(path)
+
+
+def test_recomputed_index_needs_key_to_detect(tmp_path):
+    """篡改分段并重新计算整个索引：无密钥的检查无法发现，提供密钥时认证失败"""
+    path = write_file(tmp_path)
+    flip_byte(path, segment_offset(path, 2) + 1)
+    with open(path, "rb") as f:
+        header, header_bytes = SegmentedCipher.read_header(f)
+        payload = f.read()
+    count = 21
+    payload = payload[:len(payload) - MerkleIndex.trailer_size(count)]
+    stored_segment_size = SEGMENT_SIZE + 16
+    leaves = b"".join(MerkleIndex.leaf_hash(payload[i:i + stored_segment_size])
+                      for i in range(0, len(payload), stored_segment_size))
+    aad = SegmentedCipher.payload_aad(header_bytes, header)
+    trailer = b"".join(MerkleIndex.iter_trailer(leaves, aad, os.urandom(32)))
+    with open(path, "wb") as f:
+        f.write(header_bytes + payload + trailer)
+    
+    assert SegmentedCipher.verify_file(path) == count
+    with pytest.raises(ValueError, match="认证失败"):
+        SegmentedCipher.verify_file(path, key_provider=lambda header: KEY)
+    with pytest.raises(ValueError):
+        decrypt(header_bytes + payload + trailer)
+
+
+def test_verify_file_wrong_key(tmp_path):
+    """提供错误的密钥时校验失败"""
+    path = write_file(tmp_path)
+    with pytest.raises(ValueError, match="密钥错误"):
+        SegmentedCipher.verify_file(path, key_provider=lambda header: os.urandom(32))
+
+
+def test_verify_files(tmp_path):
+    """批量校验逐个报告结果"""
+    good = write_file(tmp_path)
+    bad = tmp_path / "bad.dseg"
+    bad.write_bytes(open(good, "rb").read()[:-10])
+    results = {os.path.basename(path): ok for path, ok, _ in
+               SegmentedCipher.verify_files([str(tmp_path)], key_provider=lambda header: KEY)}
+    assert results == {"indexed.dseg": True, "bad.dseg": False}
+
+
+def test_verify_files_reports_malformed_header(tmp_path):
+    """头部字段无效但索引完好的文件单独报告，不中断批量校验"""
+    good = write_file(tmp_path)
+    blob = open(good, "rb").read()
+    header, header_size = SegmentedCipher.parse_header(blob)
+    header["layers"] = "x"
+    (tmp_path / "crafted.dseg").write_bytes(SegmentedCipher._serialize_header(header) + blob[header_size:])
+    results = {os.path.basename(path): (ok, error) for path, ok, error in
+               SegmentedCipher.verify_files([str(tmp_path)], key_provider=lambda header: KEY)}
+    assert results["indexed.dseg"][0] is True
+    assert results["crafted.dseg"][0] is False
+    assert "头部已损坏" in results["crafted.dseg"][1]
+
+
+def test_unknown_index_scheme_rejected():
+    """未知的索引格式被拒绝"""
+    blob = encrypt(b"data")
+    header, header_size = SegmentedCipher.parse_header(blob)
+    header["merkle"] = "sha256"
+    with pytest.raises(ValueError, match="不支持的完整性索引格式"):
+        SegmentedCipher.parse_header(SegmentedCipher._serialize_header(header) + blob[header_size:])
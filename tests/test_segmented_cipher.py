@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段流式认证加密容器测试
+"""
+
+import hashlib
+import hmac
+import io
+import os
+
+import pytest
+
+from security.segmented_cipher import TAG_SIZE, SegmentedCipher
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+
+
+def encrypt(data: bytes, key=KEY, **kwargs) -> bytes:
+    """按测试用的分段大小加密"""
+    cipher = SegmentedCipher(SEGMENT_SIZE)
+    return b"".join(cipher.encrypt_stream([data], key, **kwargs))
+
+
+def decrypt(blob: bytes, key=KEY, chunk_size: int = 777) -> bytes:
+    """按任意块大小切分容器后解密"""
+    chunks = [blob[i:i + chunk_size] for i in range(0, len(blob), chunk_size)]
+    return b"".join(SegmentedCipher(SEGMENT_SIZE).decrypt_stream(chunks, lambda header: key))
+
+
+def split_container(blob: bytes, layers: int = 1):
+    """拆分为 (头部字节, 密文段列表)"""
+    _, header_size = SegmentedCipher.parse_header(blob)
+    stored = SEGMENT_SIZE + TAG_SIZE * layers
+    payload = blob[header_size:]
+    return blob[:header_size], [payload[i:i + stored] for i in range(0, len(payload), stored)]
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 5 * SEGMENT_SIZE, 12345])
+def test_round_trip(size):
+    """任意长度（含空数据与分段整数倍）都能还原"""
+    data = os.urandom(size)
+    assert decrypt(encrypt(data)) == data
+
+
+def test_round_trip_parallel():
+    """并行加解密的输出与顺序执行一致且可还原"""
+    data = os.urandom(50 * SEGMENT_SIZE + 3)
+    cipher = SegmentedCipher(SEGMENT_SIZE, max_workers=4)
+    blob = b"".join(cipher.encrypt_stream([data], KEY))
+    assert b"".join(cipher.decrypt_stream([blob], lambda header: KEY)) == data
+
+
+def test_multi_layer_round_trip():
+    """融合多层模式每层追加一个标签"""
+    data = os.urandom(3 * SEGMENT_SIZE + 10)
+    keys = [os.urandom(32), os.urandom(32), os.urandom(32)]
+    blob = encrypt(data, keys)
+    header, _ = SegmentedCipher.parse_header(blob)
+    assert header["layers"] == 3
+    assert decrypt(blob, keys) == data
+
+
+@pytest.mark.parametrize("dropped", [1, 2])
+def test_truncation_at_segment_boundary(dropped):
+    """在分段边界截断（去掉最后若干段）会被末段标志发现"""
+    header_bytes, segments = split_container(encrypt(os.urandom(4 * SEGMENT_SIZE + 100)))
+    with pytest.raises(ValueError):
+        decrypt(header_bytes + b"".join(segments[:-dropped]))
+
+
+def test_truncation_inside_segment():
+    """截断在分段中间同样失败"""
+    blob = encrypt(os.urandom(3 * SEGMENT_SIZE))
+    with pytest.raises(ValueError):
+        decrypt(blob[:-5])
+
+
+def test_segment_reordering():
+    """交换两个分段的顺序会认证失败"""
+    header_bytes, segments = split_container(encrypt(os.urandom(4 * SEGMENT_SIZE + 100)))
+    segments[0], segments[1] = segments[1], segments[0]
+    with pytest.raises(ValueError):
+        decrypt(header_bytes + b"".join(segments))
+
+
+def test_segment_bit_flip():
+    """修改密文中的任意一位会认证失败"""
+    blob = bytearray(encrypt(os.urandom(3 * SEGMENT_SIZE)))
+    blob[-SEGMENT_SIZE] ^= 1
+    with pytest.raises(ValueError):
+        decrypt(bytes(blob))
+
+
+def test_header_tampering():
+    """篡改头部（此处追加一个字段）会在解密第一段时失败"""
+    header_bytes, segments = split_container(encrypt(os.urandom(2 * SEGMENT_SIZE)))
+    header, _ = SegmentedCipher.parse_header(header_bytes)
+    header["extra"] = 1
+    with pytest.raises(ValueError):
+        decrypt(SegmentedCipher._serialize_header(header) + b"".join(segments))
+
+
+@pytest.mark.parametrize("field, value", [
+    ("layers", "x"),
+    ("layers", 0),
+    ("nonce_prefix", "zz" * 7),
+    ("nonce_prefix", "00" * 6),
+    ("nonce_prefix", 1),
+    ("cipher", "rot13"),
+    ("cipher", ["aes-256-gcm"]),
+])
+def test_malformed_header_field(field, value):
+    """头部字段类型或取值无效时解析即被拒绝"""
+    header_bytes, segments = split_container(encrypt(os.urandom(SEGMENT_SIZE)))
+    header, _ = SegmentedCipher.parse_header(header_bytes)
+    header[field] = value
+    with pytest.raises(ValueError):
+        SegmentedCipher.parse_header(SegmentedCipher._serialize_header(header))
+
+
+@pytest.mark.parametrize("field", ["key_check", "cipher"])
+def test_required_header_field(field):
+    """缺少密钥校验值或算法名称的头部被拒绝"""
+    header_bytes, _ = split_container(encrypt(os.urandom(SEGMENT_SIZE)))
+    header, _ = SegmentedCipher.parse_header(header_bytes)
+    del header[field]
+    with pytest.raises(ValueError):
+        SegmentedCipher.parse_header(SegmentedCipher._serialize_header(header))
+
+
+def test_missing_nonce_prefix():
+    """头部缺少 nonce 前缀时流式解密报告格式错误而不是 KeyError"""
+    header_bytes, segments = split_container(encrypt(os.urandom(2 * SEGMENT_SIZE)))
+    header, _ = SegmentedCipher.parse_header(header_bytes)
+    del header["nonce_prefix"]
+    with pytest.raises(ValueError, match="头部已损坏"):
+        decrypt(SegmentedCipher._serialize_header(header) + b"".join(segments))
+
+
+def test_wrong_key():
+    """错误的密钥被拒绝"""
+    blob = encrypt(os.urandom(2 * SEGMENT_SIZE))
+    with pytest.raises(ValueError, match="密钥错误"):
+        decrypt(blob, os.urandom(32))
+
+
+def test_key_check_uses_derived_key():
+    """密钥校验值使用 HKDF 派生的独立密钥，而不是分段加密的密钥"""
+    header = SegmentedCipher.read_header(io.BytesIO(encrypt(b"data")))[0]
+    nonce_prefix = bytes.fromhex(header["nonce_prefix"])
+    check_key = SegmentedCipher.derive_subkey(KEY, b"dada-key-check")
+    assert check_key != KEY
+    assert header["key_check"] == [hmac.new(check_key, nonce_prefix, hashlib.sha256).digest()[:16].hex()]
+
+
+def test_wrong_layer_count():
+    """提供的密钥层数与文件不符时被拒绝"""
+    keys = [os.urandom(32), os.urandom(32)]
+    blob = encrypt(os.urandom(2 * SEGMENT_SIZE), keys)
+    with pytest.raises(ValueError, match="层数不匹配"):
+        decrypt(blob, keys[:1])
+    with pytest.raises(ValueError, match="层数不匹配"):
+        decrypt(blob, keys + [os.urandom(32)])
+
+
+def test_wrong_layer_key_reports_layer():
+    """多层中某一层密钥错误时指出是哪一层"""
+    keys = [os.urandom(32), os.urandom(32)]
+    blob = encrypt(os.urandom(SEGMENT_SIZE), keys)
+    with pytest.raises(ValueError, match="第 2 层"):
+        decrypt(blob, [keys[0], os.urandom(32)])
+
+
+def test_not_a_container():
+    """不是分段容器的数据被拒绝"""
+    with pytest.raises(ValueError):
+        decrypt(b"plain text, not a container" * 10)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DecryptingReader 随机访问读取测试
+"""
+
+import io
+import os
+
+import pytest
+
+from security.segmented_cipher import TAG_SIZE, SegmentedCipher
+from security.segmented_reader import DecryptingReader
+
+SEGMENT_SIZE = 1024
+KEY = bytes(range(32))
+DATA = os.urandom(5 * SEGMENT_SIZE + 123)
+
+# 容器格式：(名称, 密钥, encrypt_stream 的参数)
+VARIANTS = [
+    ("plain", KEY, {}),
+    ("layers", [KEY, os.urandom(32)], {}),
+    ("wrap", KEY, {"wrap": True}),
+    ("merkle", KEY, {"merkle": True}),
+]
+
+
+def encrypt(data=DATA, key=KEY, **kwargs) -> bytes:
+    """加密为分段容器"""
+    return b"".join(SegmentedCipher(SEGMENT_SIZE).encrypt_stream([data], key, **kwargs))
+
+
+def open_reader(blob: bytes, key=KEY, **kwargs) -> DecryptingReader:
+    """从内存中的容器打开读取器"""
+    return DecryptingReader(io.BytesIO(blob), lambda header: key, **kwargs)
+
+
+@pytest.fixture(params=VARIANTS, ids=[name for name, _, _ in VARIANTS])
+def reader(request):
+    """各种容器格式的读取器"""
+    _, key, kwargs = request.param
+    with open_reader(encrypt(key=key, **kwargs), key) as reader:
+        yield reader
+
+
+def test_size(reader):
+    """明文长度由密文长度推算得出"""
+    assert reader.size == len(DATA)
+    assert reader.seek(0, io.SEEK_END) == len(DATA)
+
+
+@pytest.mark.parametrize("position", [0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1,
+                                      3 * SEGMENT_SIZE - 5, len(DATA) - 10, len(DATA) - 1])
+def test_seek_and_read_across_boundaries(reader, position):
+    """任意位置开始的读取（含跨越分段边界）与明文切片一致，tell 随读取前进"""
+    assert reader.seek(position) == position
+    assert reader.tell() == position
+    data = reader.read(SEGMENT_SIZE + 20)
+    assert data == DATA[position:position + SEGMENT_SIZE + 20]
+    assert reader.tell() == position + len(data)
+
+
+def test_read_spanning_many_segments(reader):
+    """一次读取跨越多个分段"""
+    reader.seek(SEGMENT_SIZE - 3)
+    assert reader.read(3 * SEGMENT_SIZE + 6) == DATA[SEGMENT_SIZE - 3:4 * SEGMENT_SIZE + 3]
+
+
+def test_relative_seek(reader):
+    """SEEK_CUR 与 SEEK_END 相对当前位置和末尾移动"""
+    reader.seek(10)
+    assert reader.seek(SEGMENT_SIZE, io.SEEK_CUR) == SEGMENT_SIZE + 10
+    assert reader.read(5) == DATA[SEGMENT_SIZE + 10:SEGMENT_SIZE + 15]
+    assert reader.seek(-5, io.SEEK_CUR) == SEGMENT_SIZE + 10
+    assert reader.seek(-7, io.SEEK_END) == len(DATA) - 7
+    assert reader.read() == DATA[-7:]
+
+
+def test_invalid_seek(reader):
+    """负数位置和无效的 whence 被拒绝，位置保持不变"""
+    reader.seek(100)
+    with pytest.raises(ValueError):
+        reader.seek(-1)
+    with pytest.raises(ValueError):
+        reader.seek(-len(DATA) - 1, io.SEEK_END)
+    with pytest.raises(ValueError):
+        reader.seek(0, 3)
+    assert reader.tell() == 100
+
+
+def test_read_past_eof(reader):
+    """读取到末尾时只返回剩余部分，越过末尾读取返回空字节"""
+    reader.seek(len(DATA) - 3)
+    assert reader.read(100) == DATA[-3:]
+    assert reader.read(100) == b""
+    assert reader.tell() == len(DATA)
+    
+    reader.seek(len(DATA) + 100)
+    assert reader.read() == b""
+    assert reader.read(10) == b""
+    assert reader.tell() == len(DATA) + 100
+
+
+def test_read_all(reader):
+    """不指定长度时读到末尾"""
+    reader.seek(0)
+    assert reader.read() == DATA
+
+
+def test_empty_container():
+    """空明文的容器只有一个空分段"""
+    with open_reader(encrypt(b"")) as reader:
+        assert reader.size == 0
+        assert reader.read() == b""
+
+
+def test_tampered_segment_raises_when_read():
+    """篡改的分段在读取到它时认证失败，其他分段仍可读取"""
+    blob = bytearray(encrypt())
+    _, header_size = SegmentedCipher.parse_header(bytes(blob))
+    blob[header_size + 2 * (SEGMENT_SIZE + TAG_SIZE) + 17] ^= 1
+    with open_reader(bytes(blob)) as reader:
+        assert reader.read(SEGMENT_SIZE) == DATA[:SEGMENT_SIZE]
+        reader.seek(3 * SEGMENT_SIZE)
+        assert reader.read(10) == DATA[3 * SEGMENT_SIZE:3 * SEGMENT_SIZE + 10]
+        reader.seek(2 * SEGMENT_SIZE + 100)
+        with pytest.raises(ValueError, match="第 3 段认证失败"):
+            reader.read(10)
+
+
+def test_truncated_at_segment_boundary_raises_when_read():
+    """在分段边界截断后，原来的倒数第二段被当作末段读取时认证失败"""
+    blob = encrypt()
+    _, header_size = SegmentedCipher.parse_header(blob)
+    truncated = blob[:header_size + 5 * (SEGMENT_SIZE + TAG_SIZE)]
+    with open_reader(truncated) as reader:
+        assert reader.size == 5 * SEGMENT_SIZE
+        assert reader.read(10) == DATA[:10]
+        reader.seek(-1, io.SEEK_END)
+        with pytest.raises(ValueError, match="认证失败"):
+            reader.read(1)
+
+
+def test_wrong_key_rejected_on_open():
+    """错误的密钥在打开时就被拒绝"""
+    with pytest.raises(ValueError, match="密钥错误"):
+        open_reader(encrypt(), os.urandom(32))
+
+
+def test_container_embedded_at_offset():
+    """容器从文件对象的当前位置开始"""
+    source = io.BytesIO(b"prefix" + encrypt(merkle=True))
+    source.seek(len(b"prefix"))
+    with DecryptingReader(source, lambda header: KEY) as reader:
+        reader.seek(SEGMENT_SIZE - 2)
+        assert reader.read(4) == DATA[SEGMENT_SIZE - 2:SEGMENT_SIZE + 2]
+
+
+def test_segment_cache(monkeypatch):
+    """重复读取同一分段只解密一次，超过缓存大小后淘汰最久未用的分段"""
+    decrypted = []
+    decrypt_layers = SegmentedCipher.decrypt_layers
+    
+    def counting_decrypt_layers(keys, nonce_prefix, aad, index, *args):
+        decrypted.append(index)
+        return decrypt_layers(keys, nonce_prefix, aad, index, *args)
+    
+    monkeypatch.setattr(SegmentedCipher, "decrypt_layers", staticmethod(counting_decrypt_layers))
+    with open_reader(encrypt(), cache_segments=2) as reader:
+        # 第 0 段最近被访问过，读取第 2 段时淘汰的是第 1 段
+        for position in (0, 10, SEGMENT_SIZE, 20, 2 * SEGMENT_SIZE, 30, SEGMENT_SIZE + 1):
+            reader.seek(position)
+            reader.read(5)
+    assert decrypted == [0, 1, 2, 1]
+
+
+def test_open_path_and_close(tmp_path):
+    """传入路径时读取器自己打开并在关闭时关闭文件"""
+    path = tmp_path / "data.dseg"
+    path.write_bytes(encrypt())
+    reader = DecryptingReader(str(path), lambda header: KEY)
+    assert reader.read(5) == DATA[:5]
+    reader.close()
+    assert reader.closed and reader._file.closed